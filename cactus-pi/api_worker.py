@@ -0,0 +1,165 @@
+# Proces API pentru modul cu motor separat (python main.py --engine).
+# Nu deschide camere și nu încarcă modelul: endpoint-urile interogate des (/intersections,
+# /traffic_lights, /detect) și fluxurile video sunt servite din memoria partajată publicată de
+# motor, iar celelalte cereri (POST, /cameras, /metrics, ...) sunt trimise motorului pe canalul
+# de comenzi și răspunsul lui este returnat neschimbat. Procesele nu au stare proprie, deci
+# pot fi pornite oricâte, independent de motor.
+#
+# Utilizare:
+#   python api_worker.py --workers 4 --port 8000       # pre-fork: N procese pe același socket
+#   gunicorn -w 4 --threads 8 -b 0.0.0.0:8000 api_worker:app
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+from werkzeug.serving import make_server
+
+from shared_state import (FORWARDED_HEADERS, CommandClient, EngineUnavailable, SlotCache, frame_slot_name,
+                          mjpeg_part, parse_published, route_slot_name)
+
+ENGINE_STALE_SECONDS = 5.0  # o stare publicată mai veche înseamnă că motorul nu mai rulează
+STREAM_INTERVAL = 0.05  # secunde între verificările unui cadru nou (ca generate_frames)
+PROXY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+
+app = Flask(__name__)
+CORS(app)
+
+slots = SlotCache()
+engine = CommandClient()
+
+
+def _engine_down(reason):
+    return jsonify({"error": f"Motorul de detecție nu răspunde: {reason}"}), 503
+
+
+def published_response(route):
+    """Ultimul corp JSON publicat de motor pentru `route` (304 dacă If-None-Match se potrivește)."""
+    name = route_slot_name(route)
+    slot = slots.get(name)
+    if slot is not None:
+        _, data, published = slot.read()
+        if data is not None and time.time() - published <= ENGINE_STALE_SECONDS:
+            etag, body = parse_published(data)
+            if etag is None:
+                return Response(body, mimetype="application/json")
+            response = Response(status=304) if request.if_none_match.contains(etag) else \
+                Response(body, mimetype="application/json", headers={"Cache-Control": "no-cache"})
+            response.set_etag(etag)
+            return response
+        # EDGE CASE 60: Motorul a fost repornit (segment nou) sau s-a oprit - slotul este redeschis
+        slots.drop(name)
+    return _engine_down("starea nu este publicată")
+
+
+@app.route("/intersections", methods=["GET"])
+def get_intersections():
+    # Răspunsurile delta (?since=, ?fields=) depind de cerere - sunt calculate de motor
+    if request.args:
+        return proxy("intersections")
+    return published_response("/intersections")
+
+
+@app.route("/traffic_lights")
+def traffic_lights():
+    return published_response("/traffic_lights")
+
+
+@app.route("/detect")
+def detect_status():
+    return published_response("/detect")
+
+
+def generate_frames(intersection_id=None):
+    """Fluxul Motion JPEG din cadrele codate o singură dată de motor (pentru toți clienții)."""
+    name = frame_slot_name(intersection_id)
+    last_seq = None
+    while True:
+        slot = slots.get(name)
+        if slot is None:
+            time.sleep(0.5)  # motorul creează slotul la primul cadru al intersecției
+            continue
+        slot.touch()
+        seq, data, published = slot.read(last_seq)
+        if data is not None:
+            last_seq = seq
+            yield mjpeg_part(data)
+        elif published and time.time() - published > ENGINE_STALE_SECONDS:
+            slots.drop(name)
+        time.sleep(STREAM_INTERVAL)
+
+
+@app.route("/video_feed")
+def video_feed():
+    intersection_id = request.args.get("intersection_id", None)
+    return Response(generate_frames(intersection_id), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/", defaults={"path": ""}, methods=PROXY_METHODS)
+@app.route("/<path:path>", methods=PROXY_METHODS)
+def proxy(path):
+    """Orice altă cerere este executată de motor (validare și răspuns identice cu main.py)."""
+    try:
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        status, body, content_type, returned = engine.request(request.method, "/" + path, request.query_string,
+                                                              request.get_data(), request.content_type, headers)
+    except EngineUnavailable as e:
+        return _engine_down(e)
+    return Response(body, status=status, content_type=content_type, headers=returned)
+
+
+def serve_workers(host, port, workers):
+    """Pre-fork: socket-ul este deschis o dată, apoi fiecare proces copil acceptă conexiuni pe el."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+            server.serve_forever()
+            os._exit(0)
+        children.append(pid)
+    print(f"✓ {workers} procese API pe http://{host}:{port}/ (pid {', '.join(map(str, children))})")
+
+    def stop(signum=None, frame=None):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while children:
+            pid, _ = os.wait()
+            if pid in children:
+                children.remove(pid)
+                print(f"⚠ Procesul API {pid} s-a oprit")
+    except (KeyboardInterrupt, SystemExit):
+        print("\n--- Procese API oprite ---")
+    finally:
+        stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proces API care servește starea motorului din memoria partajată")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    serve_workers(args.host, args.port, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# Benchmark headless al pipeline-ului complet: captură -> inferență YOLO -> zone -> state machine.
+# Rulează pe sursele din fișiere ale intersecțiilor (sau pe --source pentru toate), fără Flask
+# și fără semafoare fizice, și raportează debitul și latențele fiecărei etape.
+# Cu --pacing fast și un număr fix de cadre rezultatele sunt repetabile (CI pe un Linux simplu).
+# Cu --camera compară formatele de captură ale unei camere (rezoluție, FPS, codec, buffer):
+# pentru fiecare --capture raportează formatul negociat, FPS-ul obținut și latența citirilor.
+#
+# Utilizare:
+#   python benchmark.py --source videos/trafic.mp4 --frames 300 --out bench.json
+#   python benchmark.py --config intersections.json --source frames/ --pacing realtime --loop
+#   python benchmark.py --camera 0 --capture default --capture 640x480@30:MJPG:1 --capture 1280x720@30:YUYV
+
+import argparse
+import contextlib
+import io
+import json
+import re
+import time
+
+import cv2
+import numpy as np
+
+from detection import CLASS_MAP, assign_zones, empty_detection, run_inference
+from schema import CaptureConfig, ConfigError, SourceConfig, compile_intersections
+from sources import apply_capture, capture_format, describe_format, describe_source, open_source
+from state_machine import IntersectionStateMachine
+
+MODEL_NAME = 'yolov8n.pt'
+STAGES = ("capture", "inference", "zones", "state_machine")
+
+
+def stage_summary(durations):
+    """Statisticile unei etape (durate în secunde): debit și percentile în milisecunde."""
+    if not durations:
+        return {"count": 0}
+    values = np.asarray(durations)
+    total = float(values.sum())
+    p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1e3
+    return {
+        "count": len(values),
+        "total_s": total,
+        "per_second": len(values) / total if total > 0 else None,
+        "mean_ms": total / len(values) * 1e3,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max() * 1e3),
+    }
+
+
+def run_pipeline(configs, model, frames, warmup=0, class_map=CLASS_MAP):
+    """Rulează `warmup + frames` cicluri ale pipeline-ului pe toate intersecțiile.
+    Primele `warmup` cicluri (încărcarea modelului, cache-uri) nu intră în statistici.
+    Se oprește mai devreme dacă toate sursele s-au terminat (fără loop).
+    """
+    sources = {}
+    for config in configs:
+        cap = open_source(config)
+        if not cap.isOpened():
+            raise RuntimeError(f"nu s-a putut deschide {describe_source(config)} pentru {config.id}")
+        sources[config.id] = cap
+    machines = {config.id: IntersectionStateMachine(config) for config in configs}
+    timings = {stage: [] for stage in STAGES}
+    processed = 0
+    transitions = 0
+    started = None
+
+    try:
+        for cycle in range(warmup + frames):
+            if cycle == warmup:
+                timings = {stage: [] for stage in STAGES}
+                processed = 0
+                started = time.perf_counter()
+            active = False
+            for config in configs:
+                cap = sources[config.id]
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                t1 = time.perf_counter()
+                if not ret:
+                    continue
+                active = True
+                results = run_inference(model, frame)
+                t2 = time.perf_counter()
+                detection = assign_zones(results, frame, config, class_map, empty_detection(config))
+                t3 = time.perf_counter()
+                machine = machines[config.id]
+                phase = machine.state.phase
+                frame_height, frame_width = frame.shape[:2]
+                machine.update_from_detection(detection, frame_width, frame_height)
+                deadline = machine.next_deadline()
+                if deadline is not None and deadline <= time.monotonic():
+                    machine.tick()
+                t4 = time.perf_counter()
+                transitions += machine.state.phase != phase
+                for stage, duration in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                    timings[stage].append(duration)
+                processed += 1
+            if not active:
+                break
+    finally:
+        for cap in sources.values():
+            cap.release()
+
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    return {
+        "frames": processed,
+        "elapsed_s": elapsed,
+        "fps": processed / elapsed if elapsed > 0 else None,
+        "transitions": transitions,
+        "stages": {stage: stage_summary(values) for stage, values in timings.items()},
+        "sources": {config_id: cap.stats() for config_id, cap in sources.items() if hasattr(cap, "stats")},
+    }
+
+
+def parse_capture(text):
+    """"1280x720@30:MJPG:1" -> CaptureConfig; orice parte poate lipsi ("@15", ":MJPG", "default")."""
+    if text == "default":
+        return CaptureConfig()
+    match = re.fullmatch(r"(?:(\d+)x(\d+))?(?:@(\d+(?:\.\d+)?))?(?::([A-Za-z0-9 ]{4})?)?(?::(\d+))?", text)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"format invalid {text!r} (ex. 1280x720@30:MJPG:1)")
+    width, height, fps, fourcc, buffer_size = match.groups()
+    data = {key: value for key, value in (("width", width and int(width)), ("height", height and int(height)),
+                                          ("fps", fps and float(fps)), ("fourcc", fourcc),
+                                          ("bufferSize", buffer_size and int(buffer_size))) if value}
+    try:
+        return CaptureConfig.from_dict(data, "--capture")
+    except ConfigError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def compare_capture(camera_index, captures, frames, warmup=0):
+    """Deschide camera pe rând cu fiecare format și măsoară `frames` citiri (după `warmup`)."""
+    results = []
+    for capture in captures:
+        cap = cv2.VideoCapture(camera_index)
+        try:
+            if not cap.isOpened():
+                raise RuntimeError(f"camera {camera_index} nu a putut fi deschisă")
+            apply_capture(cap, capture)
+            negotiated = capture_format(cap)
+            durations = []
+            failed = 0
+            started = None
+            for cycle in range(warmup + frames):
+                if cycle == warmup:
+                    started = time.perf_counter()
+                t0 = time.perf_counter()
+                ok, frame = cap.read()
+                if cycle >= warmup:
+                    durations.append(time.perf_counter() - t0)
+                    failed += not ok
+            elapsed = time.perf_counter() - started if started is not None else 0.0
+        finally:
+            cap.release()
+        read = frames - failed
+        results.append({
+            "requested": capture.to_dict(),
+            "negotiated": negotiated,
+            "frames": read,
+            "failed": failed,
+            "elapsed_s": elapsed,
+            "fps": read / elapsed if elapsed > 0 else None,
+            "read": stage_summary(durations),
+        })
+    return results
+
+
+def run_capture_comparison(args):
+    captures = args.capture or [CaptureConfig()]
+    results = compare_capture(args.camera, captures, args.frames, args.warmup)
+    for result in results:
+        requested = describe_format(result["requested"])
+        negotiated = describe_format(result["negotiated"])
+        if result["frames"]:
+            read = result["read"]
+            print(f"✓ {requested:<24} -> {negotiated:<28} {result['fps']:6.1f} FPS  "
+                  f"citire p50 {read['p50_ms']:6.2f}ms  p99 {read['p99_ms']:6.2f}ms  ({result['failed']} eșuate)")
+        else:
+            print(f"✗ {requested:<24} -> {negotiated:<28} niciun cadru citit")
+    report = {"camera": args.camera, "captures": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Rezultat scris în {args.out}")
+
+
+def load_model(name):
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        raise SystemExit("✗ Pachetul ultralytics nu este instalat (pip install ultralytics)")
+    return YOLO(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless al pipeline-ului de detecție")
+    parser.add_argument("--config", default="intersections.json")
+    parser.add_argument("--source", default=None, help="fișier video sau director de imagini pentru toate intersecțiile")
+    parser.add_argument("--pacing", choices=("fast", "realtime"), default="fast")
+    parser.add_argument("--loop", action="store_true", help="reia sursa la sfârșit (până la --frames)")
+    parser.add_argument("--fps", type=float, default=30.0, help="ritmul imaginilor dintr-un director")
+    parser.add_argument("--frames", type=int, default=300, help="cicluri măsurate")
+    parser.add_argument("--warmup", type=int, default=5, help="cicluri ignorate la început")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--out", default=None, help="fișierul JSON cu rezultatele")
+    parser.add_argument("--verbose", action="store_true", help="afișează mesajele state machine-urilor")
+    parser.add_argument("--camera", type=int, default=None, help="compară formatele de captură ale camerei (index)")
+    parser.add_argument("--capture", type=parse_capture, action="append",
+                        help="format comparat cu --camera: WxH@FPS:FOURCC:BUFFER sau default (repetabil)")
+    args = parser.parse_args()
+
+    if args.camera is not None:
+        run_capture_comparison(args)
+        return
+    if args.capture:
+        parser.error("--capture necesită --camera")
+
+    with open(args.config, "r") as f:
+        configs = compile_intersections(json.load(f))
+    for config in configs:
+        if args.source:
+            config.source = SourceConfig(args.source, args.pacing, args.loop, args.fps)
+        elif config.source is not None:
+            config.source.pacing = args.pacing
+            config.source.loop = args.loop
+    configs = [config for config in configs if config.source is not None]
+    if not configs:
+        raise SystemExit("✗ Nicio intersecție nu are o sursă din fișier - folosește --source")
+
+    model = load_model(args.model)
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = run_pipeline(configs, model, args.frames, args.warmup)
+    report["model"] = args.model
+    report["pacing"] = args.pacing
+
+    if report["frames"]:
+        print(f"✓ {report['frames']} cadre în {report['elapsed_s']:.2f}s - {report['fps']:.1f} FPS "
+              f"end-to-end ({len(configs)} intersecții, {args.pacing})")
+    else:
+        print("⚠ Niciun cadru procesat")
+    for stage, stats in report["stages"].items():
+        if stats["count"]:
+            print(f"  {stage:<14} {stats['per_second']:9.1f}/s  p50 {stats['p50_ms']:7.2f}ms  "
+                  f"p95 {stats['p95_ms']:7.2f}ms  p99 {stats['p99_ms']:7.2f}ms")
+    for config_id, stats in report["sources"].items():
+        if stats["dropped"] or stats["loops"]:
+            print(f"  {config_id}: {stats['dropped']} cadre sărite, {stats['loops']} reluări")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Rezultat scris în {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Inventarul camerelor pentru /cameras, actualizat în fundal.
+# Pe Linux dispozitivele sunt enumerate din /dev/video* și descrise cu ioctl VIDIOC_QUERYCAP,
+# care nu pornește captura: un dispozitiv deja folosit de bucla de detecție nu este blocat
+# și nu își pierde fluxul. Nodurile fără captură video (ex. metadatele camerelor UVC) sunt omise.
+# Fără V4L2 (alte platforme) se încearcă indicii 0..PROBE_COUNT-1 cu cv2.VideoCapture,
+# sărind peste cei folosiți de intersecții.
+#
+# Utilizare:
+#   inventory = CameraInventory(in_use=lambda: {0, 2})
+#   inventory.start()
+#   inventory.devices()  # ultima enumerare, instant
+
+import glob
+import os
+import re
+import struct
+import threading
+import time
+
+import cv2
+
+from eventlog import get_logger
+
+log = get_logger("camera_inventory")
+
+REFRESH_INTERVAL = 30.0  # secunde între enumerări
+PROBE_COUNT = 10  # indici încercați fără V4L2
+
+# struct v4l2_capability: driver[16], card[32], bus_info[32], version, capabilities, device_caps, reserved[3]
+_V4L2_CAPABILITY = struct.Struct("16s32s32sIII12x")
+_VIDIOC_QUERYCAP = 0x80685600  # _IOR('V', 0, struct v4l2_capability)
+_V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+_V4L2_CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+_V4L2_CAP_STREAMING = 0x04000000
+_V4L2_CAP_DEVICE_CAPS = 0x80000000
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def _text(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def query_v4l2(path):
+    """Capabilitățile unui nod /dev/videoN (fără a porni captura); None dacă nu poate fi interogat."""
+    buffer = bytearray(_V4L2_CAPABILITY.size)
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None
+    try:
+        fcntl.ioctl(fd, _VIDIOC_QUERYCAP, buffer)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    driver, card, bus_info, version, capabilities, device_caps = _V4L2_CAPABILITY.unpack(buffer)
+    caps = device_caps if capabilities & _V4L2_CAP_DEVICE_CAPS else capabilities
+    return {
+        "name": _text(card),
+        "driver": _text(driver),
+        "bus": _text(bus_info),
+        "capture": bool(caps & (_V4L2_CAP_VIDEO_CAPTURE | _V4L2_CAP_VIDEO_CAPTURE_MPLANE)),
+        "streaming": bool(caps & _V4L2_CAP_STREAMING),
+    }
+
+
+def enumerate_v4l2():
+    """{index: descriere} pentru nodurile /dev/videoN care pot captura video."""
+    devices = {}
+    for path in glob.glob("/dev/video*"):
+        match = re.fullmatch(r"/dev/video(\d+)", path)
+        if match is None:
+            continue
+        info = query_v4l2(path)
+        if info is not None and info["capture"]:
+            devices[int(match.group(1))] = dict(info, path=path)
+    return devices
+
+
+def probe_opencv(skip, count=PROBE_COUNT):
+    """{index: descriere} pentru camerele care pot fi deschise și citite; indicii din `skip` nu sunt atinși."""
+    devices = {}
+    for index in range(count):
+        if index in skip:
+            continue
+        cap = cv2.VideoCapture(index)
+        try:
+            if cap.isOpened() and cap.read()[0]:
+                devices[index] = {"name": f"Camera {index}", "capture": True}
+        finally:
+            cap.release()
+    return devices
+
+
+class CameraInventory:
+    """Lista camerelor, re-enumerată de un fir de fundal la fiecare `refresh_interval`.
+
+    in_use: funcție fără argumente -> indicii camerelor deschise de aplicație; fără V4L2 ei nu
+    sunt re-deschiși, iar descrierea lor din enumerarea anterioară este păstrată.
+    """
+
+    def __init__(self, in_use=lambda: (), refresh_interval=REFRESH_INTERVAL):
+        self.in_use = in_use
+        self.refresh_interval = refresh_interval
+        self._devices = {}
+        self.updated = None  # momentul ultimei enumerări (time.time())
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="camera-inventory", daemon=True)
+            self._thread.start()
+
+    def refresh(self):
+        """Cere o enumerare imediată (asincronă)."""
+        self._wake.set()
+
+    def devices(self):
+        """Ultima enumerare: {index: descriere} (copie)."""
+        return dict(self._devices)
+
+    def scan(self):
+        """Enumerează dispozitivele acum, pe firul apelant."""
+        # Nodurile /dev/video* apar și dispar odată cu camerele USB - verificat la fiecare enumerare
+        if fcntl is not None and glob.glob("/dev/video*"):
+            devices = enumerate_v4l2()
+        else:
+            in_use = set(self.in_use())
+            devices = probe_opencv(in_use)
+            # EDGE CASE 62: O cameră folosită de o intersecție nu poate fi verificată fără a o
+            # re-deschide - rămâne în listă cu descrierea anterioară (sau una generică)
+            for index in in_use:
+                if isinstance(index, int):
+                    devices[index] = self._devices.get(index) or {"name": f"Camera {index}", "capture": True}
+        self._devices = devices
+        self.updated = time.time()
+        return devices
+
+    def _run(self):
+        while True:
+            try:
+                started = time.monotonic()
+                devices = self.scan()
+                log.debug("camera_scan", "Inventar camere: {count} dispozitive în {seconds:.2f}s",
+                          count=len(devices), seconds=time.monotonic() - started)
+            except Exception as e:
+                log.error("camera_scan_failed", "⚠ Eroare la enumerarea camerelor: {error}", exc=True, error=str(e))
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
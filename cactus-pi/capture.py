@@ -0,0 +1,462 @@
+# Registrul surselor de cadre deschise (camere / fișiere), per intersecție.
+# Fiecare sursă este citită de un fir propriu (CaptureWorker): bucla de detecție ia doar
+# ultimul cadru primit, deci o cameră blocată într-un read() nu oprește celelalte intersecții.
+# Un fir de fundal aduce registrul la zi cu configurația (cameraIndex sau "capture" modificat,
+# intersecții adăugate sau șterse) și supraveghează camerele: o cameră care nu mai trimite cadre este
+# abandonată și redeschisă cu backoff exponențial, iar intersecția ei trece pe ciclul fix
+# Manual (on_health) până când detectorul vede din nou.
+# Sursele noi sunt deschise și "încălzite" în afara lock-ului, fiecare pe un fir propriu (o
+# deschidere poate dura secunde - supravegherea celorlalte camere nu o așteaptă), apoi înlocuiesc
+# atomic sursa veche; sursele înlocuite sunt eliberate de bucla de detecție (drain).
+# Cadrele sunt citite în bufferele refolosite ale unui FramePool (frame_pool.py) și predate
+# buclei ca Frame doar pentru citire, fără copii.
+
+import threading
+import time
+
+import cv2
+
+from eventlog import get_logger
+from frame_pool import FRAME_POOL_ALLOCATIONS, FramePool
+from metrics import REGISTRY
+from sources import capture_format, describe_format, describe_source, open_source
+
+log = get_logger("capture")
+
+WARMUP_FRAMES = 5  # cadre citite și aruncate după deschiderea unei camere (expunere, balans de alb)
+OPEN_TIMEOUT = 5.0  # secunde de așteptare a primelor cadre după deschidere
+RELEASE_TIMEOUT = 2.0  # secunde de așteptare a eliberării camerei înainte de redeschiderea ei în alt format
+STALL_TIMEOUT = 3.0  # secunde fără cadru nou după care sursa este considerată blocată
+WATCHDOG_INTERVAL = 0.5  # secunde între verificările surselor
+BACKOFF_MIN = 1.0  # prima reîncercare a unei surse care nu a putut fi (re)deschisă
+BACKOFF_MAX = 60.0  # intervalul maxim între reîncercări
+FAILED_READ_DELAY = 0.05  # pauza după o citire eșuată (fără buclă activă pe o cameră deconectată)
+LATENCY_SMOOTHING = 0.1  # ponderea ultimei citiri în media exponențială a latenței
+
+CAMERA_READ_SECONDS = REGISTRY.histogram("cactus_camera_read_seconds", "Durata citirii unui cadru din sursă",
+                                         ("intersection",))
+CAMERA_STALLS = REGISTRY.counter("cactus_camera_stalls_total", "Surse blocate sau deconectate", ("intersection",))
+CAMERA_RECONNECTS = REGISTRY.counter("cactus_camera_reconnects_total", "Surse redeschise după o cădere",
+                                     ("intersection",))
+
+
+def source_key(intersection):
+    """Identitatea sursei unei intersecții - o schimbare a ei cere redeschiderea."""
+    source = intersection.source
+    if source is None:
+        capture = intersection.capture
+        return ("camera", intersection.camera_index, capture.to_dict() if capture is not None else None)
+    return ("file", source.path, source.pacing, source.loop, source.fps)
+
+
+class CaptureWorker:
+    """Citește o sursă pe un fir propriu și păstrează ultimul cadru.
+
+    Are interfața unei surse (read / isOpened / get / release): read() nu blochează și
+    returnează (False, None) dacă nu a sosit un cadru nou de la citirea anterioară, altfel
+    (True, Frame) - referința trece la apelant, care o eliberează cu release().
+    Un cadru nepreluat este înlocuit (și eliberat) de următorul.
+    lossless: cadrul următor este citit doar după ce bucla l-a preluat pe cel curent
+              (sursele din fișiere cu ritm "fast" - niciun cadru nu este sărit)
+    """
+
+    def __init__(self, cap, intersection_id, warmup_frames=0, lossless=False, negotiated=None):
+        self.cap = cap
+        self.intersection_id = intersection_id
+        self.warmup_frames = warmup_frames
+        self.lossless = lossless
+        self.negotiated = negotiated  # formatul negociat al camerei (capture_format), None pentru fișiere
+        # Proprietățile sunt citite acum: cap nu este accesat din alt fir decât cel de citire
+        self._props = {prop: cap.get(prop) for prop in
+                       (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS)}
+        self.pool = FramePool(intersection_id, "capture")
+        self._cond = threading.Condition()
+        self._frame = None  # ultimul cadru nepreluat de bucla de detecție
+        self._fresh = False
+        self._shape = None  # formatul ultimului cadru citit
+        self._stop = threading.Event()
+        self.ready = threading.Event()  # setat după cadrele de încălzire
+        self.started = time.monotonic()
+        self.last_frame = None  # momentul (monoton) ultimului cadru citit
+        self.frames = 0
+        self.failed_reads = 0
+        self.consecutive_failures = 0
+        self.read_latency = None  # secunde, medie exponențială
+        self.max_read_latency = 0.0
+        self._reading_since = None  # momentul începerii citirii în curs
+        self._thread = threading.Thread(target=self._run, name=f"capture-{intersection_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        histogram = CAMERA_READ_SECONDS.labels(self.intersection_id)
+        warmup = self.warmup_frames
+        try:
+            while not self._stop.is_set():
+                if self.lossless:
+                    with self._cond:
+                        while self._fresh and not self._stop.is_set():
+                            self._cond.wait(0.1)
+                buffer = self.pool.take()
+                self._reading_since = started = time.monotonic()
+                ok, image = self.cap.read(buffer)
+                now = time.monotonic()
+                self._reading_since = None
+                latency = now - started
+                histogram.observe(latency)
+                self.read_latency = latency if self.read_latency is None else \
+                    self.read_latency + LATENCY_SMOOTHING * (latency - self.read_latency)
+                self.max_read_latency = max(self.max_read_latency, latency)
+                if not ok:
+                    if buffer is not None:
+                        self.pool.put(buffer)
+                    self.failed_reads += 1
+                    self.consecutive_failures += 1
+                    time.sleep(FAILED_READ_DELAY)
+                    continue
+                self.consecutive_failures = 0
+                self.last_frame = now
+                frame = self.pool.wrap(image, buffer)
+                if warmup > 0:
+                    warmup -= 1
+                    frame.release()
+                    continue
+                with self._cond:
+                    previous = self._frame
+                    self._frame = frame
+                    self._fresh = True
+                    self._shape = frame.shape
+                    self.frames += 1
+                if previous is not None:
+                    previous.release()  # cadru sărit - bucla nu l-a preluat
+                self.ready.set()
+        finally:
+            # Doar firul de citire atinge cap - eliberarea nu concurează cu un read() în curs
+            self.cap.release()
+            with self._cond:
+                pending, self._frame = self._frame, None
+            if pending is not None:
+                pending.release()
+
+    def wait_ready(self, timeout):
+        return self.ready.wait(timeout)
+
+    def join(self, timeout):
+        """Așteaptă ieșirea firului de citire (după release); False dacă este încă blocat."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def read(self):
+        with self._cond:
+            if not self._fresh:
+                return False, None
+            self._fresh = False
+            frame, self._frame = self._frame, None
+            if self.lossless:
+                self._cond.notify()
+        return True, frame
+
+    def isOpened(self):
+        return not self._stop.is_set()
+
+    def get(self, prop):
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            shape = self._shape
+            if shape is not None:
+                return float(shape[1] if prop == cv2.CAP_PROP_FRAME_WIDTH else shape[0])
+        return self._props.get(prop, 0.0)
+
+    def release(self):
+        """Oprește firul de citire (nu blochează); sursa este eliberată de fir la ieșire.
+        Dacă firul este blocat într-un read() care nu se mai întoarce, sursa rămâne abandonată."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+
+    def stalled(self, now, timeout):
+        """Niciun cadru (sau citire blocată) de cel puțin `timeout` secunde."""
+        if self.lossless and self._fresh:
+            return False  # așteaptă bucla de detecție, nu camera
+        return now - (self.last_frame or self.started) > timeout
+
+    def fault(self, now):
+        """Descrierea căderii, pentru jurnal și API."""
+        if self._reading_since is not None:
+            return f"citire blocată de {now - self._reading_since:.1f}s"
+        if self.consecutive_failures:
+            return f"{self.consecutive_failures} citiri eșuate consecutive"
+        return "niciun cadru nou"
+
+    def stats(self, now):
+        stats = {
+            "frameAge": None if self.last_frame is None else round(now - self.last_frame, 3),
+            "readLatencyMs": None if self.read_latency is None else round(self.read_latency * 1000, 2),
+            "maxReadLatencyMs": round(self.max_read_latency * 1000, 2),
+            "frames": self.frames,
+            "failedReads": self.failed_reads,
+            "bufferAllocations": self.pool.allocated,
+        }
+        if self.negotiated is not None:
+            stats["format"] = self.negotiated
+        return stats
+
+
+class CaptureRegistry:
+    """Sursele deschise {id intersecție: CaptureWorker}, aduse la zi cu configurația și
+    supravegheate de un fir de fundal.
+
+    lock: lock-ul global; `captures` este modificat doar sub el
+    configured: funcție (apelată sub lock) -> intersecțiile configurate acum
+    on_health: funcție (id, sănătoasă) apelată sub lock când o sursă cade sau își revine
+    """
+
+    def __init__(self, lock, configured, captures=None, opener=open_source, on_health=None,
+                 warmup_frames=WARMUP_FRAMES, stall_timeout=STALL_TIMEOUT):
+        self.lock = lock
+        self.configured = configured
+        self.captures = {} if captures is None else captures
+        self.opener = opener
+        self.on_health = on_health
+        self.warmup_frames = warmup_frames
+        self.stall_timeout = stall_timeout
+        self._keys = {}  # {id: source_key} al sursei deschise
+        self._healthy = {}  # {id: bool} - ultima stare anunțată prin on_health
+        self._backoff = {}  # {id: {"delay", "next", "attempts", "error"}} - surse în așteptarea reîncercării
+        self._retired = []  # surse înlocuite, eliberate de bucla de detecție
+        self._opening = set()  # intersecțiile cu o deschidere în curs (pe firul ei)
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="capture-registry", daemon=True)
+            self._thread.start()
+
+    def request(self):
+        """Cere aplicarea configurației curente (asincron, nu blochează apelantul)."""
+        self._wake.set()
+
+    def snapshot(self):
+        """Copia registrului pentru un ciclu al buclei de detecție (apelat sub lock)."""
+        return dict(self.captures)
+
+    def drain(self):
+        """Sursele înlocuite de la ultimul apel (apelat sub lock; eliberarea se face în afara lui)."""
+        retired, self._retired = self._retired, []
+        return retired
+
+    def healthy(self, intersection_id):
+        """Detectorul intersecției primește cadre (apelat sub lock)."""
+        return self._healthy.get(intersection_id, False)
+
+    def _set_healthy(self, intersection_id, healthy):
+        if self._healthy.get(intersection_id, False) == healthy:
+            self._healthy[intersection_id] = healthy
+            return
+        self._healthy[intersection_id] = healthy
+        if self.on_health is not None:
+            self.on_health(intersection_id, healthy)
+
+    def _retry_later(self, intersection_id, now, error):
+        """Programează următoarea încercare de deschidere, cu backoff exponențial (sub lock)."""
+        retry = self._backoff.get(intersection_id)
+        if retry is None:
+            retry = self._backoff[intersection_id] = {"delay": BACKOFF_MIN, "attempts": 0}
+        else:
+            retry["delay"] = min(retry["delay"] * 2, BACKOFF_MAX)
+        retry["attempts"] += 1
+        retry["next"] = now + retry["delay"]
+        retry["error"] = error
+
+    def health(self, now=None):
+        """Starea surselor tuturor intersecțiilor configurate, pentru API (apelat sub lock)."""
+        now = time.monotonic() if now is None else now
+        report = {}
+        for intersection in self.configured():
+            intersection_id = intersection.id
+            worker = self.captures.get(intersection_id)
+            retry = self._backoff.get(intersection_id)
+            healthy = self._healthy.get(intersection_id, False)
+            entry = {
+                "source": describe_source(intersection),
+                "healthy": healthy,
+                "status": "ok" if healthy else ("reconnecting" if retry else "starting"),
+            }
+            if intersection.source is None and intersection.capture is not None:
+                entry["requested"] = intersection.capture.to_dict()
+            if worker is not None:
+                entry.update(worker.stats(now))
+            if retry is not None:
+                entry["reconnect"] = {"attempts": retry["attempts"], "retryIn": round(max(0.0, retry["next"] - now), 1),
+                                      "error": retry["error"]}
+            report[intersection_id] = entry
+        return report
+
+    def _open(self, intersection):
+        """Deschide și încălzește sursa intersecției (în afara lock-ului).
+        Returnează (worker, None) sau (None, eroare)."""
+        source_name = describe_source(intersection)
+        try:
+            cap = self.opener(intersection)
+            if not cap.isOpened():
+                cap.release()
+                return None, f"{source_name} nu a putut fi deschisă"
+            camera = intersection.source is None
+            # Formatul este citit înainte de pornirea firului - cap nu este accesat din două fire
+            negotiated = capture_format(cap) if camera else None
+            worker = CaptureWorker(cap, intersection.id, self.warmup_frames if camera else 0,
+                                   lossless=not camera and intersection.source.pacing == "fast",
+                                   negotiated=negotiated).start()
+        except Exception as e:
+            return None, f"eroare la deschiderea {source_name}: {e}"
+        if not worker.wait_ready(OPEN_TIMEOUT):
+            worker.release()
+            return None, f"{source_name} deschisă, dar nu trimite cadre"
+        if negotiated is None:
+            log.info("camera_opened", "✓ {source} deschisă pentru {name}", intersection=intersection.id,
+                     source=source_name.capitalize(), name=intersection.name)
+            return worker, None
+        log.info("camera_opened", "✓ {source} deschisă pentru {name} ({format})", intersection=intersection.id,
+                 source=source_name.capitalize(), name=intersection.name, format=describe_format(negotiated))
+        requested = intersection.capture.to_dict() if intersection.capture is not None else {}
+        refused = {key: value for key, value in requested.items()
+                   if key in ("width", "height", "fourcc", "bufferSize", "fps") and key in negotiated
+                   and negotiated[key] != (round(value, 2) if key == "fps" else value)}
+        if refused:
+            # EDGE CASE 67: Camera nu suportă formatul cerut - driverul alege cel mai apropiat
+            # format; captura continuă cu el, diferența este semnalată (și în /cameras/health)
+            log.warning("camera_format_refused", "⚠ {source} nu a acceptat formatul cerut ({requested}) - folosește {format}",
+                        intersection=intersection.id, source=source_name.capitalize(),
+                        requested=describe_format(requested), format=describe_format(negotiated))
+        return worker, None
+
+    def _watchdog(self, now):
+        """Abandonează sursele care nu mai trimit cadre (sub lock); ele sunt redeschise cu backoff."""
+        for intersection_id, worker in list(self.captures.items()):
+            # Doar camerele sunt supravegheate - sfârșitul unui fișier fără "loop" nu este o cădere
+            if self._keys.get(intersection_id, ("camera",))[0] != "camera":
+                continue
+            if not worker.stalled(now, self.stall_timeout):
+                continue
+            # EDGE CASE 66: Camera deconectată sau blocată într-un read() - firul ei este abandonat
+            # (eliberează camera dacă read() se mai întoarce), intersecția trece pe ciclul fix
+            # Manual, iar camera este redeschisă cu backoff exponențial
+            fault = worker.fault(now)
+            self._retired.append(self.captures.pop(intersection_id))
+            self._keys.pop(intersection_id, None)
+            self._backoff[intersection_id] = {"delay": BACKOFF_MIN, "attempts": 0, "next": now, "error": fault}
+            self._set_healthy(intersection_id, False)
+            CAMERA_STALLS.labels(intersection_id).inc()
+            log.warning("camera_stalled", "⚠ Sursa intersecției {intersection} nu mai trimite cadre ({fault}) - redeschidere",
+                        intersection=intersection_id, fault=fault)
+
+    def reconcile(self):
+        """Aduce registrul la configurația curentă și pornește redeschiderea surselor căzute, când le
+        vine rândul. Nu așteaptă deschiderile; returnează firele pornite."""
+        now = time.monotonic()
+        with self.lock:
+            wanted = {intersection.id: intersection for intersection in self.configured()}
+            for intersection_id in [i for i in self.captures if i not in wanted]:
+                self._retired.append(self.captures.pop(intersection_id))
+                self._keys.pop(intersection_id, None)
+                log.info("camera_closed", "✓ Sursa intersecției {intersection} a fost oprită (intersecție ștearsă)",
+                         intersection=intersection_id)
+            for intersection_id in [i for i in set(self._backoff) | set(self._healthy) if i not in wanted]:
+                self._backoff.pop(intersection_id, None)
+                self._healthy.pop(intersection_id, None)
+                for metric in (CAMERA_READ_SECONDS, CAMERA_STALLS, CAMERA_RECONNECTS):
+                    metric.remove(intersection_id)
+                FRAME_POOL_ALLOCATIONS.remove(intersection_id, "capture")
+            self._watchdog(now)
+            changed = [intersection for intersection_id, intersection in wanted.items()
+                       if self._keys.get(intersection_id) != source_key(intersection)
+                       and intersection_id not in self._opening
+                       and self._backoff.get(intersection_id, {}).get("next", now) <= now]
+            self._opening.update(intersection.id for intersection in changed)
+
+        threads = []
+        for intersection in changed:
+            thread = threading.Thread(target=self._reopen, args=(intersection,),
+                                      name=f"capture-open-{intersection.id}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _reopen(self, intersection):
+        """Înlocuiește sursa intersecției cu una deschisă după configurația `intersection` (pe un fir propriu)."""
+        try:
+            self._replace(intersection)
+        except Exception as e:
+            log.error("capture_reconcile_failed", "⚠ Eroare la reconfigurarea surselor: {error}",
+                      exc=True, error=str(e))
+        finally:
+            with self.lock:
+                self._opening.discard(intersection.id)
+
+    def _replace(self, intersection):
+        key = source_key(intersection)
+        with self.lock:
+            old_key = self._keys.get(intersection.id)
+            same_camera = old_key is not None and old_key[0] == "camera" and old_key[:2] == key[:2]
+            old = self.captures.pop(intersection.id, None) if same_camera else None
+            if old is not None:
+                self._keys.pop(intersection.id, None)
+        if old is not None:
+            # EDGE CASE 68: Aceeași cameră cu alt format - dispozitivul nu poate fi deschis de
+            # două ori (V4L2 refuză schimbarea formatului cât timp fluxul vechi rulează), deci
+            # sursa veche este eliberată înainte; intersecția nu are cadre cât durează redeschiderea
+            old.release()
+            if not old.join(RELEASE_TIMEOUT):
+                log.warning("camera_release_slow", "⚠ Camera intersecției {intersection} nu a fost eliberată în {timeout:.0f}s",
+                            intersection=intersection.id, timeout=RELEASE_TIMEOUT)
+        worker, error = self._open(intersection)
+        with self.lock:
+            current = next((i for i in self.configured() if i.id == intersection.id), None)
+            if current is None or source_key(current) != key:
+                # EDGE CASE 63: Configurația s-a schimbat din nou în timpul deschiderii -
+                # sursa este aruncată, următoarea trecere o deschide pe cea nouă
+                if worker is not None:
+                    self._retired.append(worker)
+                return
+            # EDGE CASE 64: Sursa nouă nu a putut fi deschisă - cea veche nu mai corespunde
+            # configurației și poate ține camera cerută de altă intersecție (schimb de camere),
+            # deci este eliberată; deschiderea este reîncercată cu backoff
+            old = self.captures.pop(intersection.id, None)
+            if old is not None:
+                self._retired.append(old)
+            if worker is not None:
+                self.captures[intersection.id] = worker
+                self._keys[intersection.id] = key
+                if self._backoff.pop(intersection.id, None) is not None:
+                    CAMERA_RECONNECTS.labels(intersection.id).inc()
+                self._set_healthy(intersection.id, True)
+            else:
+                self._keys.pop(intersection.id, None)
+                self._retry_later(intersection.id, time.monotonic(), error)
+                self._set_healthy(intersection.id, False)
+                retry = self._backoff[intersection.id]
+                log.warning("camera_failed", "⚠ {error} (intersecția {name}) - reîncercare în {delay:.0f}s",
+                            every=60.0, per="intersection", intersection=intersection.id, name=intersection.name,
+                            error=error[:1].upper() + error[1:], delay=retry["delay"])
+
+    def _run(self):
+        first = True
+        while True:
+            threads = []
+            try:
+                threads = self.reconcile()
+            except Exception as e:
+                log.error("capture_reconcile_failed", "⚠ Eroare la reconfigurarea surselor: {error}",
+                          exc=True, error=str(e))
+            if first:
+                first = False
+                # La pornire nicio cameră nu este încă supravegheată - se așteaptă primele deschideri
+                deadline = time.monotonic() + OPEN_TIMEOUT + RELEASE_TIMEOUT
+                for thread in threads:
+                    thread.join(max(0.0, deadline - time.monotonic()))
+                if not self.captures:
+                    log.error("no_cameras", "✗ Eroare: Nu s-au putut deschide camere pentru nicio intersecție!")
+            self._wake.wait(WATCHDOG_INTERVAL)
+            self._wake.clear()
@@ -0,0 +1,42 @@
+# Ceasurile folosite de state machine: ceasul sistemului (live) și un ceas virtual
+# (replay, simulare), avansat explicit - un scenariu de ore rulează în câteva secunde.
+
+import time
+
+
+class SystemClock:
+    """Ceasul real: monoton pentru deadline-uri, time.time() pentru lastUpdate."""
+
+    monotonic = staticmethod(time.monotonic)
+    time = staticmethod(time.time)
+
+
+class VirtualClock:
+    """Ceas virtual: timpul avansează doar prin set() / advance().
+
+    Args:
+        start: valoarea inițială a ceasului monoton (secunde)
+        epoch: time() returnează epoch + timpul monoton (pentru lastUpdate)
+    """
+
+    def __init__(self, start=0.0, epoch=0.0):
+        self.now = start
+        self.epoch = epoch
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def set(self, now):
+        """Mută ceasul la `now`; timpul virtual nu poate merge înapoi."""
+        if now < self.now:
+            raise ValueError(f"ceasul virtual nu poate merge înapoi ({now} < {self.now})")
+        self.now = now
+
+    def advance(self, seconds):
+        self.set(self.now + seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,131 @@
+# Lock instrumentat pentru profilarea contenției pe lock-ul global al aplicației.
+# Înlocuiește threading.Lock (with / acquire / release / locked) și măsoară, per loc de
+# apel (funcția care face `with lock:`), timpul de așteptare și timpul de deținere.
+# Cu profilarea dezactivată costul este o verificare de flag; activată, o achiziție
+# necontestată costă un acquire neblocant, două perf_counter și două observații (~5µs).
+
+import sys
+import threading
+import time
+
+from metrics import REGISTRY
+
+LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    "cactus_lock_wait_seconds", "Așteptarea lock-ului global, per loc de apel", ("site",),
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+LOCK_HOLD_SECONDS = REGISTRY.histogram(
+    "cactus_lock_hold_seconds", "Deținerea lock-ului global, per loc de apel", ("site",),
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+
+
+class _SiteStats:
+    __slots__ = ("acquisitions", "contended", "wait_total", "wait_max", "hold_total", "hold_max")
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def to_dict(self):
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_total_ms": self.wait_total * 1e3,
+            "wait_max_ms": self.wait_max * 1e3,
+            "wait_mean_ms": self.wait_total / self.acquisitions * 1e3 if self.acquisitions else 0.0,
+            "hold_total_ms": self.hold_total * 1e3,
+            "hold_max_ms": self.hold_max * 1e3,
+            "hold_mean_ms": self.hold_total / self.acquisitions * 1e3 if self.acquisitions else 0.0,
+        }
+
+
+class InstrumentedLock:
+    """threading.Lock cu statistici de așteptare / deținere per loc de apel.
+
+    Statisticile sunt modificate doar de firul care deține lock-ul, deci nu au nevoie
+    de un lock propriu. Locul de apel este numele funcției apelante (ex. video_processing_loop,
+    generate_frames, get_intersections) - rutele Flask apar fiecare separat.
+    """
+
+    def __init__(self, enabled=False):
+        self._lock = threading.Lock()
+        self.enabled = enabled
+        self.since = time.time()
+        self._sites = {}
+        self._holder = None  # locul de apel al deținătorului curent
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1, _depth=1):
+        if not self.enabled:
+            # _holder aparține deținătorului curent - este atins doar după ce lock-ul este luat
+            if not self._lock.acquire(blocking, timeout):
+                return False
+            self._holder = None
+            return True
+        site = sys._getframe(_depth).f_code.co_name
+        waited = 0.0
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            started = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            waited = time.perf_counter() - started
+        self._acquired_at = time.perf_counter()
+        self._holder = site
+        stats = self._sites.get(site)
+        if stats is None:
+            stats = self._sites[site] = _SiteStats()
+        stats.acquisitions += 1
+        if waited:
+            stats.contended += 1
+            stats.wait_total += waited
+            if waited > stats.wait_max:
+                stats.wait_max = waited
+        LOCK_WAIT_SECONDS.observe(waited, site)
+        return True
+
+    def release(self):
+        site = self._holder
+        if site is not None:
+            held = time.perf_counter() - self._acquired_at
+            self._holder = None
+            stats = self._sites[site]
+            stats.hold_total += held
+            if held > stats.hold_max:
+                stats.hold_max = held
+            LOCK_HOLD_SECONDS.observe(held, site)
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire(_depth=2)
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def locked(self):
+        return self._lock.locked()
+
+    def reset(self):
+        """Șterge statisticile (histogramele Prometheus rămân cumulative)."""
+        with self._lock:
+            self._sites = {}
+            self.since = time.time()
+
+    def stats(self, top=10):
+        """Statisticile per loc de apel și primii `top` contestatari (după timpul total de așteptare)."""
+        with self._lock:
+            sites = {site: stats.to_dict() for site, stats in self._sites.items()}
+        ranked = sorted(sites, key=lambda site: sites[site]["wait_total_ms"], reverse=True)
+        return {
+            "enabled": self.enabled,
+            "since": self.since,
+            "sites": sites,
+            "top_contenders": [{"site": site, **sites[site]} for site in ranked[:top]],
+            "top_holders": sorted(({"site": site, **sites[site]} for site in sites),
+                                  key=lambda entry: entry["hold_total_ms"], reverse=True)[:top],
+        }
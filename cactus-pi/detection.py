@@ -0,0 +1,146 @@
+# Etapele pipeline-ului de detecție pentru un cadru: inferența YOLO și atribuirea
+# obiectelor detectate zonelor semafoarelor. Sunt folosite de bucla video din main.py
+# și de benchmark.py (același cod, măsurat pe etape).
+
+import cv2
+
+from eventlog import DEBUG, get_logger
+
+log = get_logger("detection")
+
+# Mapează COCO IDs la noile categorii de ieșire: "humans" sau "wheels"
+CLASS_MAP = {
+    0: "humans",
+    2: "wheels",
+    3: "wheels",
+    5: "wheels",
+    7: "wheels",
+    44: "wheels"
+}
+
+
+def empty_detection(intersection):
+    """Detecția inițială a unui cadru: fără obiecte, toate zonele intersecției inactive."""
+    zones_dict = {}
+    if intersection.type != "car_pedestrian":
+        # Inițializează zonele pentru fiecare light și zonă personalizată
+        for light_config in intersection.lights:
+            light_id = light_config.id
+            custom_zones = light_config.custom_zones
+            if custom_zones:
+                # Dacă există zone personalizate, inițializează-le
+                for zone_idx in range(len(custom_zones)):
+                    zones_dict[f"light_{light_id}_zone_{zone_idx}"] = False
+            else:
+                # Dacă nu există zone personalizate, folosește fallback la quadrants (0-3)
+                for zone_idx in range(4):
+                    zones_dict.setdefault(str(zone_idx), False)
+    else:
+        # Pentru car_pedestrian, folosește quadrants vechi
+        zones_dict = {"0": False, "1": False, "2": False, "3": False}
+    return {"humans": False, "wheels": False, "zones": zones_dict}
+
+
+def draw_guides(frame):
+    """Desenează liniile cadranelor (debug)."""
+    frame_height, frame_width = frame.shape[:2]
+    center_x = frame_width // 2
+    center_y = frame_height // 2
+    cv2.line(frame, (center_x, 0), (center_x, frame_height), (128, 128, 128), 1)
+    cv2.line(frame, (0, center_y), (frame_width, center_y), (128, 128, 128), 1)
+
+
+def run_inference(model, frame):
+    """Rulează YOLO pe cadru și returnează lista rezultatelor (inferența este completă la return)."""
+    return list(model.predict(frame, stream=True, verbose=False))
+
+
+def assign_zones(results, frame, intersection, class_map, detection, boxes=None):
+    """Atribuie obiectele detectate categoriilor și zonelor; actualizează `detection` pe loc.
+
+    boxes: listă opțională în care se adaugă fiecare obiect ca
+           (class_id, (x1, y1, x2, y2), confidence, zonele atinse, categoria)
+           - pentru draw_detections() și înregistrarea detecțiilor
+    """
+    intersection_id = intersection.id
+    frame_height, frame_width = frame.shape[:2]
+    center_x = frame_width // 2
+    center_y = frame_height // 2
+    # Zonele sunt salvate în coordonate canvas (640x480) - scalare la dimensiunile frame-ului
+    scale_x = frame_width / 640
+    scale_y = frame_height / 480
+    debug = log.enabled(DEBUG)
+
+    for r in results:
+        for box in r.boxes:
+            class_id = int(box.cls[0])
+            if class_id not in class_map:
+                continue
+            category = class_map[class_id]
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            center_box_x = (x1 + x2) // 2
+            center_box_y = (y1 + y2) // 2
+            box_zones = []
+
+            if category == "humans":
+                detection["humans"] = True
+            elif category == "wheels":
+                detection["wheels"] = True
+
+                # Pentru car_car și multi_approach, verifică zonele personalizate
+                if intersection.type != "car_pedestrian":
+                    # Verifică pentru fiecare light dacă obiectul intersectează zonele sale
+                    for light_config in intersection.lights:
+                        light_id = light_config.id
+
+                        # Zonele sunt validate de schema la încărcare - nu mai sunt verificate aici
+                        for zone_idx, zone in enumerate(light_config.custom_zones or ()):
+                            zone_x = int(zone.x * scale_x)
+                            zone_y = int(zone.y * scale_y)
+                            zone_right = zone_x + int(zone.width * scale_x)
+                            zone_bottom = zone_y + int(zone.height * scale_y)
+
+                            # Obiectul este detectat dacă există orice suprapunere cu zona
+                            if not (x2 < zone_x or x1 > zone_right or y2 < zone_y or y1 > zone_bottom):
+                                zone_key = f"light_{light_id}_zone_{zone_idx}"
+                                detection["zones"][zone_key] = True
+                                box_zones.append(zone_key)
+                                # Debug logging (cel mult o dată la 2 secunde per zonă)
+                                if debug:
+                                    log.debug("zone_hit", "[{intersection}] Detecție în {zone}: obiect {box} intersectează zona {area}",
+                                              every=2.0, per=("intersection", "zone"), intersection=intersection_id, zone=zone_key,
+                                              box=(x1, y1, x2, y2), area=(zone_x, zone_y, zone_right, zone_bottom))
+                else:
+                    # Pentru car_pedestrian, folosește logica veche cu quadrants
+                    if center_box_x < center_x:
+                        zone = 0 if center_box_y < center_y else 2  # top-left / bottom-left
+                    else:
+                        zone = 1 if center_box_y < center_y else 3  # top-right / bottom-right
+                    detection["zones"][str(zone)] = True
+                    box_zones.append(str(zone))
+
+            if boxes is not None:
+                boxes.append((class_id, (x1, y1, x2, y2), float(box.conf[0]), box_zones, category))
+    return detection
+
+
+def _zone_label(zone_key):
+    """Eticheta scurtă a zonei: "light_1_zone_0" -> "L1Z0", cadranele rămân "0"-"3"."""
+    if zone_key.startswith("light_"):
+        _, light_id, _, zone_idx = zone_key.split("_")
+        return f"L{light_id}Z{zone_idx}"
+    return zone_key
+
+
+def draw_detections(frame, boxes):
+    """Desenează bounding box-urile și etichetele obiectelor (pentru video feed)."""
+    for _, (x1, y1, x2, y2), confidence, box_zones, category in boxes:
+        if category == "humans":
+            color = (0, 255, 0)
+            label_text = "HUMANS"
+        else:
+            color = (0, 0, 255)
+            label_text = f"WHEELS-Z{_zone_label(box_zones[-1]) if box_zones else ''}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label = f"{label_text}: {confidence:.2f}"
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
@@ -0,0 +1,254 @@
+# Jurnal structurat de evenimente, în afara căii fierbinți.
+# Un apel de logare verifică nivelul și limita de rată a cheii, apoi adaugă o tuplă într-o
+# coadă deque (append atomic, fără lock) - mesajul NU este formatat pe firul apelant.
+# Un fir de fundal golește coada la fiecare FLUSH_INTERVAL, formatează mesajele și le scrie
+# în consolă (text sau JSON) și, opțional, într-un fișier JSON lines cu rotație.
+# Până la start() (unelte CLI: replay, simulare, benchmark-uri) scrierea este sincronă.
+#
+# Utilizare:
+#   log = get_logger("state_machine")
+#   log.info("phase", "[{intersection}] {previous} -> {phase}", intersection=..., previous=..., phase=...)
+#   log.debug("zone_hit", "...", every=2.0, per="zone", zone=zone_key, ...)  # cel mult o dată la 2s per zonă
+#   (per poate fi și un tuplu de câmpuri: per=("intersection", "zone"))
+#   log.error("tick", "⚠ Eroare la tick pentru {intersection}: {error}", exc=True, ...)
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from metrics import REGISTRY
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+QUEUE_SIZE = 10000  # înregistrări în așteptare; peste această limită cele mai vechi sunt pierdute
+FLUSH_INTERVAL = 0.1  # secunde între golirile cozii
+JSON_MAX_BYTES = 5 * 1024 * 1024  # fișierul JSON lines este rotit (un singur .1) peste această dimensiune
+
+LOG_RECORDS = REGISTRY.counter("cactus_log_records_total", "Înregistrări de jurnal scrise", ("level",))
+LOG_SUPPRESSED = REGISTRY.counter("cactus_log_suppressed_total", "Înregistrări suprimate de limita de rată")
+LOG_DROPPED = REGISTRY.counter("cactus_log_dropped_total", "Înregistrări pierdute (coadă plină)")
+
+
+def parse_level(level):
+    """"INFO" / "info" / 20 -> 20; ridică ValueError pentru un nivel necunoscut."""
+    if isinstance(level, int):
+        return level
+    for value, name in LEVEL_NAMES.items():
+        if name == str(level).upper():
+            return value
+    raise ValueError(f"nivel de jurnal necunoscut: {level!r}")
+
+
+class EventLog:
+    """Coada înregistrărilor și firul care le scrie.
+
+    Înregistrare: (timp, nivel, logger, eveniment, mesaj, câmpuri, suprimate, excepție);
+    mesajul este un șablon str.format() completat cu câmpurile, sau o funcție(câmpuri) -> text.
+    """
+
+    def __init__(self, level=INFO, console_format="text", json_path=None, json_max_bytes=JSON_MAX_BYTES,
+                 queue_size=QUEUE_SIZE, stream=None):
+        self.level = parse_level(level)
+        self.console_format = console_format
+        self.json_path = json_path
+        self.json_max_bytes = json_max_bytes
+        self.stream = stream  # None = sys.stdout la momentul scrierii
+        self._queue = deque(maxlen=queue_size)
+        self._thread = None
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._json_file = None
+        self.dropped = 0
+
+    def configure(self, level=None, console_format=None, json_path=None):
+        if level is not None:
+            self.level = parse_level(level)
+        if console_format is not None:
+            if console_format not in ("text", "json", "none"):
+                raise ValueError(f"format de consolă necunoscut: {console_format!r}")
+            self.console_format = console_format
+        if json_path is not None:
+            with self._write_lock:
+                self._close_json()
+                self.json_path = json_path or None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="eventlog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Oprește firul de scriere și scrie tot ce a rămas în coadă."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._close_json()
+
+    def submit(self, record):
+        if self._thread is None:
+            self._write([record])
+            return
+        if len(self._queue) == self._queue.maxlen:
+            # EDGE CASE 57: Firul de scriere nu ține pasul (consolă / card lent) - se pierd cele
+            # mai vechi înregistrări, bucla de detecție nu este blocată niciodată
+            self.dropped += 1
+            LOG_DROPPED.inc()
+        self._queue.append(record)
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.popleft())
+            except IndexError:
+                break
+        if batch:
+            self._write(batch)
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                # Jurnalul nu are unde raporta propriile erori - continuă cu următorul lot
+                traceback.print_exc()
+
+    def _write(self, batch):
+        console, lines = [], []
+        for record in batch:
+            created, level, logger, event, message, fields, suppressed, exc = record
+            try:
+                text = message(fields) if callable(message) else message.format(**fields)
+            except Exception as e:
+                text = f"{message!r} (formatare eșuată: {e})"
+            LOG_RECORDS.labels(LEVEL_NAMES.get(level, level)).inc()
+            if self.console_format == "text":
+                console.append(text + (f" (+{suppressed} suprimate)" if suppressed else "") + "\n")
+                if exc:
+                    console.append(exc)
+            if self.console_format == "json" or self.json_path:
+                entry = {"ts": created, "level": LEVEL_NAMES.get(level, level), "logger": logger,
+                         "event": event, "msg": text}
+                entry.update(fields)
+                if suppressed:
+                    entry["suppressed"] = suppressed
+                if exc:
+                    entry["exc"] = exc
+                lines.append(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        with self._write_lock:
+            stream = self.stream or sys.stdout
+            if console:
+                stream.write("".join(console))
+            elif self.console_format == "json" and lines:
+                stream.write("".join(lines))
+            stream.flush()
+            if self.json_path and lines:
+                self._write_json("".join(lines))
+
+    def _write_json(self, data):
+        try:
+            if self._json_file is None:
+                self._json_file = open(self.json_path, "a", encoding="utf-8")
+            self._json_file.write(data)
+            self._json_file.flush()
+            if self._json_file.tell() > self.json_max_bytes:
+                self._close_json()
+                os.replace(self.json_path, self.json_path + ".1")
+        except OSError as e:
+            # EDGE CASE 58: Fișierul JSON nu poate fi scris - jurnalul rămâne doar în consolă
+            print(f"⚠ Jurnal JSON dezactivat ({self.json_path}): {e}", file=sys.stderr)
+            self._close_json()
+            self.json_path = None
+
+    def _close_json(self):
+        if self._json_file is not None:
+            try:
+                self._json_file.close()
+            except OSError:
+                pass
+            self._json_file = None
+
+
+class Logger:
+    """Logger-ul unei componente; toate metodele sunt sigure din orice fir."""
+
+    def __init__(self, name, sink):
+        self.name = name
+        self.sink = sink
+        self._limits = {}  # {(eveniment, valorile câmpurilor `per`): [ultima emitere, suprimate]}
+
+    def enabled(self, level):
+        return level >= self.sink.level
+
+    def log(self, level, event, message, every=None, per=None, exc=False, **fields):
+        if level < self.sink.level:
+            return
+        suppressed = 0
+        if every is not None:
+            if per is None:
+                key = event
+            elif isinstance(per, str):
+                key = (event, fields.get(per))
+            else:
+                key = (event,) + tuple(fields.get(name) for name in per)
+            now = time.monotonic()
+            limit = self._limits.get(key)
+            if limit is None:
+                self._limits[key] = [now, 0]
+            elif now - limit[0] < every:
+                limit[1] += 1
+                LOG_SUPPRESSED.inc()
+                return
+            else:
+                suppressed = limit[1]
+                limit[0], limit[1] = now, 0
+        # Traceback-ul se ia pe firul apelant (sys.exc_info este per fir)
+        self.sink.submit((time.time(), level, self.name, event, message, fields, suppressed,
+                          traceback.format_exc() if exc else None))
+
+    def debug(self, event, message, **kwargs):
+        self.log(DEBUG, event, message, **kwargs)
+
+    def info(self, event, message, **kwargs):
+        self.log(INFO, event, message, **kwargs)
+
+    def warning(self, event, message, **kwargs):
+        self.log(WARNING, event, message, **kwargs)
+
+    def error(self, event, message, **kwargs):
+        self.log(ERROR, event, message, **kwargs)
+
+
+SINK = EventLog()
+_loggers = {}
+
+
+def get_logger(name):
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers.setdefault(name, Logger(name, SINK))
+    return logger
+
+
+def configure(level=None, console_format=None, json_path=None):
+    SINK.configure(level, console_format, json_path)
+
+
+def start():
+    SINK.start()
+
+
+def shutdown():
+    SINK.stop()
@@ -0,0 +1,154 @@
+# Buffere de cadre prealocate și reutilizate, fără alocări în regim staționar.
+# Fiecare cameră citește în buffere dintr-un FramePool propriu (cap.read(buffer) scrie pe loc),
+# iar cadrul citit este publicat ca Frame: o vedere doar pentru citire, cu numărare de referințe.
+# Consumatorii (bucla de detecție, global_frame, fluxurile video) iau o referință cu acquire()
+# și o eliberează cu release(); la ultima eliberare bufferul revine în pool pentru citirea
+# următoare, deci un cadru nu este copiat ca să fie împărțit între consumatori.
+# Un Frame neeliberat (ex. după o excepție) nu blochează nimic: bufferul lui este colectat de
+# Python, iar pool-ul alocă unul nou la nevoie (numărat în cactus_frame_pool_allocations_total).
+#
+# Utilizare:
+#   pool = FramePool("depou-001", "capture")
+#   buffer = pool.take()                      # None până când pool-ul cunoaște formatul cadrelor
+#   ok, image = cap.read(buffer)
+#   frame = pool.wrap(image, buffer)          # referința apelantului
+#   shared = frame.acquire(); ...; shared.release()
+#   frame.release()
+
+import threading
+
+import numpy as np
+
+from metrics import REGISTRY
+
+POOL_CAPACITY = 4  # buffere libere păstrate per pool; cele în plus sunt lăsate colectorului
+
+FRAME_POOL_ALLOCATIONS = REGISTRY.counter("cactus_frame_pool_allocations_total",
+                                          "Buffere de cadre alocate (în regim staționar nu crește)",
+                                          ("intersection", "pool"))
+
+
+class Frame:
+    """Un cadru dintr-un FramePool, cu numărare de referințe.
+
+    image: vederea doar pentru citire a bufferului (sau bufferul însuși, de scris, până la
+           freeze() - pentru cadrele desenate de bucla de detecție)
+    """
+
+    __slots__ = ("image", "_buffer", "_pool", "_refs")
+
+    def __init__(self, pool, buffer, writable=False):
+        self._pool = pool
+        self._buffer = buffer
+        self._refs = 1
+        self.image = buffer
+        if not writable:
+            self.freeze()
+
+    @property
+    def shape(self):
+        return self._buffer.shape
+
+    def freeze(self):
+        """Publică cadrul: de acum `image` este doar pentru citire."""
+        view = self._buffer.view()
+        view.flags.writeable = False
+        self.image = view
+        return self
+
+    def acquire(self):
+        """O referință nouă la același cadru (fără copie); returnează cadrul."""
+        with self._pool.lock:
+            if self._refs <= 0:
+                raise RuntimeError("cadrul a fost deja eliberat")
+            self._refs += 1
+        return self
+
+    def release(self):
+        """Eliberează o referință; la ultima, bufferul revine în pool."""
+        with self._pool.lock:
+            self._refs -= 1
+            if self._refs != 0:
+                if self._refs < 0:
+                    raise RuntimeError("cadrul a fost eliberat de prea multe ori")
+                return
+            buffer, self._buffer = self._buffer, None
+            self.image = None
+            self._pool._recycle(buffer)
+
+
+class FramePool:
+    """Bufferele libere pentru cadrele unei surse; formatul (shape, dtype) este al ultimului cadru.
+
+    Toate metodele sunt sigure din orice fir; take() nu blochează niciodată - dacă toate
+    bufferele sunt ținute de consumatori, este alocat unul nou.
+    """
+
+    def __init__(self, intersection_id, kind, capacity=POOL_CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self._free = []
+        self._format = None  # (shape, dtype) al bufferelor din pool
+        self._allocations = FRAME_POOL_ALLOCATIONS.labels(intersection_id, kind)
+        self.allocated = 0
+
+    def _set_format(self, shape, dtype):
+        """Schimbă formatul bufferelor (sub lock); cele libere de alt format sunt aruncate."""
+        fmt = (tuple(shape), np.dtype(dtype))
+        if fmt != self._format:
+            self._format = fmt
+            self._free.clear()
+
+    def take(self, shape=None, dtype=np.uint8):
+        """Un buffer liber, de scris. Cu `shape` este alocat unul nou dacă pool-ul este gol;
+        fără, returnează None dacă pool-ul este gol (cititorul alocă singur - vezi wrap)."""
+        with self.lock:
+            if shape is not None:
+                self._set_format(shape, dtype)
+            if self._free:
+                return self._free.pop()
+            if shape is None:
+                return None
+        return self._allocate(shape, dtype)
+
+    def _allocate(self, shape, dtype):
+        with self.lock:
+            self.allocated += 1
+        self._allocations.inc()
+        return np.empty(shape, dtype)
+
+    def wrap(self, image, buffer=None):
+        """Cadrul citit de o sursă în `buffer` (de la take). Dacă sursa a returnat alt tablou
+        (buffer None, alt format, backend care nu scrie pe loc), acesta este adoptat de pool."""
+        if image is not buffer:
+            # EDGE CASE 69: Sursa a alocat un tablou propriu (primul cadru, format schimbat
+            # sau un backend care ignoră bufferul) - tabloul devine bufferul cadrului,
+            # iar bufferul nefolosit revine în pool
+            with self.lock:
+                self._set_format(image.shape, image.dtype)
+                self.allocated += 1
+            self._allocations.inc()
+            if buffer is not None:
+                self.put(buffer)
+        return Frame(self, image)
+
+    def copy(self, image):
+        """Un cadru nou, de scris, cu o copie a lui `image` (ex. pentru desenarea detecțiilor);
+        apelantul îl publică cu freeze()."""
+        buffer = self.take(image.shape, image.dtype)
+        np.copyto(buffer, image)
+        return Frame(self, buffer, writable=True)
+
+    def put(self, buffer):
+        """Returnează un buffer nefolosit (ex. după o citire eșuată)."""
+        with self.lock:
+            self._recycle(buffer)
+
+    def _recycle(self, buffer):
+        # Sub lock. Bufferele de alt format (formatul s-a schimbat între timp) și cele peste
+        # capacitate sunt lăsate colectorului
+        if len(self._free) < self.capacity and (buffer.shape, buffer.dtype) == self._format:
+            self._free.append(buffer)
+
+    def stats(self):
+        return {"free": len(self._free), "allocated": self.allocated}
@@ -0,0 +1,178 @@
+# Planificarea inferenței YOLO între camere, într-un buget de timp al buclei de detecție.
+# Fiecare cameră are o prioritate dată de starea intersecției (vezi detection_priority) și o
+# rată țintă de detecție pentru acea prioritate. Costul unei inferențe este măsurat per cameră;
+# dacă suma (rată × cost) depășește bugetul, ratele sunt reduse treptat: fiecare cameră își
+# păstrează rata minimă, iar restul bugetului este dat în ordinea priorităților - camerele care
+# așteaptă o detecție pe linia verde sunt ultimele încetinite. Sub buget, rezerva rămasă este
+# dată tot în ordinea priorităților, peste rata țintă, până la MAX_FPS (rata buclei) - cu
+# sarcină mică fiecare cameră detectează pe fiecare cadru nou, ca înainte de planificator, iar
+# rata țintă este doar nivelul garantat când procesorul nu ajunge pentru toate.
+# O cameră întârziată nu "recuperează" inferențele pierdute: următoarea este programată de la
+# momentul ultimei.
+#
+# Utilizare (bucla de detecție):
+#   scheduler.update({"depou-001": "waiting", "depou-002": "idle"})  # la fiecare ciclu
+#   if scheduler.due("depou-001", now): ...inferență...; scheduler.record("depou-001", now, cost)
+#   time.sleep(scheduler.sleep_time(time.monotonic()))
+
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from phase_engine import GREEN
+
+INFERENCE_CPU_BUDGET = 0.8  # fracțiunea din timpul buclei de detecție rezervată inferenței
+PRIORITIES = ("waiting", "active", "clearance", "idle")  # în ordinea descrescătoare a priorității
+TARGET_FPS = {"waiting": 10.0, "active": 5.0, "clearance": 1.0, "idle": 1.0}  # rata garantată sub buget
+MIN_FPS = {"waiting": 2.0, "active": 1.0, "clearance": 0.2, "idle": 0.2}  # rata păstrată la suprasarcină
+MAX_FPS = 30.0  # plafonul ratei cu buget rămas (bucla preia cadre la ~1/MAX_SLEEP)
+COST_SMOOTHING = 0.2  # ponderea ultimei inferențe în media exponențială a costului
+RATE_WINDOW = 5.0  # secunde peste care este măsurată rata obținută
+MIN_SLEEP = 0.01  # pauza minimă a buclei între cicluri (secunde)
+MAX_SLEEP = 0.033  # pauza maximă - bucla preia cadrele noi pentru fluxul video (~30 FPS)
+
+INFERENCE_TARGET_FPS = REGISTRY.gauge("cactus_inference_target_fps",
+                                      "Rata de inferență alocată camerei de planificator", ("intersection",))
+INFERENCE_LOAD = REGISTRY.gauge("cactus_inference_load",
+                                "Cererea de inferență la ratele țintă raportată la buget (>1 = suprasarcină)")
+
+
+def detection_priority(machine):
+    """Prioritatea detecției pentru intersecția condusă de `machine` (None = fără state machine).
+    waiting   - Automatic, verde infinit pe linia verde: o detecție declanșează tranziția
+    active    - Automatic, verde cu timer: detecția prelungește verdele sau alege etapa următoare
+    clearance - Automatic, galben / all-red: detecțiile sunt ignorate până la verde
+    idle      - Manual / Override (sau detector orb): detecția nu este folosită
+    """
+    if machine is None or machine.mode != "Automatic":
+        return "idle"
+    if machine.table.kind[machine.phase] != GREEN:
+        return "clearance"
+    if machine.deadline is None:
+        return "waiting"
+    return "active"
+
+
+class InferenceScheduler:
+    """Ratele de inferență per cameră, recalculate la fiecare ciclu al buclei de detecție.
+    Este folosit doar de firul buclei; report() poate fi apelat din alte fire (doar citește)."""
+
+    def __init__(self, budget=INFERENCE_CPU_BUDGET, clock=time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.priority = {}  # {id: prioritate}
+        self.allocated = {}  # {id: rata alocată (inferențe/s)}
+        self.cost = {}  # {id: secunde per inferență, medie exponențială}
+        self.next_due = {}  # {id: momentul (monoton) următoarei inferențe}
+        self.load = 0.0
+        self._history = {}  # {id: deque cu momentele inferențelor din ultimele RATE_WINDOW secunde}
+        self._since = {}  # {id: momentul primei programări} - rata obținută la început
+
+    def update(self, priorities):
+        """Preia prioritățile camerelor ({id: prioritate}) și realocă bugetul."""
+        now = self.clock()
+        for intersection_id in [i for i in self.priority if i not in priorities]:
+            for table in (self.allocated, self.cost, self.next_due, self._history, self._since):
+                table.pop(intersection_id, None)
+            INFERENCE_TARGET_FPS.remove(intersection_id)
+        for intersection_id in priorities:
+            self._since.setdefault(intersection_id, now)
+        self.priority = dict(priorities)
+        self._allocate()
+
+    def _allocate(self):
+        # O cameră fără cost măsurat primește rata țintă - prima inferență îl măsoară
+        target = {i: TARGET_FPS[p] for i, p in self.priority.items()}
+        floor = {i: min(MIN_FPS[p], target[i]) for i, p in self.priority.items()}
+        demand = sum(target[i] * self.cost.get(i, 0.0) for i in target)
+        self.load = demand / self.budget if self.budget > 0 else 0.0
+        INFERENCE_LOAD.set(self.load)
+        if demand <= self.budget:
+            # Rezerva trece peste țintă doar pentru camerele cu cost măsurat - altfel costul
+            # necunoscut (0) le-ar da plafonul fără să consume din buget
+            ceiling = {i: max(target[i], MAX_FPS) if i in self.cost else target[i] for i in target}
+            allocated = self._fill(target, ceiling, self.budget - demand)
+        else:
+            floor_demand = sum(floor[i] * self.cost.get(i, 0.0) for i in floor)
+            if floor_demand >= self.budget:
+                # EDGE CASE 70: Nici ratele minime nu încap în buget (prea multe camere sau un
+                # procesor prea lent) - toate sunt reduse proporțional, nicio cameră nu este oprită
+                scale = self.budget / floor_demand
+                allocated = {i: rate * scale for i, rate in floor.items()}
+            else:
+                allocated = self._fill(floor, target, self.budget - floor_demand)
+        self.allocated = allocated
+        for intersection_id, rate in allocated.items():
+            INFERENCE_TARGET_FPS.labels(intersection_id).set(rate)
+            # O rată mărită (ex. intersecția a ajuns pe linia verde) se aplică imediat, nu după
+            # perioada lungă programată la rata veche
+            history = self._history.get(intersection_id)
+            if history and intersection_id in self.next_due:
+                self.next_due[intersection_id] = min(self.next_due[intersection_id], history[-1] + 1.0 / rate)
+
+    def _fill(self, base, ceiling, remaining):
+        """Ratele `base` crescute spre `ceiling` cu bugetul `remaining`, în ordinea priorităților;
+        grupul la care bugetul se termină primește aceeași fracțiune din creștere."""
+        allocated = dict(base)
+        for priority in PRIORITIES:
+            group = [i for i, p in self.priority.items() if p == priority]
+            extra = sum((ceiling[i] - base[i]) * self.cost.get(i, 0.0) for i in group)
+            share = 1.0 if extra <= remaining else remaining / extra
+            for i in group:
+                allocated[i] = base[i] + (ceiling[i] - base[i]) * share
+            remaining = max(0.0, remaining - extra)
+        return allocated
+
+    def rank(self, intersection_id):
+        """Cheia de sortare a camerelor într-un ciclu: prioritatea, apoi întârzierea."""
+        priority = self.priority.get(intersection_id, "idle")
+        return PRIORITIES.index(priority), self.next_due.get(intersection_id, 0.0)
+
+    def due(self, intersection_id, now):
+        """Camera trebuie să ruleze inferența pe cadrul curent."""
+        return now >= self.next_due.get(intersection_id, 0.0)
+
+    def record(self, intersection_id, started, cost):
+        """O inferență începută la `started` (monoton) a durat `cost` secunde."""
+        previous = self.cost.get(intersection_id)
+        self.cost[intersection_id] = cost if previous is None else previous + COST_SMOOTHING * (cost - previous)
+        period = 1.0 / (self.allocated.get(intersection_id) or TARGET_FPS["idle"])
+        due = self.next_due.get(intersection_id, started)
+        # Ritmul se păstrează de la momentul programat; fără recuperare: o inferență întârziată
+        # mai mult de o perioadă reprogramează de la `started`
+        self.next_due[intersection_id] = due + period if started - due <= period else started + period
+        history = self._history.get(intersection_id)
+        if history is None:
+            history = self._history[intersection_id] = deque()
+        history.append(started)
+        while history and history[0] < started - RATE_WINDOW:
+            history.popleft()
+
+    def sleep_time(self, now):
+        """Pauza buclei până la următoarea inferență programată (între MIN_SLEEP și MAX_SLEEP)."""
+        due = min((self.next_due.get(i, now) for i in self.priority), default=now + MAX_SLEEP)
+        return min(MAX_SLEEP, max(MIN_SLEEP, due - now))
+
+    def achieved(self, intersection_id, now):
+        # Copia se face atomic - bucla de detecție poate adăuga între timp
+        history = list(self._history.get(intersection_id, ()))
+        if not history:
+            return 0.0
+        window = min(RATE_WINDOW, now - self._since.get(intersection_id, now))
+        count = sum(1 for t in history if t >= now - RATE_WINDOW)
+        return count / window if window > 0 else 0.0
+
+    def report(self, now=None):
+        """Ratele țintă, alocate și obținute per cameră, pentru API."""
+        now = self.clock() if now is None else now
+        cameras = {}
+        for intersection_id, priority in list(self.priority.items()):
+            cost = self.cost.get(intersection_id)
+            cameras[intersection_id] = {
+                "priority": priority,
+                "targetFps": TARGET_FPS[priority],
+                "allocatedFps": round(self.allocated.get(intersection_id, 0.0), 2),
+                "achievedFps": round(self.achieved(intersection_id, now), 2),
+                "costMs": None if cost is None else round(cost * 1000, 2),
+            }
+        return {"budget": self.budget, "load": round(self.load, 3), "cameras": cameras}
@@ -0,0 +1,411 @@
+# Test de încărcare al aplicației complete (main.py): pornește serverul într-un proces separat,
+# cu modelul fals din stub_model.py și o sursă de cadre din fișiere, apoi simulează:
+#   - N clienți care interoghează /intersections și /traffic_lights,
+#   - M clienți conectați la /video_feed,
+#   - rafale de comenzi /intersections/<id>/control (simulate / set_mode).
+# Raportul JSON (latențele API, FPS-ul buclei video, fluxurile, contenția lock-ului) include
+# revizia git și parametrii, ca rulările pe versiuni diferite să poată fi comparate cu --compare.
+#
+# Utilizare:
+#   python loadtest.py --clients 8 --streams 2 --duration 30 --out load-new.json
+#   python loadtest.py --source videos/trafic.mp4 --latency 0.03 --out load-new.json --compare load-old.json
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmark import stage_summary
+from stub_model import synthetic_frame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+READY_TIMEOUT = 30.0  # secunde de așteptare a serverului
+SYNTHETIC_FRAMES = 60  # imagini generate când nu este dată o sursă
+SYNTHETIC_SIZE = (640, 480)
+REQUEST_TIMEOUT = 5.0
+# Comenzile dintr-o rafală, în ordine ciclică (modul rămâne Automatic la final)
+BURST_ACTIONS = (
+    {"action": "simulate", "type": "car"},
+    {"action": "simulate", "type": "ped"},
+    {"action": "simulate", "type": "none"},
+    {"action": "set_mode", "mode": "Automatic"},
+)
+
+
+# --- Procesul server (--serve) ---
+
+class _LampHandler(BaseHTTPRequestHandler):
+    """Înlocuitor pentru cod.py: acceptă comenzile de pin fără hardware."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(args):
+    """Rulează main.py în directorul de lucru, cu modelul fals și semaforul fals."""
+    os.chdir(args.workdir)
+    lamp = ThreadingHTTPServer(("127.0.0.1", 0), _LampHandler)
+    threading.Thread(target=lamp.serve_forever, daemon=True).start()
+
+    import main
+    from stub_model import StubModel
+
+    main.TRAFFIC_LIGHT_API_URL = f"http://127.0.0.1:{lamp.server_address[1]}/control"
+    main.start(StubModel(args.boxes, args.latency, args.seed))
+    main.serve(host="127.0.0.1", port=args.port)
+
+
+# --- Pregătire ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synthetic_frames(directory, count=SYNTHETIC_FRAMES, size=SYNTHETIC_SIZE):
+    """Scrie `count` imagini JPEG generate în director (sursa implicită a testului)."""
+    import cv2
+
+    os.makedirs(directory, exist_ok=True)
+    for index in range(count):
+        cv2.imwrite(os.path.join(directory, f"frame-{index:04d}.jpg"), synthetic_frame(*size, index))
+    return directory
+
+
+def prepare_workdir(workdir, config_path, source, fps):
+    """Copiază configurația în directorul de lucru cu sursa de cadre setată pentru toate intersecțiile."""
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    if source is None:
+        source = synthetic_frames(os.path.join(workdir, "frames"))
+    for intersection in config.get("intersections", []):
+        intersection["source"] = {"path": os.path.abspath(source), "pacing": "realtime", "loop": True, "fps": fps}
+    with open(os.path.join(workdir, "intersections.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    return [intersection["id"] for intersection in config.get("intersections", [])]
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return f"{revision}-dirty" if revision and dirty else (revision or None)
+
+
+def wait_ready(base_url, process):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"✗ Serverul s-a oprit la pornire (cod {process.returncode})")
+        try:
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"✗ Serverul nu a răspuns în {READY_TIMEOUT:.0f}s")
+
+
+def scrape(base_url, name):
+    """Valorile metricii `name` din /metrics: {"etichete": valoare}."""
+    values = {}
+    for line in requests.get(f"{base_url}/metrics", timeout=REQUEST_TIMEOUT).text.splitlines():
+        if line.startswith(name) and not line.startswith(name + "_"):
+            key, _, value = line.rpartition(" ")
+            values[key[len(name):]] = float(value)
+    return values
+
+
+# --- Clienți ---
+
+class Samples:
+    """Latențele (secunde) și erorile per endpoint, colectate din mai multe fire."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, endpoint, started, ok):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        with self._lock:
+            endpoints = {endpoint: list(values) for endpoint, values in self.latencies.items()}
+            errors = dict(self.errors)
+        result = {}
+        for endpoint, values in sorted(endpoints.items()):
+            stats = stage_summary(values)
+            stats.pop("per_second", None)
+            stats["errors"] = errors.get(endpoint, 0)
+            stats["rps"] = len(values) / duration if duration > 0 else None
+            result[endpoint] = stats
+        return result
+
+
+def _request(session, samples, endpoint, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        samples.add(endpoint, started, response.status_code == 200)
+    except requests.RequestException:
+        samples.add(endpoint, started, False)
+
+
+def poller(base_url, samples, stop):
+    session = requests.Session()
+    while not stop.is_set():
+        _request(session, samples, "GET /intersections", "GET", f"{base_url}/intersections")
+        _request(session, samples, "GET /traffic_lights", "GET", f"{base_url}/traffic_lights")
+
+
+def stream_consumer(base_url, stream_stats, index, stop):
+    """Citește /video_feed și numără cadrele (delimitatorul multipart) și octeții primiți."""
+    stats = stream_stats[index] = {"frames": 0, "bytes": 0, "first_frame_ms": None, "errors": 0}
+    started = time.perf_counter()
+    try:
+        with requests.get(f"{base_url}/video_feed", stream=True, timeout=REQUEST_TIMEOUT) as response:
+            tail = b""
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                data = tail + chunk
+                frames = data.count(b"--frame\r\n")
+                if frames and stats["first_frame_ms"] is None:
+                    stats["first_frame_ms"] = (time.perf_counter() - started) * 1e3
+                stats["frames"] += frames
+                stats["bytes"] += len(chunk)
+                tail = data[-9:]  # delimitatorul poate fi împărțit între două bucăți
+                if stop.is_set():
+                    break
+    except requests.RequestException:
+        stats["errors"] += 1
+
+
+def burster(base_url, samples, intersection_ids, burst_size, interval, stop):
+    """La fiecare `interval` secunde trimite `burst_size` comenzi simultan, pe intersecții alternate."""
+    sessions = [requests.Session() for _ in range(burst_size)]
+    sequence = 0
+    with ThreadPoolExecutor(max_workers=burst_size) as pool:
+        while not stop.wait(interval):
+            futures = []
+            for session in sessions:
+                intersection_id = intersection_ids[sequence % len(intersection_ids)]
+                body = BURST_ACTIONS[sequence % len(BURST_ACTIONS)]
+                sequence += 1
+                futures.append(pool.submit(_request, session, samples, "POST /intersections/<id>/control", "POST",
+                                           f"{base_url}/intersections/{intersection_id}/control", json=body))
+            for future in futures:
+                future.result()
+
+
+# --- Raport ---
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cactus-load-")
+    intersection_ids = prepare_workdir(workdir, args.config, args.source, args.fps)
+    if not intersection_ids:
+        raise SystemExit(f"✗ Nicio intersecție în {args.config}")
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = os.path.join(workdir, "server.log")
+
+    command = [sys.executable, os.path.join(HERE, "loadtest.py"), "--serve", "--workdir", workdir,
+               "--port", str(port), "--boxes", str(args.boxes), "--latency", str(args.latency),
+               "--seed", str(args.seed)]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (HERE, os.environ.get("PYTHONPATH")))))
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+    print(f"Server pornit pe {base_url} (log: {log_path})")
+
+    try:
+        wait_ready(base_url, process)
+        requests.post(f"{base_url}/lock_stats", json={"enabled": True}, timeout=REQUEST_TIMEOUT)
+        time.sleep(args.warmup)
+        requests.post(f"{base_url}/lock_stats", json={"reset": True}, timeout=REQUEST_TIMEOUT)
+
+        samples = Samples()
+        stream_stats = {}
+        stop = threading.Event()
+        threads = [threading.Thread(target=poller, args=(base_url, samples, stop)) for _ in range(args.clients)]
+        threads += [threading.Thread(target=stream_consumer, args=(base_url, stream_stats, index, stop))
+                    for index in range(args.streams)]
+        if args.burst_size > 0:
+            threads.append(threading.Thread(target=burster, args=(base_url, samples, intersection_ids,
+                                                                  args.burst_size, args.burst_interval, stop)))
+
+        print(f"Încărcare: {args.clients} clienți API, {args.streams} fluxuri video, "
+              f"rafale de {args.burst_size} comenzi la {args.burst_interval}s, timp de {args.duration}s...")
+        frames_before = scrape(base_url, "cactus_frames_total")
+        started = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        time.sleep(args.duration)
+        frames_after = scrape(base_url, "cactus_frames_total")
+        elapsed = time.perf_counter() - started
+        inference = requests.get(f"{base_url}/inference", timeout=REQUEST_TIMEOUT).json()
+        lock_stats = requests.get(f"{base_url}/lock_stats?top=5", timeout=REQUEST_TIMEOUT).json()
+        stop.set()
+        for thread in threads:
+            thread.join(REQUEST_TIMEOUT * 2)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    per_intersection = {}
+    for labels, value in frames_after.items():
+        frames = value - frames_before.get(labels, 0.0)
+        per_intersection[labels.split('"')[1] if '"' in labels else labels] = {
+            "frames": int(frames), "fps": frames / elapsed}
+    stream_frames = sum(stats["frames"] for stats in stream_stats.values())
+    first_frames = [stats["first_frame_ms"] for stats in stream_stats.values() if stats["first_frame_ms"] is not None]
+    return {
+        "revision": git_revision(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "params": {key: getattr(args, key) for key in ("clients", "streams", "burst_size", "burst_interval",
+                                                       "duration", "warmup", "boxes", "latency", "seed", "fps")},
+        "source": args.source or "synthetic",
+        "elapsed_s": elapsed,
+        "api": samples.summary(elapsed),
+        "video_loop": {
+            "fps": sum(entry["fps"] for entry in per_intersection.values()) / max(1, len(per_intersection)),
+            "intersections": per_intersection,
+        },
+        "inference": inference,
+        "streams": {
+            "clients": args.streams,
+            "frames": stream_frames,
+            "fps_per_client": stream_frames / elapsed / args.streams if args.streams else None,
+            "mbytes_per_s": sum(stats["bytes"] for stats in stream_stats.values()) / elapsed / 1e6,
+            "first_frame_ms": max(first_frames) if first_frames else None,
+            "errors": sum(stats["errors"] for stats in stream_stats.values()),
+        },
+        "lock": {"top_contenders": lock_stats.get("top_contenders", []),
+                 "top_holders": lock_stats.get("top_holders", [])},
+    }
+
+
+def print_report(report):
+    print(f"\n✓ Revizia {report['revision']} - {report['elapsed_s']:.1f}s sub încărcare")
+    for endpoint, stats in report["api"].items():
+        if not stats["count"]:
+            continue
+        print(f"  {endpoint:<34} {stats['rps']:7.1f} req/s  p50 {stats['p50_ms']:7.2f}ms  "
+              f"p95 {stats['p95_ms']:7.2f}ms  p99 {stats['p99_ms']:7.2f}ms  erori {stats['errors']}")
+    print(f"  bucla video: {report['video_loop']['fps']:.1f} FPS per intersecție")
+    inference = report.get("inference")
+    if inference:
+        print(f"  inferență: încărcare {inference['load']:.2f} din buget")
+        for intersection_id, entry in inference["cameras"].items():
+            print(f"    {intersection_id:<20} {entry['priority']:<10} {entry['achievedFps']:5.1f} / "
+                  f"{entry['allocatedFps']:5.1f} FPS (țintă {entry['targetFps']:.0f}, cost {entry['costMs']}ms)")
+    streams = report["streams"]
+    if streams["clients"]:
+        print(f"  fluxuri: {streams['fps_per_client']:.1f} cadre/s per client, "
+              f"{streams['mbytes_per_s']:.2f} MB/s, erori {streams['errors']}")
+    for entry in report["lock"]["top_contenders"][:3]:
+        print(f"  lock: {entry['site']:<28} așteptare totală {entry['wait_total_ms']:8.1f}ms  "
+              f"max {entry['wait_max_ms']:6.2f}ms")
+
+
+def _comparable(report):
+    """Valorile numerice urmărite între versiuni: {nume: (valoare, mai mare e mai bine)}."""
+    values = {"video_loop.fps": (report["video_loop"]["fps"], True)}
+    if report["streams"]["fps_per_client"] is not None:
+        values["streams.fps_per_client"] = (report["streams"]["fps_per_client"], True)
+    for endpoint, stats in report["api"].items():
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if key in stats:
+                values[f"{endpoint} {key}"] = (stats[key], False)
+        values[f"{endpoint} rps"] = (stats.get("rps") or 0.0, True)
+    return values
+
+
+def compare(old, new):
+    print(f"\nComparație {old.get('revision')} -> {new.get('revision')}:")
+    if old.get("params") != new.get("params"):
+        print("  ⚠ Parametrii rulărilor diferă - comparația nu este directă")
+    old_values, new_values = _comparable(old), _comparable(new)
+    for name, (value, higher_is_better) in new_values.items():
+        if name not in old_values:
+            continue
+        previous = old_values[name][0]
+        change = (value - previous) / previous * 100 if previous else 0.0
+        better = change >= 0 if higher_is_better else change <= 0
+        mark = "✓" if better or abs(change) < 5 else "⚠"
+        print(f"  {mark} {name:<44} {previous:10.2f} -> {value:10.2f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de încărcare al serverului (model fals, sursă din fișiere)")
+    parser.add_argument("--config", default=os.path.join(HERE, "intersections.json"))
+    parser.add_argument("--source", default=None, help="fișier video sau director de imagini (implicit: imagini generate)")
+    parser.add_argument("--fps", type=float, default=30.0, help="ritmul sursei")
+    parser.add_argument("--clients", type=int, default=8, help="clienți care interoghează API-ul")
+    parser.add_argument("--streams", type=int, default=2, help="clienți /video_feed")
+    parser.add_argument("--burst-size", type=int, default=8, help="comenzi /control per rafală (0 = fără)")
+    parser.add_argument("--burst-interval", type=float, default=2.0, help="secunde între rafale")
+    parser.add_argument("--duration", type=float, default=30.0, help="secunde sub încărcare")
+    parser.add_argument("--warmup", type=float, default=3.0, help="secunde după pornire, înainte de măsurare")
+    parser.add_argument("--boxes", type=int, default=4, help="obiecte generate per cadru de modelul fals")
+    parser.add_argument("--latency", type=float, default=0.0, help="secunde de inferență simulată per cadru")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="directorul de lucru al serverului (implicit temporar)")
+    parser.add_argument("--keep", action="store_true", help="păstrează directorul temporar (log, jurnal)")
+    parser.add_argument("--out", default=None, help="fișierul JSON cu raportul")
+    parser.add_argument("--compare", default=None, help="raport anterior cu care se compară")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = run(args)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Raport scris în {args.out}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
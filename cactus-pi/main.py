@@ -12,9 +12,29 @@ import time
 import numpy as np
 import os
 import json
+import signal
+import sys
+import heapq
+import itertools
+import zlib
 from datetime import datetime
-from ultralytics import YOLO
 import requests
+from schema import ConfigError, compile_intersection, compile_intersections, serialize_intersections
+from state_machine import IntersectionStateMachine
+from persistence import StateJournal, WriteBehindPersister, atomic_write_json
+from recorder import DetectionRecorder
+from capture import CaptureRegistry, source_key
+from frame_pool import FRAME_POOL_ALLOCATIONS, FramePool
+from inference_scheduler import MAX_SLEEP, InferenceScheduler, detection_priority
+from camera_inventory import CameraInventory
+from detection import CLASS_MAP, assign_zones, draw_detections, draw_guides, empty_detection, run_inference
+import metrics
+from metrics import REGISTRY
+from tracing import Trace, TraceCollector
+from contention import InstrumentedLock
+import eventlog
+from shared_state import (FRAME_SLOT_BYTES, PUBLISHED_ROUTES, RETURNED_HEADERS, STATE_SLOT_BYTES, CommandServer,
+                          SharedSlot, frame_slot_name, mjpeg_part, published_body, route_slot_name)
 
 # --- Configurare Flask ---
 app = Flask(__name__)
@@ -25,26 +45,34 @@ CORS(app)
 CAMERA_INDEX = 0 
 MODEL_NAME = 'yolov8n.pt'
 INTERSECTIONS_FILE = 'intersections.json'
-
-# Mapează COCO IDs la noile categorii de ieșire: "humans" sau "wheels"
-CLASS_MAP = {
-    0: "humans",       
-    2: "wheels",        
-    3: "wheels",
-    5: "wheels",        
-    7: "wheels",       
-    44: "wheels"
-}
+PERSIST_INTERVAL = 5.0  # secunde - cel mult o scriere pe cardul SD în acest interval
+JOURNAL_FILE = 'intersections.journal'
+JOURNAL_MAX_BYTES = 256 * 1024  # peste această dimensiune jurnalul este compactat într-un snapshot
+RECORD_DIR = None  # director pentru înregistrarea binară a detecțiilor (None = dezactivată), ex. 'recordings'
+RECORD_SEGMENT_RECORDS = 256 * 1024  # înregistrări per segment (~9.7 MB)
+RECORD_MAX_SEGMENTS = 32  # segmente păstrate pe disc - cele mai vechi sunt șterse
+METRICS_ENABLED = True  # instrumentarea etapelor pentru /metrics (<1% CPU); False = observațiile sunt ignorate
+TRACING_ENABLED = True  # trasarea latenței detecție -> lampă (/traces)
+LOCK_PROFILING = False  # statistici de contenție pentru lock-ul global (pornire și din POST /lock_stats)
+LOG_LEVEL = "INFO"  # DEBUG afișează și atingerile de zone (limitate la una la 2s per zonă)
+LOG_CONSOLE_FORMAT = "text"  # "text", "json" (JSON lines pe stdout, pentru journald) sau "none"
+LOG_JSON_FILE = None  # fișier JSON lines pentru analiză (rotit la 5 MB), ex. 'events.jsonl'
+PUBLISH_INTERVAL = 0.1  # secunde între publicările stării în memoria partajată (modul --engine)
+STREAM_DEMAND_TIMEOUT = 2.0  # cadrele unei intersecții sunt codate doar dacă un proces API le-a cerut recent
+MODEL_WARMUP_SHAPE = (480, 640, 3)  # cadrul gol al primei inferențe, înainte de pornirea detecției
 
 # --- Variabile de stare globale partajate ---
-global_frame = None
-intersections_frames = {}  # {intersection_id: frame} - frame-uri pentru fiecare intersecție
+global_frame = None  # Frame (frame_pool) - primul cadru brut al ciclului
+intersections_frames = {}  # {intersection_id: Frame} - cadrele desenate ale fiecărei intersecții (doar citire)
 detection_data = {}  # {intersection_id: {"humans": bool, "wheels": bool, "zones": {0: bool, 1: bool, 2: bool, 3: bool}}}
 intersections_state = {}  # {intersection_id: intersection_state_object}
 intersections_cameras = {}  # {intersection_id: cv2.VideoCapture}
-lock = threading.Lock()
-PRINT_COOLDOWN = 0.5
-last_print_time = time.time()
+detection_recorder = None  # DetectionRecorder dacă RECORD_DIR este setat
+detection_model = None  # modelul YOLO, setat când a fost încărcat în fundal (None = detecție oprită)
+model_status = {"status": "pending", "error": None, "seconds": None}  # încărcarea modelului, pentru /ready
+lock = InstrumentedLock(enabled=LOCK_PROFILING)
+PRINT_COOLDOWN = 0.5  # secunde între mesajele de detecție ale aceleiași intersecții
+log = eventlog.get_logger("main")
 
 TRAFFIC_LIGHT_API_URL = "http://cactus:8014/control"
 
@@ -52,35 +80,91 @@ PIN_CAR_RED = 8
 PIN_CAR_GREEN = 9
 PIN_PEDESTRIAN = 10
 
-def send_traffic_light_command(pin, value):
+# --- Metrici (format Prometheus pe /metrics) ---
+STAGE_SECONDS = REGISTRY.histogram(
+    "cactus_stage_seconds", "Durata etapelor buclelor (video, stream, tick)", ("loop", "stage"))
+FRAMES_TOTAL = REGISTRY.counter("cactus_frames_total", "Cadre procesate", ("intersection",))
+FRAME_SKIPS_TOTAL = REGISTRY.counter("cactus_frame_skips_total", "Citiri de cadre eșuate", ("intersection",))
+INFERENCE_FPS = REGISTRY.gauge("cactus_inference_fps", "Rata inferenței per cameră (medie exponențială)",
+                               ("intersection",))
+TICKS_TOTAL = REGISTRY.counter("cactus_ticks_total", "Tick-uri ale state machine-urilor", ("intersection",))
+STREAM_CLIENTS = REGISTRY.gauge("cactus_stream_clients", "Clienți conectați la fluxul video")
+STREAM_FRAMES_TOTAL = REGISTRY.counter("cactus_stream_frames_total", "Cadre JPEG trimise clienților")
+ACTUATION_SECONDS = REGISTRY.histogram("cactus_actuation_seconds", "Durata comenzilor HTTP către semafor", ("pin",))
+ACTUATION_FAILURES = REGISTRY.counter("cactus_actuation_failures_total", "Comenzi către semafor eșuate", ("pin",))
+INFERENCE_FPS_SMOOTHING = 0.1  # ponderea ultimului cadru în media exponențială a FPS-ului
+DETECTION_TO_LAMP_SECONDS = REGISTRY.histogram(
+    "cactus_detection_to_lamp_seconds", "Latența de la captura cadrului la aprinderea lămpii etapei cerute",
+    ("intersection",), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+
+def remove_intersection_metrics(intersection_id):
+    """Seriile per intersecție ale unei intersecții șterse nu mai sunt exportate pe /metrics."""
+    for metric in (FRAMES_TOTAL, FRAME_SKIPS_TOTAL, INFERENCE_FPS, TICKS_TOTAL, DETECTION_TO_LAMP_SECONDS):
+        metric.remove(intersection_id)
+    FRAME_POOL_ALLOCATIONS.remove(intersection_id, "display")
+
+trace_collector = TraceCollector(
+    on_record=lambda trace: DETECTION_TO_LAMP_SECONDS.observe(trace.total(), trace.intersection))
+
+def send_traffic_light_command(pin, value, trace=None):
     """Trimite comenzi către API-ul semaforului fizic.
     
     Args:
         pin: Numărul pin-ului (8 pentru car red, 9 pentru car green, 10 pentru pedestrian)
         value: 0 sau 1 (0=OFF, 1=ON)
+        trace: Trace-ul detecției (opțional) - contextul este trimis către cod.py, care
+               răspunde cu timpii recepției și ai scrierii pe serial
     """
+    started = time.perf_counter()
+    body = {"pin": pin, "value": value}
+    if trace is not None:
+        body["trace"] = trace.context()
+        trace.mark(f"request_sent:{pin}")
     try:
         response = requests.post(
             TRAFFIC_LIGHT_API_URL,
-            json={"pin": pin, "value": value},
+            json=body,
             headers={"Content-Type": "application/json"},
             timeout=2
         )
+        if trace is not None:
+            received = time.time()
+            try:
+                remote = response.json().get("trace") or {}
+            except ValueError:
+                remote = {}
+            trace.merge(remote.get("hops") or {}, f":{pin}")
+            trace.mark(f"response_received:{pin}", received)
         if response.status_code == 200:
-            print(f"✓ Comandă trimisă către semafor: pin {pin} -> {value}")
+            log.info("actuation", "✓ Comandă trimisă către semafor: pin {pin} -> {value}", pin=pin, value=value)
         else:
-            print(f"⚠ Eroare la trimiterea comenzii către semafor: {response.status_code}")
+            ACTUATION_FAILURES.labels(pin).inc()
+            log.warning("actuation_failed", "⚠ Eroare la trimiterea comenzii către semafor: {status}",
+                        pin=pin, value=value, status=response.status_code)
     except Exception as e:
-        print(f"⚠ Eroare la comunicarea cu API-ul semaforului: {e}")
+        ACTUATION_FAILURES.labels(pin).inc()
+        log.warning("actuation_failed", "⚠ Eroare la comunicarea cu API-ul semaforului: {error}",
+                    pin=pin, value=value, error=str(e))
+    finally:
+        ACTUATION_SECONDS.observe(time.perf_counter() - started, pin)
 
-def update_traffic_lights_physical(intersection_type, lights_state, previous_lights=None):
+def update_traffic_lights_physical(intersection_type, lights_state, previous_lights=None, trace=None):
     """Actualizează semafoarele fizice când se schimbă starea pentru car_pedestrian.
     
     Args:
         intersection_type: "car_pedestrian" sau "car_car"
         lights_state: [car_light, ped_light] - 0=red, 1=green, 2=yellow
         previous_lights: [car_light, ped_light] anterior (opțional, pentru a evita apelurile inutile)
+        trace: Trace-ul detecției care a cerut etapa (finalizat după trimiterea comenzilor)
     """
+    try:
+        _send_lights(intersection_type, lights_state, previous_lights, trace)
+    finally:
+        if trace is not None:
+            trace_collector.record(trace)
+
+def _send_lights(intersection_type, lights_state, previous_lights, trace):
+    """Trimite comenzile pin cu pin (doar car_pedestrian are semafoare fizice)."""
     if intersection_type != "car_pedestrian":
         return
     
@@ -95,24 +179,24 @@ def update_traffic_lights_physical(intersection_type, lights_state, previous_lig
     
     # Actualizează semaforul pentru mașini
     if car_light == 0:  # Red
-        send_traffic_light_command(PIN_CAR_RED, 0)  # Roșu ON (pin 8, value 0)
-        send_traffic_light_command(PIN_CAR_GREEN, 0)  # Verde OFF (pin 9, value 0)
+        send_traffic_light_command(PIN_CAR_RED, 0, trace)  # Roșu ON (pin 8, value 0)
+        send_traffic_light_command(PIN_CAR_GREEN, 0, trace)  # Verde OFF (pin 9, value 0)
     elif car_light == 1:  # Green
-        send_traffic_light_command(PIN_CAR_RED, 1)  # Roșu OFF (pin 8, value 1)
-        send_traffic_light_command(PIN_CAR_GREEN, 1)  # Verde ON (pin 9, value 1)
+        send_traffic_light_command(PIN_CAR_RED, 1, trace)  # Roșu OFF (pin 8, value 1)
+        send_traffic_light_command(PIN_CAR_GREEN, 1, trace)  # Verde ON (pin 9, value 1)
     elif car_light == 2:  # Yellow
         # Pentru galben, probabil trebuie să setăm ambele sau un pin special
         # Presupunem că galben = roșu ON + verde OFF (sau alt pin pentru galben)
-        send_traffic_light_command(PIN_CAR_RED, 0)  # Roșu ON (pin 8, value 0)
-        send_traffic_light_command(PIN_CAR_GREEN, 0)  # Verde OFF (pin 9, value 0)
+        send_traffic_light_command(PIN_CAR_RED, 0, trace)  # Roșu ON (pin 8, value 0)
+        send_traffic_light_command(PIN_CAR_GREEN, 0, trace)  # Verde OFF (pin 9, value 0)
     
     # Actualizează semaforul pentru pietoni
     if ped_light == 0:  # Red
-        send_traffic_light_command(PIN_PEDESTRIAN, 0)  # Verde OFF (roșu)
+        send_traffic_light_command(PIN_PEDESTRIAN, 0, trace)  # Verde OFF (roșu)
     elif ped_light == 1:  # Green
-        send_traffic_light_command(PIN_PEDESTRIAN, 1)  # Verde ON
+        send_traffic_light_command(PIN_PEDESTRIAN, 1, trace)  # Verde ON
     elif ped_light == 2:  # Yellow (nu există pentru pietoni, dar dacă apare, tratează ca roșu)
-        send_traffic_light_command(PIN_PEDESTRIAN, 1)  # Verde OFF (roșu)
+        send_traffic_light_command(PIN_PEDESTRIAN, 1, trace)  # Verde OFF (roșu)
 
 # --- Funcții pentru gestionarea intersecțiilor ---
 
@@ -123,18 +207,17 @@ def load_intersections():
             with open(INTERSECTIONS_FILE, 'r') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"Eroare la citirea intersecțiilor: {e}")
+            log.error("config_read_failed", "Eroare la citirea intersecțiilor: {error}", error=str(e))
             return get_default_intersections()
     return get_default_intersections()
 
 def save_intersections(intersections):
-    """Salvează intersecțiile în fișierul JSON."""
+    """Salvează intersecțiile în fișierul JSON (atomic: fișier temporar + fsync + rename)."""
     try:
-        with open(INTERSECTIONS_FILE, 'w') as f:
-            json.dump(intersections, f, indent=2)
+        atomic_write_json(INTERSECTIONS_FILE, intersections)
         return True
     except Exception as e:
-        print(f"Eroare la salvarea intersecțiilor: {e}")
+        log.error("config_save_failed", "Eroare la salvarea intersecțiilor: {error}", error=str(e))
         return False
 
 def get_default_intersections():
@@ -144,7 +227,7 @@ def get_default_intersections():
             {
                 "id": "depou-001",
                 "name": "Depou",
-                "type": "car_pedestrian",  # sau "car_car"
+                "type": "car_pedestrian",  # sau "car_car", "multi_approach"
                 "cameraIndex": 0,
                 "lights": [
                     {"id": 0, "type": "car", "name": "Vehicule"},
@@ -164,7 +247,7 @@ def get_default_intersections():
                     "timer": {"for": "car", "value": 999},
                     "lastUpdate": None,
                     "previousMode": None,
-                    "_fromVehicleDetection": False
+                    "_target": None
                 }
             },
             {
@@ -190,1050 +273,262 @@ def get_default_intersections():
                     "timer": {"for": "light_0", "value": 999},
                     "lastUpdate": None,
                     "previousMode": None,
-                    "_fromVehicleDetection": False,
-                    "_fromOppositeDetection": False
+                    "_target": None
                 }
             }
         ]
     }
 
-# --- State Machine Logic pentru Intersecții ---
-
-class IntersectionStateMachine:
-    """State machine pentru gestionarea stării unei intersecții."""
+class ConfigStore:
+    """Configurația intersecțiilor ținută în memorie, cu număr de versiune.
     
-    def __init__(self, intersection_config):
-        self.config = intersection_config
-        self.state = intersection_config["state"].copy()
-        self.last_tick = time.time()
-        
-        # EDGE CASE 28: Asigură că lastUpdate există în state
-        if "lastUpdate" not in self.state:
-            self.state["lastUpdate"] = None
-        
-        # EDGE CASE 29: Asigură că previousMode există în state
-        if "previousMode" not in self.state:
-            self.state["previousMode"] = None
-        
-        # EDGE CASE 52: Asigură că flag-ul pentru detecție vehicule există
-        if "_fromVehicleDetection" not in self.state:
-            self.state["_fromVehicleDetection"] = False
-        
-        # EDGE CASE 57: Asigură că flag-ul pentru detecție opusă există (pentru car_car)
-        if "_fromOppositeDetection" not in self.state:
-            self.state["_fromOppositeDetection"] = False
-        
-        # EDGE CASE 30: Validare și corectare timer invalid
-        if "timer" not in self.state or not isinstance(self.state["timer"], dict):
-            # Inițializează timer-ul default bazat pe fază
-            phase = self.state.get("phase", "CAR_GREEN")
-            
-            if self.config["type"] == "car_car":
-                green_line_light = int(self.config["settings"].get("greenLinePreference", "0"))
-                if phase == f"LIGHT_{green_line_light}_GREEN":
-                    self.state["timer"] = {"for": f"light_{green_line_light}", "value": 999}
-                elif phase == f"LIGHT_{1 - green_line_light}_GREEN":
-                    self.state["timer"] = {"for": f"light_{1 - green_line_light}", "value": self.config["settings"]["carGreenTime"]}
-                elif "YELLOW" in phase:
-                    self.state["timer"] = {"for": "yellow", "value": self.config["settings"]["yellowTime"]}
-                else:
-                    self.state["timer"] = {"for": "all_red", "value": self.config["settings"]["allRedSafetyTime"]}
-            else:
-                green_line = self.config["settings"].get("greenLinePreference", "Car")
-                if phase == "CAR_GREEN":
-                    self.state["timer"] = {"for": "car", "value": 999 if green_line == "Car" else self.config["settings"]["carGreenTime"]}
-                elif phase == "PED_GREEN":
-                    self.state["timer"] = {"for": "ped", "value": 999 if green_line == "Pedestrian" else self.config["settings"]["pedGreenTime"]}
-                else:
-                    self.state["timer"] = {"for": "all_red", "value": self.config["settings"]["allRedSafetyTime"]}
-        
-        # EDGE CASE 31: Validare timer value - asigură că este întreg pozitiv sau 999
-        timer_value = self.state["timer"].get("value", 0)
-        if not isinstance(timer_value, (int, float)) or timer_value < 0:
-            self.state["timer"]["value"] = 999 if timer_value == 999 else max(0, int(timer_value))
-        
-        # Inițializează semafoarele fizice pentru car_pedestrian
-        if self.config["type"] == "car_pedestrian" and "lights" in self.state:
-            update_traffic_lights_physical(self.config["type"], self.state["lights"])
+    Este încărcată o singură dată la pornire și actualizată de endpoint-urile POST;
+    fișierul este recitit doar când mtime-ul lui se schimbă pe disc (vezi config_watch_loop).
+    Intersecțiile sunt păstrate compilate (IntersectionConfig, validate la încărcare).
+    Toate accesările se fac sub `lock`.
+    """
     
-    def get_zone_from_position(self, x, y, frame_width, frame_height):
-        """Determină zona (cadranul) în care se află o detecție.
-        Returnează: 0=top-left, 1=top-right, 2=bottom-left, 3=bottom-right
-        """
-        center_x = frame_width // 2
-        center_y = frame_height // 2
-        
-        if x < center_x:
-            if y < center_y:
-                return 0  # top-left
-            else:
-                return 2  # bottom-left
-        else:
-            if y < center_y:
-                return 1  # top-right
-            else:
-                return 3  # bottom-right
+    def __init__(self, path):
+        self.path = path
+        self.intersections = []  # [IntersectionConfig]
+        # EDGE CASE 61: Serverul a fost repornit - versiunile pornesc de la momentul pornirii (ms),
+        # deci versiunea/ETag-ul unui client de dinaintea repornirii nu coincide cu una nouă
+        self.version = int(time.time() * 1000)
+        self.changed = {}  # {id intersecție: versiunea ultimei modificări}
+        self.reset_version = 0  # ultima versiune la care s-a schimbat întreaga configurație
+        self.mtime = None
     
-    def update_from_detection(self, detection_data, frame_width, frame_height):
-        """Actualizează starea bazată pe detecții.
-        detection_data: dict cu {"humans": bool, "wheels": bool, "zones": {...}} pentru această intersecție
-        """
-        # detection_data este deja dict-ul pentru această intersecție (nu dict-ul cu toate intersecțiile)
-        detection = detection_data if isinstance(detection_data, dict) else {}
-        
-        if self.config["type"] == "car_pedestrian":
-            # Logica pentru intersecție mașini/pietoni
-            humans = detection.get("humans", False)
-            wheels = detection.get("wheels", False)
-            
-            if self.config["settings"]["mode"] == "Automatic":
-                green_line = self.config["settings"]["greenLinePreference"]
-                phase = self.state["phase"]
-                timer_value = self.state["timer"]["value"]
-                
-                # Debug logging (doar dacă există detecție)
-                if humans or wheels:
-                    print(f"[{self.config['id']}] Detecție: humans={humans}, wheels={wheels}, phase={phase}, timer={timer_value}, green_line={green_line}")
-                
-                # EDGE CASE 1: Ignoră detecțiile în faze de tranziție (ALL_RED, YELLOW)
-                # Aceste faze trebuie să se termine complet înainte de a răspunde la detecții
-                # Nu există PED_YELLOW - doar CAR_YELLOW
-                if phase in ["CAR_YELLOW", "ALL_RED_1", "ALL_RED_2"]:
-                    # Nu face nimic - lasă tranziția să se termine
-                    if humans or wheels:
-                        print(f"[{self.config['id']}] Ignoră detecție în fază de tranziție: {phase}")
-                    return
-                
-                # EDGE CASE 2: Detecție simultană (humans + wheels) - Prioritate: humans > wheels
-                # Dacă detectăm ambele, prioritizăm humans (pietonii au prioritate)
-                
-                # Logica pentru green line infinită (timer = 999)
-                if phase == "CAR_GREEN" and timer_value == 999:
-                    # Pe linie verde infinită pentru mașini
-                    if humans:
-                        # Detectat pieton - trece la galben
-                        # EDGE CASE 3: Dacă detectăm și wheels simultan, ignorăm wheels (humans are prioritate)
-                        print(f"[{self.config['id']}] CAR_GREEN (green line) -> CAR_YELLOW (detectat pieton)")
-                        self.state["phase"] = "CAR_YELLOW"
-                        self.state["lights"] = [2, 0]  # galben, roșu
-                        self.state["timer"] = {"for": "yellow", "value": self.config["settings"]["yellowTime"]}
-                        self.state["lastUpdate"] = time.time()
-                    # EDGE CASE 4: Dacă nu detectăm nimic, rămâne pe verde infinit (corect)
-                
-                elif phase == "PED_GREEN" and timer_value == 999:
-                    # Pe linie verde infinită pentru pietoni
-                    if wheels:
-                        # Detectat vehicul - trece direct la ALL_RED_2, apoi la verde mașini
-                        # Nu mai trece prin PED_YELLOW pentru a fi mai rapid
-                        # Marchează că am venit din detecție pentru a ști că trebuie să trecem la verde mașini
-                        print(f"[{self.config['id']}] PED_GREEN (green line) -> ALL_RED_2 (detectat vehicul)")
-                        previous_lights = self.state.get("lights", [0, 0]).copy()
-                        self.state["phase"] = "ALL_RED_2"
-                        self.state["lights"] = [0, 0]  # roșu, roșu
-                        self.state["timer"] = {"for": "all_red", "value": self.config["settings"]["allRedSafetyTime"]}
-                        self.state["_fromVehicleDetection"] = True  # Flag pentru a ști că trebuie să trecem la verde mașini
-                        self.state["lastUpdate"] = time.time()
-                        update_traffic_lights_physical(self.config["type"], self.state["lights"], previous_lights)
-                    # EDGE CASE 6: Dacă nu detectăm nimic, rămâne pe verde infinit (corect)
-                
-                # Logica pentru timer finit - menține verde dacă există detecție
-                elif phase == "PED_GREEN" and timer_value > 0 and timer_value != 999:
-                    # Pe verde pietoni cu timer
-                    # EDGE CASE 7: Evită resetarea prea frecventă - doar dacă timer-ul este < 50% din timpul total
-                    # Aceasta previne "bouncing" când detecția este intermitentă
-                    if humans:
-                        # Menține verde dacă încă există pietoni
-                        # Resetăm timer-ul doar dacă e aproape de expirare (evită resetări prea frecvente)
-                        if timer_value <= self.config["settings"]["pedGreenTime"] * 0.5:
-                            print(f"[{self.config['id']}] PED_GREEN (timer) - reset timer (detectat pieton)")
-                            self.state["timer"] = {"for": "ped", "value": self.config["settings"]["pedGreenTime"]}
-                            self.state["lastUpdate"] = time.time()
-                    # EDGE CASE 8: Dacă nu mai există pietoni, timer-ul continuă să scadă normal
-                    # Tranziția se face automat în tick() când timer-ul ajunge la 0
-                
-                elif phase == "CAR_GREEN" and timer_value > 0 and timer_value != 999:
-                    # Pe verde mașini cu timer
-                    # EDGE CASE 9: Evită resetarea prea frecventă - doar dacă timer-ul este < 50% din timpul total
-                    if wheels:
-                        # Menține verde dacă încă există vehicule
-                        # Resetăm timer-ul doar dacă e aproape de expirare (evită resetări prea frecvente)
-                        if timer_value <= self.config["settings"]["carGreenTime"] * 0.5:
-                            print(f"[{self.config['id']}] CAR_GREEN (timer) - reset timer (detectat vehicul)")
-                            self.state["timer"] = {"for": "car", "value": self.config["settings"]["carGreenTime"]}
-                            self.state["lastUpdate"] = time.time()
-                    # EDGE CASE 10: Dacă nu mai există vehicule, timer-ul continuă să scadă normal
-                    # Tranziția se face automat în tick() când timer-ul ajunge la 0
-                
-                # EDGE CASE 11: Dacă phase nu este recunoscut, nu face nimic (previne erori)
-        
-        elif self.config["type"] == "car_car":
-            # Logica pentru intersecție mașini/mașini cu zone personalizate
-            zones = detection.get("zones", {})
-            green_line_light = int(self.config["settings"]["greenLinePreference"])  # 0 sau 1
-            
-            if self.config["settings"]["mode"] == "Automatic":
-                opposite_light = 1 - green_line_light
-                phase = self.state["phase"]
-                timer_value = self.state["timer"]["value"]
-                
-                # EDGE CASE 12: Ignoră detecțiile în faze de tranziție pentru car_car
-                if "YELLOW" in phase or phase == "ALL_RED":
-                    # Nu face nimic - lasă tranziția să se termine
-                    return
-                
-                # Obține zonele personalizate pentru fiecare light
-                green_light_config = self.config["lights"][green_line_light]
-                opposite_light_config = self.config["lights"][opposite_light]
-                
-                # Obține zonele personalizate (customZones) sau fallback la zones vechi (pentru backward compatibility)
-                green_custom_zones = green_light_config.get("customZones", [])
-                opposite_custom_zones = opposite_light_config.get("customZones", [])
-                
-                # Verifică dacă există detecție în zonele opuse
-                # Pentru zone personalizate, verifică dacă există detecție în oricare dintre zonele light-ului opus
-                opposite_detected = False
-                green_detected = False
-                
-                # Debug: afișează toate zonele detectate (doar dacă există detecție)
-                detected_zones = [k for k, v in zones.items() if v]
-                
-                if opposite_custom_zones:
-                    # Verifică dacă există detecție în oricare dintre zonele personalizate ale light-ului opus
-                    for zone_idx in range(len(opposite_custom_zones)):
-                        zone_key = f"light_{opposite_light}_zone_{zone_idx}"
-                        if zones.get(zone_key, False):
-                            opposite_detected = True
-                            print(f"[{self.config['id']}] CAR_CAR: Detectat în zona opusă: {zone_key}")
-                            break
-                else:
-                    # Fallback la logica veche cu quadrants (pentru backward compatibility)
-                    old_zones = opposite_light_config.get("zones", [])
-                    if old_zones:
-                        opposite_zones = [str(z - 1) for z in old_zones if 1 <= z <= 4]
-                        opposite_detected = any(zones.get(zone, False) for zone in opposite_zones)
-                        if opposite_detected:
-                            print(f"[{self.config['id']}] CAR_CAR: Detectat în zone opuse (quadrants): {opposite_zones}")
-                
-                if green_custom_zones:
-                    # Verifică dacă există detecție în oricare dintre zonele personalizate ale green line light
-                    for zone_idx in range(len(green_custom_zones)):
-                        zone_key = f"light_{green_line_light}_zone_{zone_idx}"
-                        if zones.get(zone_key, False):
-                            green_detected = True
-                            print(f"[{self.config['id']}] CAR_CAR: Detectat în zona green line: {zone_key}")
-                            break
-                else:
-                    # Fallback la logica veche cu quadrants
-                    old_zones = green_light_config.get("zones", [])
-                    if old_zones:
-                        green_zones = [str(z - 1) for z in old_zones if 1 <= z <= 4]
-                        green_detected = any(zones.get(zone, False) for zone in green_zones)
-                        if green_detected:
-                            print(f"[{self.config['id']}] CAR_CAR: Detectat în zone green line (quadrants): {green_zones}")
-                
-                # LOGICA PRINCIPALĂ PENTRU CAR_CAR
-                # Debug logging doar dacă există detecție sau dacă suntem pe green line
-                if detected_zones or (phase == f"LIGHT_{green_line_light}_GREEN" and timer_value == 999):
-                    print(f"[{self.config['id']}] CAR_CAR: Phase={phase}, timer={timer_value}, opposite_detected={opposite_detected}, green_detected={green_detected}, detected_zones={detected_zones}")
-                
-                if phase == f"LIGHT_{green_line_light}_GREEN":
-                    # Pe green line (timer 999) sau pe verde cu timer
-                    if timer_value == 999:
-                        # Green line infinită - verifică dacă există detecție în zona opusă
-                        if opposite_detected:
-                            # Detectat vehicul în zona opusă - trece la galben
-                            print(f"[{self.config['id']}] CAR_CAR: Green line detectat opus -> YELLOW (phase={phase}, timer={timer_value})")
-                            self.state["phase"] = f"LIGHT_{green_line_light}_YELLOW"
-                            lights = [0, 0]
-                            lights[green_line_light] = 2  # galben
-                            self.state["lights"] = lights
-                            self.state["timer"] = {"for": "yellow", "value": self.config["settings"]["yellowTime"]}
-                            self.state["_fromOppositeDetection"] = True  # Flag pentru a ști că trebuie să trecem la opus
-                            self.state["lastUpdate"] = time.time()
-                        else:
-                            # Debug: de ce nu se face tranziția
-                            if detected_zones:
-                                print(f"[{self.config['id']}] CAR_CAR: Zone detectate dar nu în zona opusă. Zone opuse configurate: {len(opposite_custom_zones) if opposite_custom_zones else 'fallback quadrants'}")
-                    else:
-                        # Pe verde cu timer - menține verde dacă există detecție în zonele proprii
-                        if green_detected and timer_value <= self.config["settings"]["carGreenTime"] * 0.5:
-                            # Reset timer dacă e aproape de expirare și există detecție
-                            print(f"[{self.config['id']}] CAR_CAR: Reset timer green line (detectat propriu)")
-                            self.state["timer"] = {"for": f"light_{green_line_light}", "value": self.config["settings"]["carGreenTime"]}
-                            self.state["lastUpdate"] = time.time()
-                
-                elif phase == f"LIGHT_{opposite_light}_GREEN":
-                    # Pe verde opus (nu green line) - menține verde dacă există detecție
-                    # Dar adaugă o limită de timp maximă pentru a preveni blocarea
-                    current_time = time.time()
-                    
-                    # Inițializează timestamp-ul când am trecut la verde opus (dacă nu există)
-                    if "_oppositeGreenStartTime" not in self.state:
-                        self.state["_oppositeGreenStartTime"] = current_time
-                    
-                    opposite_green_start_time = self.state.get("_oppositeGreenStartTime", current_time)
-                    time_on_opposite_green = current_time - opposite_green_start_time
-                    
-                    # Limită maximă: 3x timpul normal de verde (pentru a preveni blocarea)
-                    max_time_on_opposite = self.config["settings"]["carGreenTime"] * 3
-                    
-                    if time_on_opposite_green >= max_time_on_opposite:
-                        # Forțează trecerea la galben după timp maxim, chiar dacă detecția persistă
-                        print(f"[{self.config['id']}] CAR_CAR: Timp maxim atins pe verde opus ({max_time_on_opposite}s) -> YELLOW (forțat)")
-                        self.state["phase"] = f"LIGHT_{opposite_light}_YELLOW"
-                        lights = [0, 0]
-                        lights[opposite_light] = 2
-                        self.state["lights"] = lights
-                        self.state["timer"] = {"for": "yellow", "value": self.config["settings"]["yellowTime"]}
-                        self.state["_fromOppositeDetection"] = False  # Asigură revenirea la green line
-                        self.state["lastUpdate"] = current_time
-                        return
-                    
-                    if opposite_detected and timer_value > 0 and timer_value != 999:
-                        if timer_value <= self.config["settings"]["carGreenTime"] * 0.5:
-                            # Reset timer dacă e aproape de expirare și există detecție
-                            print(f"[{self.config['id']}] CAR_CAR: Reset timer opus (detectat opus, timp total: {time_on_opposite_green:.1f}s)")
-                            self.state["timer"] = {"for": f"light_{opposite_light}", "value": self.config["settings"]["carGreenTime"]}
-                            self.state["lastUpdate"] = current_time
-                    # IMPORTANT: Dacă detecția dispare, timer-ul continuă să scadă normal
-                    # Nu face nimic - lasă timer-ul să scadă și să treacă la YELLOW
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
     
-    def set_mode(self, mode):
-        """Setează modul de operare (Automatic, Manual, Override)."""
-        # EDGE CASE 25: Validare mod
-        if mode not in ["Automatic", "Manual", "Override"]:
-            print(f"⚠ Eroare: Mod invalid: {mode}")
-            return
-        
-        # EDGE CASE 26: Dacă modul este deja setat, nu face nimic (evită resetări inutile)
-        if self.config["settings"]["mode"] == mode:
-            return
-        
-        if mode == "Override":
-            # Păstrează modul anterior
-            if "previousMode" not in self.state or self.state["previousMode"] is None:
-                self.state["previousMode"] = self.config["settings"].get("mode", "Automatic")
-        elif mode == "Automatic" or mode == "Manual":
-            # EDGE CASE 27: Când revine la Automatic, reinițializează timer-ul corect bazat pe fază
-            if mode == "Automatic" and "previousMode" in self.state:
-                # Reinițializează timer-ul bazat pe fază și green line preference
-                phase = self.state["phase"]
-                
-                if self.config["type"] == "car_car":
-                    green_line_light = int(self.config["settings"].get("greenLinePreference", "0"))
-                    if phase == f"LIGHT_{green_line_light}_GREEN":
-                        self.state["timer"] = {"for": f"light_{green_line_light}", "value": 999}
-                    elif phase == f"LIGHT_{1 - green_line_light}_GREEN":
-                        self.state["timer"] = {"for": f"light_{1 - green_line_light}", "value": self.config["settings"]["carGreenTime"]}
-                    # Pentru alte faze, păstrează timer-ul existent
-                else:
-                    green_line = self.config["settings"].get("greenLinePreference", "Car")
-                    if phase == "CAR_GREEN":
-                        self.state["timer"] = {"for": "car", "value": 999 if green_line == "Car" else self.config["settings"]["carGreenTime"]}
-                    elif phase == "PED_GREEN":
-                        self.state["timer"] = {"for": "ped", "value": 999 if green_line == "Pedestrian" else self.config["settings"]["pedGreenTime"]}
-                    # Pentru alte faze, păstrează timer-ul existent
-            elif mode == "Manual":
-                # Când se setează modul Manual, inițializează ciclul normal de semafor
-                phase = self.state["phase"]
-                settings = self.config["settings"]
-                
-                if self.config["type"] == "car_car":
-                    green_line_light = int(settings["greenLinePreference"])
-                    opposite_light = 1 - green_line_light
-                    # Faze valide pentru car_car: LIGHT_0_GREEN, LIGHT_0_YELLOW, LIGHT_1_GREEN, LIGHT_1_YELLOW, ALL_RED
-                    valid_phases = [f"LIGHT_{green_line_light}_GREEN", f"LIGHT_{green_line_light}_YELLOW",
-                                   f"LIGHT_{opposite_light}_GREEN", f"LIGHT_{opposite_light}_YELLOW", "ALL_RED"]
-                    if phase not in valid_phases:
-                        self.state["phase"] = f"LIGHT_{green_line_light}_GREEN"
-                        lights = [0, 0]
-                        lights[green_line_light] = 1
-                        self.state["lights"] = lights
-                        self.state["timer"] = {"for": f"light_{green_line_light}", "value": settings["carGreenTime"]}
-                    else:
-                        # Reinițializează timer-ul pentru faza curentă cu timpii normali (nu green line)
-                        if phase == f"LIGHT_{green_line_light}_GREEN" or phase == f"LIGHT_{opposite_light}_GREEN":
-                            light_idx = green_line_light if phase == f"LIGHT_{green_line_light}_GREEN" else opposite_light
-                            self.state["timer"] = {"for": f"light_{light_idx}", "value": settings["carGreenTime"]}
-                        elif "YELLOW" in phase:
-                            self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-                        elif phase == "ALL_RED":
-                            self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-                else:
-                    # Dacă suntem într-o fază invalidă pentru Manual, reinițializează la CAR_GREEN
-                    # Nu există PED_YELLOW - doar CAR_YELLOW
-                    if phase not in ["CAR_GREEN", "CAR_YELLOW", "ALL_RED_1", "PED_GREEN", "ALL_RED_2"]:
-                        previous_lights = self.state.get("lights", [0, 0]).copy()
-                        self.state["phase"] = "CAR_GREEN"
-                        self.state["lights"] = [1, 0]
-                        self.state["timer"] = {"for": "car", "value": settings["carGreenTime"]}
-                        update_traffic_lights_physical(self.config["type"], self.state["lights"], previous_lights)
-                    else:
-                        # Reinițializează timer-ul pentru faza curentă cu timpii normali (nu green line)
-                        if phase == "CAR_GREEN":
-                            self.state["timer"] = {"for": "car", "value": settings["carGreenTime"]}
-                        elif phase == "CAR_YELLOW":
-                            self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-                        elif phase == "ALL_RED_1" or phase == "ALL_RED_2":
-                            self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-                        elif phase == "PED_GREEN":
-                            self.state["timer"] = {"for": "ped", "value": settings["pedGreenTime"]}
-            
-            # Revine la modul normal
-            if "previousMode" in self.state:
-                self.state["previousMode"] = None
-        
-        self.config["settings"]["mode"] = mode
-        self.state["lastUpdate"] = time.time()
-        # EDGE CASE 50: Resetează last_tick când se schimbă modul
-        self.last_tick = time.time()
+    def read(self):
+        """Citește documentul JSON de pe disc (nevalidat) și reține mtime-ul lui."""
+        self.mtime = self._file_mtime()
+        return load_intersections()
     
-    def set_override(self, light_index, light_value):
-        """Setează manual o lumină (Override mode).
-        light_index: 0 pentru car, 1 pentru ped (sau light 0/1 pentru car_car)
-        light_value: 0=red, 1=green, 2=yellow
-        """
-        # EDGE CASE 43: Validare parametri
-        if light_index not in [0, 1]:
-            print(f"⚠ Eroare: light_index invalid: {light_index}")
-            return
-        if light_value not in [0, 1, 2]:
-            print(f"⚠ Eroare: light_value invalid: {light_value}")
-            return
-        
-        # EDGE CASE 53: Semafoarele de pietoni nu au galben - doar roșu sau verde
-        if self.config["type"] == "car_pedestrian":
-            # Verifică dacă încercăm să setăm galben la semafor de pietoni
-            light_config = self.config["lights"][light_index]
-            if light_config.get("type") == "pedestrian" and light_value == 2:
-                print(f"⚠ Eroare: Semafoarele de pietoni nu au lumina galbenă. Folosește doar roșu (0) sau verde (1).")
+    def set(self, data):
+        """Validează și compilează documentul JSON; ridică ConfigError dacă este invalid."""
+        self.intersections = compile_intersections(data)
+        self.bump()
+        return self.intersections
+    
+    def load(self):
+        """Încarcă, validează și compilează configurația de pe disc."""
+        return self.set(self.read())
+    
+    def find(self, intersection_id):
+        """Returnează IntersectionConfig-ul cu id-ul dat sau None."""
+        for intersection in self.intersections:
+            if intersection.id == intersection_id:
+                return intersection
+        return None
+    
+    def replace(self, intersection):
+        """Înlocuiește intersecția cu același id (după un POST validat)."""
+        for i, existing in enumerate(self.intersections):
+            if existing.id == intersection.id:
+                self.intersections[i] = intersection
                 return
-        
-        # EDGE CASE 44: Salvează modul anterior doar dacă nu există deja
-        if "previousMode" not in self.state or self.state["previousMode"] is None:
-            self.state["previousMode"] = self.config["settings"].get("mode", "Automatic")
-        
-        self.config["settings"]["mode"] = "Override"
-        
-        lights = self.state["lights"].copy()
-        if len(lights) < 2:
-            # EDGE CASE 45: Inițializează lights dacă nu există
-            lights = [0, 0]
-        
-        lights[light_index] = light_value
-        
-        previous_lights = self.state.get("lights", [0, 0]).copy()
-        
-        if self.config["type"] == "car_pedestrian":
-            if light_index == 0:
-                if light_value == 1:
-                    lights[1] = 0
-                elif light_value == 0:
-                    lights[1] = 1
-            elif light_index == 1:
-                if light_value == 1:
-                    lights[0] = 0
-                elif light_value == 0:
-                    lights[0] = 1
-        
-        self.state["lights"] = lights
-        update_traffic_lights_physical(self.config["type"], self.state["lights"], previous_lights)
-        
-        # Set timer based on light value
-        if light_value == 1:  # Green
-            duration = self.config["settings"]["carGreenTime"] if light_index == 0 else self.config["settings"]["pedGreenTime"]
-        elif light_value == 2:  # Yellow
-            duration = self.config["settings"]["yellowTime"]
-        else:  # Red
-            duration = self.config["settings"]["allRedSafetyTime"]
-        
-        # EDGE CASE 48: Validare duration
-        duration = max(1, int(duration))  # Minimum 1 secundă
-        
-        self.state["timer"] = {"for": "override", "value": duration}
-        self.state["lastUpdate"] = time.time()
-        # EDGE CASE 49: Resetează last_tick pentru a preveni timer-ul să scadă prea repede
-        self.last_tick = time.time()
     
-    def simulate_detection(self, detection_type, light_index=None):
-        """Simulează o detecție (pentru testare).
-        detection_type: 'car', 'ped', 'none'
-        light_index: pentru car_car, index-ul semaforului (0 sau 1)
+    def bump(self, intersection_id=None):
+        """Marchează o modificare a configurației sau stării și returnează noua versiune.
+        Fără id, modificarea privește toate intersecțiile (reîncărcare, intersecții adăugate/șterse).
         """
-        if self.config["type"] == "car_car":
-            # Pentru car_car, simulează detecție în zonele semaforului specificat
-            if light_index is not None and detection_type == "car":
-                # Obține zonele pentru semaforul specificat
-                if light_index < len(self.config["lights"]):
-                    light_config = self.config["lights"][light_index]
-                    zones_config = light_config.get("zones", [])
-                    
-                    # Creează un dict de detecție cu zonele activate
-                    zones_dict = {"0": False, "1": False, "2": False, "3": False}
-                    for zone in zones_config:
-                        # Convertește din format configurație (1-4) la indexuri (0-3)
-                        if 1 <= zone <= 4:
-                            zone_index = str(zone - 1)
-                            if zone_index in zones_dict:
-                                zones_dict[zone_index] = True
-                    
-                    # Simulează detecția
-                    detection_data = {
-                        "humans": False,
-                        "wheels": True,
-                        "zones": zones_dict
-                    }
-                    self.update_from_detection(detection_data, 640, 480)  # Dimensiuni default
-            elif detection_type == "none":
-                # Simulează fără detecție
-                detection_data = {
-                    "humans": False,
-                    "wheels": False,
-                    "zones": {"0": False, "1": False, "2": False, "3": False}
-                }
-                self.update_from_detection(detection_data, 640, 480)
+        self.version += 1
+        if intersection_id is None:
+            self.changed = {}
+            self.reset_version = self.version
         else:
-            # Pentru car_pedestrian, simulează detecție normală
-            if detection_type == "car":
-                detection_data = {
-                    "humans": False,
-                    "wheels": True,
-                    "zones": {}
-                }
-                self.update_from_detection(detection_data, 640, 480)
-            elif detection_type == "ped":
-                detection_data = {
-                    "humans": True,
-                    "wheels": False,
-                    "zones": {}
-                }
-                self.update_from_detection(detection_data, 640, 480)
-            elif detection_type == "none":
-                detection_data = {
-                    "humans": False,
-                    "wheels": False,
-                    "zones": {}
-                }
-                self.update_from_detection(detection_data, 640, 480)
+            self.changed[intersection_id] = self.version
+        return self.version
     
-    def tick(self):
-        """Actualizează timer-ul și face tranziții dacă e necesar."""
-        current_time = time.time()
-        
-        # EDGE CASE 18: Inițializare last_tick dacă nu există
-        if not hasattr(self, 'last_tick') or self.last_tick is None:
-            self.last_tick = current_time
-        
-        # Nu face tranziții în Override sau Manual (sunt controlate manual)
-        if self.config["settings"]["mode"] == "Override":
-            # Actualizează timer-ul
-            if self.state["timer"]["value"] > 0 and self.state["timer"]["value"] != 999:
-                elapsed = current_time - self.last_tick
-                # EDGE CASE 19: Previne timer-ul să scadă prea repede dacă tick() este apelat prea des
-                if elapsed >= 1.0:
-                    self.state["timer"]["value"] = max(0, self.state["timer"]["value"] - 1)
-                    self.last_tick = current_time
-            
-            # EDGE CASE 20: Când timer-ul ajunge la 0, revine la modul anterior
-            if self.state["timer"]["value"] == 0 and "previousMode" in self.state and self.state["previousMode"]:
-                previous_mode = self.state["previousMode"]
-                self.config["settings"]["mode"] = previous_mode
-                self.state["previousMode"] = None
-                # Reinițializează state machine cu modul anterior
-                # EDGE CASE 21: Asigură că timer-ul este setat corect după revenirea la modul anterior
-                if previous_mode == "Automatic":
-                    # Reinițializează timer-ul bazat pe fază
-                    phase = self.state["phase"]
-                    if phase == "CAR_GREEN":
-                        green_line = self.config["settings"].get("greenLinePreference", "Car")
-                        self.state["timer"] = {"for": "car", "value": 999 if green_line == "Car" else self.config["settings"]["carGreenTime"]}
-                    elif phase == "PED_GREEN":
-                        green_line = self.config["settings"].get("greenLinePreference", "Car")
-                        self.state["timer"] = {"for": "ped", "value": 999 if green_line == "Pedestrian" else self.config["settings"]["pedGreenTime"]}
-                return
-        
-        # Manual mode - ciclu normal de semafor (verde → galben → roșu → repetă)
-        if self.config["settings"]["mode"] == "Manual":
-            # Actualizează timer-ul
-            if self.state["timer"]["value"] > 0 and self.state["timer"]["value"] != 999:
-                elapsed = current_time - self.last_tick
-                if elapsed >= 1.0:
-                    self.state["timer"]["value"] = max(0, self.state["timer"]["value"] - 1)
-                    self.last_tick = current_time
-            
-            # Face tranziții automate când timer-ul ajunge la 0 (ciclu normal de semafor)
-            if self.state["timer"]["value"] == 0:
-                # Previne tranziții multiple
-                if self.state.get("lastUpdate") is None or (current_time - self.state["lastUpdate"]) >= 0.5:
-                    self.transition_manual()
-            return
-        
-        # Actualizează timer-ul pentru Automatic mode
-        if self.config["settings"]["mode"] == "Automatic":
-            if self.state["timer"]["value"] > 0 and self.state["timer"]["value"] != 999:
-                elapsed = current_time - self.last_tick
-                # EDGE CASE 22: Previne timer-ul să scadă prea repede
-                if elapsed >= 1.0:
-                    self.state["timer"]["value"] = max(0, self.state["timer"]["value"] - 1)
-                    self.last_tick = current_time
-            
-            # EDGE CASE 23: Face tranziții când timer-ul ajunge exact la 0
-            # Verifică explicit pentru 0 (nu doar <= 0) pentru a evita tranziții multiple
-            if self.state["timer"]["value"] == 0:
-                # EDGE CASE 24: Previne tranziții multiple dacă tick() este apelat de mai multe ori rapid
-                # Verifică dacă nu tocmai am făcut o tranziție (prin lastUpdate)
-                if self.state.get("lastUpdate") is None or (current_time - self.state["lastUpdate"]) >= 0.5:
-                    # Verifică tipul intersecției
-                    if self.config["type"] == "car_pedestrian":
-                        # EDGE CASE 51: Verifică dacă green line este pentru fază curentă - dacă da, nu face tranziție
-                        phase = self.state["phase"]
-                        green_line = self.config["settings"].get("greenLinePreference", "Car")
-                        
-                        # Dacă suntem pe green line infinită (timer 999), nu ar trebui să ajungem aici
-                        # Dar dacă ajungem, verifică dacă trebuie să rămânem pe green line
-                        if phase == "PED_GREEN" and green_line == "Pedestrian":
-                            # Green line pentru pietoni - reinițializează timer-ul la 999
-                            self.state["timer"] = {"for": "ped", "value": 999}
-                            self.state["lastUpdate"] = current_time
-                            return
-                        elif phase == "CAR_GREEN" and green_line == "Car":
-                            # Green line pentru mașini - reinițializează timer-ul la 999
-                            self.state["timer"] = {"for": "car", "value": 999}
-                            self.state["lastUpdate"] = current_time
-                            return
-                        
-                        # Altfel, face tranziția normală
-                        self.transition()
-                    elif self.config["type"] == "car_car":
-                        # Pentru car_car, verifică dacă suntem pe green line
-                        phase = self.state["phase"]
-                        green_line_light = int(self.config["settings"]["greenLinePreference"])
-                        
-                        # Dacă suntem pe green line (timer 999), nu ar trebui să ajungem aici
-                        # Dar dacă ajungem, reinițializează timer-ul la 999
-                        if phase == f"LIGHT_{green_line_light}_GREEN" and self.state["timer"].get("for") == f"light_{green_line_light}":
-                            self.state["timer"] = {"for": f"light_{green_line_light}", "value": 999}
-                            self.state["lastUpdate"] = current_time
-                            return
-                        
-                        # Altfel, face tranziția normală
-                        self.transition()
+    def changed_since(self, version):
+        """Returnează id-urile intersecțiilor modificate după `version`,
+        sau None dacă răspunsul trebuie să fie complet (versiune necunoscută sau prea veche)."""
+        if version < self.reset_version or version > self.version:
+            return None
+        return {intersection_id for intersection_id, changed in self.changed.items() if changed > version}
     
-    def transition_manual(self):
-        """Face tranziția la următoarea fază în modul Manual (ciclu normal de semafor)."""
-        phase = self.state["phase"]
-        settings = self.config["settings"]
-        current_time = time.time()
-        
-        if self.config["type"] == "car_pedestrian":
-            previous_lights = self.state.get("lights", [0, 0]).copy()
-            
-            if phase == "CAR_GREEN":
-                self.state["phase"] = "CAR_YELLOW"
-                self.state["lights"] = [2, 0]
-                self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-            elif phase == "CAR_YELLOW":
-                self.state["phase"] = "ALL_RED_1"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            elif phase == "ALL_RED_1":
-                self.state["phase"] = "PED_GREEN"
-                self.state["lights"] = [0, 1]
-                self.state["timer"] = {"for": "ped", "value": settings["pedGreenTime"]}
-            elif phase == "PED_GREEN":
-                self.state["phase"] = "ALL_RED_2"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            elif phase == "ALL_RED_2":
-                self.state["phase"] = "CAR_GREEN"
-                self.state["lights"] = [1, 0]
-                self.state["timer"] = {"for": "car", "value": settings["carGreenTime"]}
-            else:
-                self.state["phase"] = "CAR_GREEN"
-                self.state["lights"] = [1, 0]
-                self.state["timer"] = {"for": "car", "value": settings["carGreenTime"]}
-            
-            update_traffic_lights_physical(self.config["type"], self.state["lights"], previous_lights)
-            self.state["lastUpdate"] = current_time
-            self.last_tick = current_time
-        
-        elif self.config["type"] == "car_car":
-            # Pentru car_car, ciclu similar: LIGHT_0_GREEN → LIGHT_0_YELLOW → ALL_RED → LIGHT_1_GREEN → LIGHT_1_YELLOW → ALL_RED → repeat
-            green_line_light = int(settings["greenLinePreference"])
-            opposite_light = 1 - green_line_light
-            
-            if phase == f"LIGHT_{green_line_light}_GREEN":
-                self.state["phase"] = f"LIGHT_{green_line_light}_YELLOW"
-                lights = [0, 0]
-                lights[green_line_light] = 2  # galben
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-            elif phase == f"LIGHT_{green_line_light}_YELLOW":
-                self.state["phase"] = "ALL_RED"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            elif phase == "ALL_RED":
-                # Verifică dacă trebuie să treacă la opus sau să revină la green line
-                # În modul Manual, trece întotdeauna la opus
-                self.state["phase"] = f"LIGHT_{opposite_light}_GREEN"
-                lights = [0, 0]
-                lights[opposite_light] = 1  # verde
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": f"light_{opposite_light}", "value": settings["carGreenTime"]}
-            elif phase == f"LIGHT_{opposite_light}_GREEN":
-                self.state["phase"] = f"LIGHT_{opposite_light}_YELLOW"
-                lights = [0, 0]
-                lights[opposite_light] = 2  # galben
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-            elif phase == f"LIGHT_{opposite_light}_YELLOW":
-                self.state["phase"] = "ALL_RED"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            else:
-                # Reinițializează la green line
-                self.state["phase"] = f"LIGHT_{green_line_light}_GREEN"
-                lights = [0, 0]
-                lights[green_line_light] = 1
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": f"light_{green_line_light}", "value": settings["carGreenTime"]}
-            
-            self.state["lastUpdate"] = current_time
-            self.last_tick = current_time
+    def changed_on_disk(self):
+        """Verifică dacă fișierul a fost modificat din afara aplicației (fără a-l citi)."""
+        return self._file_mtime() != self.mtime
     
-    def transition(self):
-        """Face tranziția la următoarea fază (pentru modul Automatic)."""
-        phase = self.state["phase"]
-        settings = self.config["settings"]
-        
-        if self.config["type"] == "car_pedestrian":
-            green_line = settings.get("greenLinePreference", "Car")
-            
-            previous_lights = self.state.get("lights", [0, 0]).copy()
-            
-            if phase == "CAR_YELLOW":
-                self.state["phase"] = "ALL_RED_1"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            elif phase == "ALL_RED_1":
-                self.state["phase"] = "PED_GREEN"
-                self.state["lights"] = [0, 1]
-                if green_line == "Pedestrian":
-                    self.state["timer"] = {"for": "ped", "value": 999}
-                else:
-                    self.state["timer"] = {"for": "ped", "value": settings["pedGreenTime"]}
-            elif phase == "PED_GREEN":
-                if green_line == "Pedestrian":
-                    self.state["timer"] = {"for": "ped", "value": 999}
-                else:
-                    self.state["phase"] = "ALL_RED_2"
-                    self.state["lights"] = [0, 0]
-                    self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-            elif phase == "CAR_GREEN":
-                if green_line == "Pedestrian":
-                    self.state["phase"] = "ALL_RED_2"
-                    self.state["lights"] = [0, 0]
-                    self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-                    self.state["_fromVehicleDetection"] = False
-                else:
-                    self.state["phase"] = "CAR_YELLOW"
-                    self.state["lights"] = [2, 0]
-                    self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-            elif phase == "ALL_RED_2":
-                from_detection = self.state.get("_fromVehicleDetection", False)
-                
-                if green_line == "Pedestrian":
-                    if from_detection:
-                        self.state["phase"] = "CAR_GREEN"
-                        self.state["lights"] = [1, 0]
-                        self.state["timer"] = {"for": "car", "value": settings["carGreenTime"]}
-                        self.state["_fromVehicleDetection"] = False
-                    else:
-                        self.state["phase"] = "PED_GREEN"
-                        self.state["lights"] = [0, 1]
-                        self.state["timer"] = {"for": "ped", "value": 999}
-                        self.state["_fromVehicleDetection"] = False
-                else:
-                    self.state["phase"] = "CAR_GREEN"
-                    self.state["lights"] = [1, 0]
-                    self.state["timer"] = {"for": "car", "value": 999}
-                    self.state["_fromVehicleDetection"] = False
-            
-            update_traffic_lights_physical(self.config["type"], self.state["lights"], previous_lights)
-            self.state["lastUpdate"] = time.time()
-        
-        elif self.config["type"] == "car_car":
-            green_line_light = int(settings["greenLinePreference"])
-            opposite_light = 1 - green_line_light
-            from_opposite_detection = self.state.get("_fromOppositeDetection", False)
-            current_time = time.time()
-            
-            if phase == f"LIGHT_{green_line_light}_YELLOW":
-                # După galben green line, trece la ALL_RED
-                self.state["phase"] = "ALL_RED"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-                # Păstrează flag-ul pentru a ști că trebuie să trecem la opus
-            elif phase == "ALL_RED":
-                # Verifică de unde am venit pentru a ști dacă trebuie să trecem la opus sau să revenim la green line
-                if from_opposite_detection:
-                    # Am venit din detecție opusă pe green line → trecem la verde opus
-                    print(f"[{self.config['id']}] CAR_CAR: ALL_RED -> LIGHT_{opposite_light}_GREEN (din detecție)")
-                    self.state["phase"] = f"LIGHT_{opposite_light}_GREEN"
-                    lights = [0, 0]
-                    lights[opposite_light] = 1
-                    self.state["lights"] = lights
-                    self.state["timer"] = {"for": f"light_{opposite_light}", "value": settings["carGreenTime"]}
-                    self.state["_fromOppositeDetection"] = False  # Resetează flag-ul după ce am trecut la opus
-                    self.state["_oppositeGreenStartTime"] = time.time()  # Marchează când am trecut la verde opus
-                else:
-                    # Am venit din expirare timer verde opus → revenim la green line
-                    print(f"[{self.config['id']}] CAR_CAR: ALL_RED -> LIGHT_{green_line_light}_GREEN (revenire green line)")
-                    self.state["phase"] = f"LIGHT_{green_line_light}_GREEN"
-                    lights = [0, 0]
-                    lights[green_line_light] = 1
-                    self.state["lights"] = lights
-                    self.state["timer"] = {"for": f"light_{green_line_light}", "value": 999}  # Green line infinită
-                    self.state["_fromOppositeDetection"] = False  # Resetează flag-ul
-            elif phase == f"LIGHT_{opposite_light}_GREEN":
-                # Pe verde opus - când expiră, trece la galben
-                print(f"[{self.config['id']}] CAR_CAR: LIGHT_{opposite_light}_GREEN expirat -> YELLOW")
-                self.state["phase"] = f"LIGHT_{opposite_light}_YELLOW"
-                lights = [0, 0]
-                lights[opposite_light] = 2
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": "yellow", "value": settings["yellowTime"]}
-                # Nu resetează flag-ul - va reveni la green line după ALL_RED
-            elif phase == f"LIGHT_{opposite_light}_YELLOW":
-                # După galben opus, trece la ALL_RED și apoi revine la green line
-                print(f"[{self.config['id']}] CAR_CAR: LIGHT_{opposite_light}_YELLOW expirat -> ALL_RED (revenire green line)")
-                self.state["phase"] = "ALL_RED"
-                self.state["lights"] = [0, 0]
-                self.state["timer"] = {"for": "all_red", "value": settings["allRedSafetyTime"]}
-                # Nu setează flag-ul - înseamnă că revenim la green line
-                self.state["_fromOppositeDetection"] = False  # Asigură că revenim la green line
-                # Șterge timestamp-ul pentru verde opus
-                if "_oppositeGreenStartTime" in self.state:
-                    del self.state["_oppositeGreenStartTime"]
-            else:
-                # EDGE CASE 36: Faza necunoscută pentru car_car - reinițializează la green line
-                print(f"⚠ Avertisment: Faza necunoscută '{phase}' pentru {self.config['id']}. Reinițializare la green line.")
-                self.state["phase"] = f"LIGHT_{green_line_light}_GREEN"
-                lights = [0, 0]
-                lights[green_line_light] = 1
-                self.state["lights"] = lights
-                self.state["timer"] = {"for": f"light_{green_line_light}", "value": 999}
-                self.state["_fromOppositeDetection"] = False
-            
-            self.state["lastUpdate"] = current_time
-            # EDGE CASE 37: Resetează last_tick după tranziție
-            self.last_tick = current_time
+    def mark_saved(self, mtime):
+        """Reține mtime-ul fișierului scris de aplicație (pentru a nu-l reîncărca inutil).
+        mtime: luat de persister de pe fișierul scris, nu re-citit de pe disc - o modificare
+        externă făcută imediat după scriere are alt mtime și este reîncărcată."""
+        self.mtime = mtime
+
+config_store = ConfigStore(INTERSECTIONS_FILE)
+# O cameră căzută trece intersecția pe ciclul fix Manual până când trimite din nou cadre
+capture_registry = CaptureRegistry(lock, lambda: config_store.intersections, intersections_cameras,
+                                   on_health=lambda intersection_id, healthy:
+                                   set_detector_blind(intersection_id, "camera", not healthy))
+# Ratele de inferență per cameră, în bugetul de timp al buclei de detecție
+inference_scheduler = InferenceScheduler()
+CONFIG_WATCH_INTERVAL = 2.0  # secunde între verificările mtime ale fișierului
 
 # --- Funcția de procesare video cu detecție de zone ---
 
-def video_processing_loop(model, class_map, intersections_config):
-    """Buclează, citește cadrele camerelor, rulează detecția YOLO și actualizează starea globală."""
-    global global_frame, detection_data, last_print_time, intersections_cameras
-    
-    print("\n--- Firul de execuție pentru detecție video a început. ---")
-    
-    # Inițializează camerele pentru fiecare intersecție
-    cameras = {}
-    for intersection in intersections_config["intersections"]:
-        intersection_id = intersection["id"]
-        camera_index = intersection.get("cameraIndex", 0)
-        try:
-            cap = cv2.VideoCapture(camera_index)
-            if cap.isOpened():
-                cameras[intersection_id] = cap
-                print(f"✓ Camera {camera_index} deschisă pentru {intersection['name']}")
-            else:
-                print(f"⚠ Eroare: Nu s-a putut deschide camera {camera_index} pentru {intersection['name']}")
-        except Exception as e:
-            print(f"⚠ Eroare la deschiderea camerei {camera_index} pentru {intersection['name']}: {e}")
+def detection_message(fields):
+    """Textul mesajului de detecție (formatat de firul jurnalului, nu de bucla video)."""
+    status = []
+    if fields["humans"]:
+        status.append("HUMANS")
+    if fields["wheels"]:
+        zones = [z for z, v in fields["zones"].items() if v]
+        status.append(f"WHEELS-Z{','.join(zones)}")
+    return f"Detecție [{fields['intersection']}]: {' '.join(status)}"
+
+def video_processing_loop(class_map):
+    """Buclează, citește cadrele camerelor, rulează detecția YOLO și actualizează starea globală.
+    Până când modelul este încărcat în fundal (detection_model), cadrele sunt doar afișate.
+    """
+    global global_frame, detection_data
     
-    if not cameras:
-        print("✗ Eroare: Nu s-au putut deschide camere pentru nicio intersecție!")
-        return
+    log.info("video_loop", "\n--- Firul de execuție pentru detecție video a început. ---")
     
+    # Camerele (sau sursele din fișiere) sunt deschise de capture_registry în fundal;
+    # bucla folosește copia registrului luată la sfârșitul fiecărui ciclu, sub lock
     with lock:
-        intersections_cameras.update(cameras)
-    
-    # Folosește prima cameră disponibilă pentru global_frame (pentru video feed)
-    primary_camera_id = list(cameras.keys())[0] if cameras else None
-    primary_cap = cameras[primary_camera_id] if primary_camera_id else None
+        cameras = capture_registry.snapshot()
+    recorder = detection_recorder
+    frame_number = 0
+    last_inference = {}  # {intersection_id: momentul ultimei inferențe} - pentru INFERENCE_FPS
+    display_pools = {}  # {intersection_id: FramePool} - bufferele cadrelor desenate pentru fluxul video
+    last_boxes = {}  # {intersection_id: obiectele ultimei inferențe} - desenate și pe cadrele dintre inferențe
 
     while True:
         try:
+            frame_number += 1
+            model = detection_model
             # Procesează fiecare cameră pentru intersecția corespunzătoare
             new_detection_data = {}
+            frame_traces = {}  # {intersection_id: Trace} pentru cadrele citite în acest ciclu
             combined_frame = None
+            new_frames = {}  # {intersection_id: Frame desenat}, publicate sub lock la sfârșitul ciclului
+            # Folosește configurația curentă din memorie (zonele/setările actualizate prin API)
+            intersections_config = config_store.intersections
             
-            for intersection in intersections_config["intersections"]:
-                intersection_id = intersection["id"]
-                camera_index = intersection.get("cameraIndex", 0)
-                
-                # Inițializează detecțiile pentru această intersecție
-                # Pentru car_car, inițializează zonele pentru fiecare light și zonă personalizată
-                zones_dict = {}
-                if intersection.get("type") == "car_car":
-                    # Inițializează zonele pentru fiecare light și zonă personalizată
-                    for light_config in intersection.get("lights", []):
-                        light_id = light_config.get("id")
-                        custom_zones = light_config.get("customZones", [])
-                        if custom_zones:
-                            # Dacă există zone personalizate, inițializează-le
-                            for zone_idx in range(len(custom_zones)):
-                                zone_key = f"light_{light_id}_zone_{zone_idx}"
-                                zones_dict[zone_key] = False
-                        else:
-                            # Dacă nu există zone personalizate, folosește fallback la quadrants
-                            # Inițializează zonele pentru quadrants (0-3)
-                            for zone_idx in range(4):
-                                zone_key = str(zone_idx)
-                                if zone_key not in zones_dict:
-                                    zones_dict[zone_key] = False
-                else:
-                    # Pentru car_pedestrian, folosește quadrants vechi
-                    zones_dict = {"0": False, "1": False, "2": False, "3": False}
+            previous_detection = detection_data
+            inferred = set()  # intersecțiile cu inferență în acest ciclu
+            
+            # Camerele cu prioritate mai mare (și cele mai întârziate) sunt servite primele
+            for intersection in sorted(intersections_config, key=lambda i: inference_scheduler.rank(i.id)):
+                intersection_id = intersection.id
                 
-                new_detection_data[intersection_id] = {
-                    "humans": False,
-                    "wheels": False,
-                    "zones": zones_dict
-                }
+                # Inițializează detecțiile pentru această intersecție (toate zonele inactive)
+                new_detection_data[intersection_id] = empty_detection(intersection)
                 
                 # Citește frame-ul de la camera corespunzătoare
                 if intersection_id in cameras:
                     cap = cameras[intersection_id]
-                    ret, frame = cap.read()
+                    with STAGE_SECONDS.time("video", "capture"):
+                        ret, frame = cap.read()
+                    
+                    # Între inferențe, intersecția își păstrează ultima detecție
+                    if model is not None and intersection_id in previous_detection:
+                        new_detection_data[intersection_id] = previous_detection[intersection_id]
                     
                     if not ret:
+                        # Niciun cadru nou de la camera acestei intersecții (citită pe firul ei)
+                        FRAME_SKIPS_TOTAL.labels(intersection_id).inc()
                         continue
+                    frame_time = time.time()
+                    FRAMES_TOTAL.labels(intersection_id).inc()
                     
-                    # Folosește primul frame disponibil pentru global_frame
+                    # Folosește primul frame disponibil pentru global_frame (aceeași memorie, fără copie)
                     if combined_frame is None:
-                        combined_frame = frame.copy()
+                        combined_frame = frame.acquire()
                     
-                    frame_height, frame_width = frame.shape[:2]
-                    center_x = frame_width // 2
-                    center_y = frame_height // 2
+                    # Cadrul camerei este doar pentru citire - liniile și detecțiile sunt desenate
+                    # pe o copie dintr-un buffer refolosit
+                    pool = display_pools.get(intersection_id)
+                    if pool is None:
+                        pool = display_pools[intersection_id] = FramePool(intersection_id, "display")
+                    with STAGE_SECONDS.time("video", "copy"):
+                        display = pool.copy(frame.image)
                     
                     # Desenează linii pentru zone (debug)
-                    cv2.line(frame, (center_x, 0), (center_x, frame_height), (128, 128, 128), 1)
-                    cv2.line(frame, (0, center_y), (frame_width, center_y), (128, 128, 128), 1)
+                    with STAGE_SECONDS.time("video", "draw"):
+                        draw_guides(display.image)
+                    
+                    started = time.monotonic()
+                    if model is None or not inference_scheduler.due(intersection_id, started):
+                        # Modelul se încarcă încă sau camera nu are rând la inferență în acest ciclu -
+                        # fluxul video primește cadrul cu ultimele detecții
+                        with STAGE_SECONDS.time("video", "draw"):
+                            draw_detections(display.image, last_boxes.get(intersection_id, ()))
+                        new_frames[intersection_id] = display.freeze()
+                        frame.release()
+                        continue
+                    inferred.add(intersection_id)
+                    new_detection_data[intersection_id] = empty_detection(intersection)
+                    if TRACING_ENABLED:
+                        frame_traces[intersection_id] = Trace(intersection_id, frame_time)
                     
                     # --- Rulare Detecție pentru această cameră ---
-                    results = model.predict(frame, stream=True, verbose=False)
+                    with STAGE_SECONDS.time("video", "inference"):
+                        results = run_inference(model, frame.image)
+                    now = time.perf_counter()
+                    previous = last_inference.get(intersection_id)
+                    if previous is not None and now > previous:
+                        fps = INFERENCE_FPS.labels(intersection_id)
+                        instant = 1.0 / (now - previous)
+                        fps.set(instant if not fps.value else
+                                fps.value + INFERENCE_FPS_SMOOTHING * (instant - fps.value))
+                    last_inference[intersection_id] = now
+                    if TRACING_ENABLED:
+                        frame_traces[intersection_id].mark("inference")
                     
-                    # Procesează rezultatele pentru această intersecție
-                    for r in results:
-                        boxes = r.boxes
-                        
-                        for box in boxes:
-                            class_id = int(box.cls[0])
-                            
-                            if class_id in class_map:
-                                category = class_map[class_id]
-                                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                                center_box_x = (x1 + x2) // 2
-                                center_box_y = (y1 + y2) // 2
-                                
-                                # Pentru car_car intersections, verifică dacă obiectul este în zonele personalizate
-                                intersection_config = None
-                                for inter in intersections_config["intersections"]:
-                                    if inter["id"] == intersection_id:
-                                        intersection_config = inter
-                                        break
-                                
-                                # Actualizează detecțiile pentru această intersecție
-                                if category == "humans":
-                                    new_detection_data[intersection_id]["humans"] = True
-                                elif category == "wheels":
-                                    new_detection_data[intersection_id]["wheels"] = True
-                                    
-                                    # Pentru car_car, verifică zonele personalizate
-                                    if intersection_config and intersection_config.get("type") == "car_car":
-                                        # Verifică pentru fiecare light dacă obiectul intersectează zonele sale
-                                        for light_config in intersection_config.get("lights", []):
-                                            light_id = light_config.get("id")
-                                            custom_zones = light_config.get("customZones", [])  # Lista de zone personalizate
-                                            
-                                            # Verifică dacă bounding box-ul obiectului intersectează oricare dintre zonele personalizate
-                                            # Zonele sunt salvate în coordonate canvas (640x480), trebuie să le scalăm la dimensiunile reale ale frame-ului
-                                            canvas_width = 640  # Dimensiunea canvas-ului în frontend
-                                            canvas_height = 480
-                                            
-                                            for zone_idx, zone in enumerate(custom_zones):
-                                                if isinstance(zone, dict) and "x" in zone and "y" in zone and "width" in zone and "height" in zone:
-                                                    # Scalează coordonatele zonei de la canvas (640x480) la dimensiunile reale ale frame-ului
-                                                    scale_x = frame_width / canvas_width
-                                                    scale_y = frame_height / canvas_height
-                                                    
-                                                    zone_x = int(zone["x"] * scale_x)
-                                                    zone_y = int(zone["y"] * scale_y)
-                                                    zone_width = int(zone["width"] * scale_x)
-                                                    zone_height = int(zone["height"] * scale_y)
-                                                    
-                                                    # Verifică intersecția bounding box-ului obiectului cu zona
-                                                    # Obiectul este detectat dacă există orice suprapunere
-                                                    zone_right = zone_x + zone_width
-                                                    zone_bottom = zone_y + zone_height
-                                                    
-                                                    # Verifică dacă există intersecție între bounding box-ul obiectului și zona
-                                                    if not (x2 < zone_x or x1 > zone_right or y2 < zone_y or y1 > zone_bottom):
-                                                        # Există intersecție - obiectul este în zonă
-                                                        zone_key = f"light_{light_id}_zone_{zone_idx}"
-                                                        new_detection_data[intersection_id]["zones"][zone_key] = True
-                                                        # Debug logging (doar ocazional pentru a nu încărca log-ul)
-                                                        if time.time() % 2 < 0.1:  # Log doar aproximativ o dată la 2 secunde
-                                                            print(f"[{intersection_id}] Detecție în {zone_key}: obiect ({x1},{y1})-({x2},{y2}) intersectează zona ({zone_x},{zone_y})-({zone_right},{zone_bottom})")
-                                    else:
-                                        # Pentru car_pedestrian sau alte tipuri, folosește logica veche cu quadrants
-                                        zone = None
-                                        if center_box_x < center_x:
-                                            if center_box_y < center_y:
-                                                zone = 0  # top-left
-                                            else:
-                                                zone = 2  # bottom-left
-                                        else:
-                                            if center_box_y < center_y:
-                                                zone = 1  # top-right
-                                            else:
-                                                zone = 3  # bottom-right
-                                        new_detection_data[intersection_id]["zones"][str(zone)] = True
-                                
-                                # Vizualizare
-                                if category == "humans":
-                                    color = (0, 255, 0)
-                                    label_text = "HUMANS"
-                                else:
-                                    color = (0, 0, 255)
-                                    label_text = f"WHEELS-Z{zone}"
-                                
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                                confidence = float(box.conf[0])
-                                label = f"{label_text}: {confidence:.2f}"
-                                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                    # Procesează rezultatele pentru această intersecție (zone)
+                    boxes = []
+                    with STAGE_SECONDS.time("video", "postprocess"):
+                        assign_zones(results, frame.image, intersection, class_map,
+                                     new_detection_data[intersection_id], boxes)
+                    frame.release()
+                    last_boxes[intersection_id] = boxes
+                    inference_scheduler.record(intersection_id, started, time.monotonic() - started)
                     
-                    # Actualizează frame-ul pentru această intersecție
-                    intersections_frames[intersection_id] = frame.copy()
+                    # Vizualizare
+                    with STAGE_SECONDS.time("video", "draw"):
+                        draw_detections(display.image, boxes)
                     
-                    # Actualizează global_frame cu primul frame disponibil (pentru backward compatibility)
-                    if combined_frame is None:
-                        combined_frame = frame.copy()
+                    if recorder is not None:
+                        with STAGE_SECONDS.time("video", "record"):
+                            for box in boxes:
+                                recorder.record_box(frame_time, intersection_id, frame_number, *box)
+                            recorder.record_frame(frame_time, intersection_id, frame_number,
+                                                  new_detection_data[intersection_id])
+                    
+                    # Actualizează frame-ul pentru această intersecție
+                    new_frames[intersection_id] = display.freeze()
 
             # Actualizează detecțiile globale
+            waited = time.perf_counter()
             with lock:
+                locked = time.perf_counter()
+                STAGE_SECONDS.observe(locked - waited, "video", "lock_wait")
+                # Cadrele înlocuite revin în pool-urile lor când ultimul flux video le eliberează
+                replaced = [intersections_frames.get(intersection_id) for intersection_id in new_frames]
+                intersections_frames.update(new_frames)
                 if combined_frame is not None:
+                    replaced.append(global_frame)
                     global_frame = combined_frame
+                for old in replaced:
+                    if old is not None:
+                        old.release()
                 detection_data = new_detection_data
                 
                 # Actualizează state machine-urile
                 state_machines_items = list(intersections_state.items())
                 for intersection_id, state_machine in state_machines_items:
                     try:
-                        if intersection_id in new_detection_data:
+                        # Doar detecțiile noi - cele păstrate între inferențe au fost deja aplicate
+                        if intersection_id in inferred:
                             # Obține dimensiunile frame-ului pentru această intersecție
                             if intersection_id in cameras:
                                 cap = cameras[intersection_id]
@@ -1243,60 +538,288 @@ def video_processing_loop(model, class_map, intersections_config):
                                 frame_width, frame_height = 640, 480
                             # Pass the detection data for this specific intersection
                             intersection_detection = new_detection_data[intersection_id]
-                            state_machine.update_from_detection(intersection_detection, frame_width, frame_height)
+                            state_machine.update_from_detection(intersection_detection, frame_width, frame_height,
+                                                                trace=frame_traces.get(intersection_id))
+                            # O tranziție declanșată de detecție armează imediat noul deadline
+                            reschedule(intersection_id)
                     except Exception as e:
-                        print(f"⚠ Eroare la update_from_detection pentru {intersection_id}: {e}")
-                        import traceback
-                        traceback.print_exc()
+                        log.error("update_failed", "⚠ Eroare la update_from_detection pentru {intersection}: {error}",
+                                  exc=True, intersection=intersection_id, error=str(e))
+                STAGE_SECONDS.observe(time.perf_counter() - locked, "video", "state_update")
+                # Sursele adăugate / înlocuite de reconfigurare intră în ciclul următor
+                previous_cameras, cameras = cameras, capture_registry.snapshot()
+                retired = capture_registry.drain()
+                for intersection_id in [i for i in previous_cameras if i not in cameras and i not in intersections_state]:
+                    # Intersecție ștearsă - și seriile recreate de ciclurile rulate până la oprirea camerei ei
+                    remove_intersection_metrics(intersection_id)
+                for intersection_id in [i for i in display_pools if i not in cameras]:
+                    del display_pools[intersection_id]
+                    last_boxes.pop(intersection_id, None)
+                # Prioritățile inferenței urmează starea intersecțiilor (ex. linia verde care așteaptă)
+                inference_scheduler.update({intersection_id: detection_priority(intersections_state.get(intersection_id))
+                                            for intersection_id in cameras})
+            
+            # Sursele înlocuite nu mai sunt citite de nimeni - eliberate în afara lock-ului
+            for cap in retired:
+                cap.release()
             
-            # Logare
-            time_now = time.time()
-            should_print = (time_now - last_print_time) > PRINT_COOLDOWN
-            if should_print:
-                for intersection_id, detection in new_detection_data.items():
-                    if detection["humans"] or detection["wheels"]:
-                        status = []
-                        if detection["humans"]:
-                            status.append("HUMANS")
-                        if detection["wheels"]:
-                            zones = [z for z, v in detection["zones"].items() if v]
-                            status.append(f"WHEELS-Z{','.join(zones)}")
-                        print(f"Detecție [{intersection_id}]: {' '.join(status)}")
-                        last_print_time = time_now
+            # Logare (mesajul este formatat de firul jurnalului, cel mult o dată la PRINT_COOLDOWN per intersecție)
+            for intersection_id, detection in new_detection_data.items():
+                if detection["humans"] or detection["wheels"]:
+                    log.info("detection", detection_message, every=PRINT_COOLDOWN, per="intersection",
+                             intersection=intersection_id, humans=detection["humans"],
+                             wheels=detection["wheels"], zones=detection["zones"])
             
-            time.sleep(0.033)  # ~30 FPS
+            # Până la următoarea inferență programată (cel mult ~30 FPS pentru fluxul video)
+            time.sleep(inference_scheduler.sleep_time(time.monotonic()) if model is not None else MAX_SLEEP)
             
         except Exception as e:
-            print(f"⚠ Eroare în video_processing_loop: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error("video_loop_failed", "⚠ Eroare în video_processing_loop: {error}", exc=True, error=str(e))
             time.sleep(1)
 
-# --- Thread pentru state machine ticks ---
+# --- Scheduler pentru state machine ticks ---
+
+class DeadlineScheduler:
+    """Coadă de priorități cu deadline-urile (ceas monoton) ale fiecărei intersecții.
+    
+    Firul de tick doarme exact până la următorul deadline și este trezit imediat
+    când o detecție sau o comandă reprogramează o intersecție.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []  # [(deadline, seq, intersection_id)] - intrările învechite sunt ignorate
+        self._armed = {}  # {intersection_id: deadline} - singura programare validă per intersecție
+        self._seq = itertools.count()
+    
+    def schedule(self, intersection_id, deadline):
+        """Programează (sau anulează, dacă deadline este None) următorul tick al unei intersecții."""
+        with self._cond:
+            if deadline is None:
+                self._armed.pop(intersection_id, None)
+                return
+            if self._armed.get(intersection_id) == deadline:
+                return
+            self._armed[intersection_id] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._seq), intersection_id))
+            self._cond.notify()
+    
+    def wake(self, intersection_id):
+        """Cere un tick imediat pentru intersecție (nu amână niciodată o programare existentă)."""
+        now = time.monotonic()
+        with self._cond:
+            armed = self._armed.get(intersection_id)
+            if armed is not None and armed <= now:
+                return
+        self.schedule(intersection_id, now)
+    
+    def wait_due(self):
+        """Blochează până când cel puțin o intersecție devine scadentă și returnează lista lor."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, _, intersection_id = heapq.heappop(self._heap)
+                    # EDGE CASE 41: Ignoră intrările învechite (intersecția a fost reprogramată)
+                    if self._armed.get(intersection_id) == deadline:
+                        del self._armed[intersection_id]
+                        due.append(intersection_id)
+                if due:
+                    return due
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+scheduler = DeadlineScheduler()
+
+def reschedule(intersection_id):
+    """Reprogramează următorul deadline al unei intersecții. Se apelează sub lock după orice modificare."""
+    state_machine = intersections_state.get(intersection_id)
+    scheduler.schedule(intersection_id, state_machine.next_deadline() if state_machine else None)
 
 def state_machine_tick_loop():
-    """Loop pentru actualizarea state machine-urilor."""
+    """Loop pentru actualizarea state machine-urilor, trezit exact la deadline-ul următoarei faze."""
+    with lock:
+        for intersection_id in list(intersections_state.keys()):
+            scheduler.wake(intersection_id)
+    
     while True:
-        time.sleep(1)  # Tick la fiecare secundă
+        due = scheduler.wait_due()
         try:
+            waited = time.perf_counter()
             with lock:
-                # EDGE CASE 38: Iterează peste o copie a listei pentru a evita erori dacă se modifică în timpul iterației
-                state_machines = list(intersections_state.values())
-                for state_machine in state_machines:
+                STAGE_SECONDS.observe(time.perf_counter() - waited, "tick", "lock_wait")
+                for intersection_id in due:
+                    state_machine = intersections_state.get(intersection_id)
+                    # EDGE CASE 38: Intersecția poate fi ștearsă între programare și tick
+                    if state_machine is None:
+                        continue
                     try:
-                        state_machine.tick()
+                        with STAGE_SECONDS.time("tick", "tick"):
+                            state_machine.tick()
+                        TICKS_TOTAL.labels(intersection_id).inc()
                     except Exception as e:
                         # EDGE CASE 39: Previne căderea întregului sistem dacă o intersecție are o eroare
-                        print(f"⚠ Eroare la tick pentru {state_machine.config.get('id', 'unknown')}: {e}")
-                        import traceback
-                        traceback.print_exc()
+                        log.error("tick_failed", "⚠ Eroare la tick pentru {intersection}: {error}",
+                                  exc=True, intersection=intersection_id, error=str(e))
+                        # Reîncearcă peste o secundă în loc să revină imediat pe același deadline
+                        scheduler.schedule(intersection_id, time.monotonic() + 1)
+                        continue
+                    reschedule(intersection_id)
         except Exception as e:
             # EDGE CASE 40: Previne căderea thread-ului de tick
-            print(f"⚠ Eroare în state_machine_tick_loop: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error("tick_loop_failed", "⚠ Eroare în state_machine_tick_loop: {error}", exc=True, error=str(e))
             time.sleep(1)  # Așteaptă înainte de a reîncerca
 
+# --- Sincronizarea configurației cu discul ---
+
+def snapshot_intersections():
+    """Serializează configurația cu starea live a state machine-urilor (document nou, de salvat).
+    Apelat de persister sub lock.
+    """
+    states = {intersection_id: state_machine.snapshot_state()
+              for intersection_id, state_machine in intersections_state.items()}
+    # Snapshot-ul include tot ce este în jurnal - jurnalul curent este rotit (compactare)
+    journal.rotate()
+    return serialize_intersections(config_store.intersections, states)
+
+def on_intersections_saved(mtime):
+    """Apelat de persister sub lock, după fiecare scriere (mtime-ul fișierului scris)."""
+    config_store.mark_saved(mtime)
+    journal.discard_rotated()
+
+journal = StateJournal(JOURNAL_FILE)
+
+persister = WriteBehindPersister(INTERSECTIONS_FILE, snapshot_intersections, lock,
+                                 interval=PERSIST_INTERVAL, on_saved=on_intersections_saved)
+
+def persist_intersections(intersection_id=None):
+    """Marchează configurația ca modificată; scrierea pe disc se face în fundal de persister.
+    Se apelează sub lock; incrementează versiunea configurației (a intersecției, dacă este dată).
+    """
+    config_store.bump(intersection_id)
+    persister.mark_dirty()
+    return True
+
+def journal_observer(state_machine, event):
+    """Observator pentru state machine-uri: scrie evenimentul în jurnal (apelat sub lock)."""
+    journal.append({
+        "t": time.time(),
+        "id": state_machine.config.id,
+        "ev": event["kind"],
+        "from": event["from"],
+        "mode": state_machine.config.settings.mode,
+        "state": state_machine.snapshot_state(),
+        "det": event["trigger"]
+    })
+    config_store.bump(state_machine.config.id)
+    # Compactare: un snapshot nou permite eliminarea jurnalului acumulat
+    if journal.size > JOURNAL_MAX_BYTES:
+        persister.mark_dirty()
+
+def replay_journal(intersections_config):
+    """Aplică peste documentul JSON încărcat (înainte de compilare) evenimentele din jurnal
+    și returnează numărul lor. Fiecare înregistrare conține starea completă, deci ultima per
+    intersecție câștigă.
+    """
+    intersections_by_id = {i["id"]: i for i in intersections_config["intersections"]}
+    applied = 0
+    for record in journal.replay():
+        intersection = intersections_by_id.get(record.get("id"))
+        if intersection is None or not isinstance(record.get("state"), dict):
+            continue
+        intersection["state"] = record["state"]
+        if record.get("mode") in ["Automatic", "Manual", "Override"]:
+            intersection["settings"]["mode"] = record["mode"]
+        applied += 1
+    return applied
+
+def create_state_machine(intersection):
+    """Creează și înregistrează state machine-ul unei intersecții (apelat sub lock)."""
+    state_machine = IntersectionStateMachine(intersection, actuator=update_traffic_lights_physical)
+    state_machine.observers.append(journal_observer)
+    if detection_model is None:
+        state_machine.set_blind("model", True)
+    if not capture_registry.healthy(intersection.id):
+        state_machine.set_blind("camera", True)
+    intersections_state[intersection.id] = state_machine
+    return state_machine
+
+def set_detector_blind(intersection_id, reason, blind):
+    """Trece intersecția pe ciclul fix Manual cât timp detectorul ei nu vede (apelat sub lock)."""
+    state_machine = intersections_state.get(intersection_id)
+    if state_machine is None:
+        return
+    was_blind = bool(state_machine.blind_reasons)
+    state_machine.set_blind(reason, blind)
+    if bool(state_machine.blind_reasons) != was_blind:
+        # Timer-ul fazei s-a schimbat (infinit <-> finit) - clienții ?since= trebuie să-l vadă
+        config_store.bump(intersection_id)
+        reschedule(intersection_id)
+
+def sync_state_machines():
+    """Aduce state machine-urile la configurația curentă (apelat sub lock, după o reîncărcare).
+    Cele existente preiau noua configurație și își păstrează starea live; intersecțiile noi
+    primesc un state machine, iar cele șterse sunt oprite.
+    """
+    configured = {intersection.id: intersection for intersection in config_store.intersections}
+    for intersection_id in [i for i in intersections_state if i not in configured]:
+        del intersections_state[intersection_id]
+        frame = intersections_frames.pop(intersection_id, None)
+        if frame is not None:
+            frame.release()
+        reschedule(intersection_id)  # anulează deadline-ul programat
+        remove_intersection_metrics(intersection_id)
+        log.info("intersection_removed", "✓ Intersecția {intersection} a fost oprită", intersection=intersection_id)
+    for intersection in config_store.intersections:
+        state_machine = intersections_state.get(intersection.id)
+        if state_machine:
+            state_machine.config = intersection
+            reschedule(intersection.id)
+        else:
+            create_state_machine(intersection)
+            scheduler.wake(intersection.id)
+            log.info("intersection_added", "✓ Intersecția {name} ({type}) a fost pornită",
+                     intersection=intersection.id, name=intersection.name, type=intersection.type)
+
+def config_watch_loop():
+    """Reîncarcă intersections.json doar când fișierul a fost modificat pe disc (mtime)."""
+    while True:
+        time.sleep(CONFIG_WATCH_INTERVAL)
+        try:
+            if not config_store.changed_on_disk():
+                continue
+            # Citirea, parsarea și validarea se fac în afara lock-ului
+            mtime = config_store._file_mtime()
+            try:
+                new_intersections = compile_intersections(load_intersections())
+            except ConfigError as e:
+                log.warning("config_invalid", "⚠ {path} modificat pe disc este invalid, se păstrează configurația curentă: {error}",
+                            path=INTERSECTIONS_FILE, error=str(e))
+                with lock:
+                    config_store.mtime = mtime
+                continue
+            with lock:
+                # EDGE CASE 42: Fișierul tocmai a fost scris de persister - nu-l reîncărca
+                if mtime == config_store.mtime:
+                    continue
+                # EDGE CASE 71: O scriere a persister-ului este în curs (sau modificări nescrise) -
+                # fișierul citit poate fi snapshot-ul lui, mai vechi decât starea din memorie;
+                # la fel dacă fișierul s-a schimbat din nou după citire; verificarea se reia la
+                # următorul interval, după ce mtime-ul scrierii este înregistrat
+                if persister.pending() or config_store._file_mtime() != mtime:
+                    continue
+                config_store.intersections = new_intersections
+                config_store.mtime = mtime
+                config_store.bump()
+                sync_state_machines()
+            # Camerele intersecțiilor noi / modificate sunt deschise în fundal, fără a opri detecția
+            capture_registry.request()
+            log.info("config_reloaded", "✓ {path} modificat pe disc - configurație reîncărcată (versiunea {version})",
+                     path=INTERSECTIONS_FILE, version=config_store.version)
+        except Exception as e:
+            log.error("config_watch_failed", "⚠ Eroare în config_watch_loop: {error}", exc=True, error=str(e))
+
 # --- Funcție Generator pentru Streaming Video ---
 
 def generate_frames(intersection_id=None):
@@ -1305,25 +828,38 @@ def generate_frames(intersection_id=None):
     Altfel, returnează global_frame (backward compatibility).
     """
     global global_frame, intersections_frames
-    while True:
-        time.sleep(0.05)
-        
-        with lock:
-            frame_to_use = None
-            if intersection_id and intersection_id in intersections_frames:
-                frame_to_use = intersections_frames[intersection_id]
-            elif global_frame is not None:
-                frame_to_use = global_frame
+    STREAM_CLIENTS.inc()
+    try:
+        while True:
+            time.sleep(0.05)
             
-            if frame_to_use is None:
-                continue
+            waited = time.perf_counter()
+            with lock:
+                STAGE_SECONDS.observe(time.perf_counter() - waited, "stream", "lock_wait")
+                frame_to_use = None
+                if intersection_id and intersection_id in intersections_frames:
+                    frame_to_use = intersections_frames[intersection_id]
+                elif global_frame is not None:
+                    frame_to_use = global_frame
+                
+                if frame_to_use is None:
+                    continue
+                # Referința ține bufferul neschimbat în timpul codării, care se face în afara lock-ului
+                frame_to_use.acquire()
             
-            (flag, encodedImage) = cv2.imencode(".jpg", frame_to_use)
+            try:
+                with STAGE_SECONDS.time("stream", "encode"):
+                    (flag, encodedImage) = cv2.imencode(".jpg", frame_to_use.image)
+            finally:
+                frame_to_use.release()
             if not flag:
                 continue
             
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encodedImage) + b'\r\n')
+            STREAM_FRAMES_TOTAL.inc()
+            yield mjpeg_part(encodedImage)
+    finally:
+        # Clientul s-a deconectat (Flask închide generatorul)
+        STREAM_CLIENTS.dec()
 
 # --- Endpoint-uri Flask ---
 
@@ -1376,45 +912,138 @@ def detect_status():
                 return jsonify({"status": "wheels"})
         return jsonify({"status": "none"})
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Metricile pipeline-ului în formatul text Prometheus (fără lock-ul global)."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/traces")
+def traces_endpoint():
+    """Percentilele latenței detecție -> lampă per intersecție și per hop.
+    ?intersection=<id>&recent=N adaugă ultimele N trace-uri complete ale intersecției.
+    """
+    result = {"intersections": trace_collector.summary()}
+    intersection_id = request.args.get("intersection")
+    if intersection_id:
+        result["recent"] = trace_collector.recent(intersection_id, request.args.get("recent", 10, type=int))
+    return jsonify(result)
+
+@app.route("/inference", methods=['GET'])
+def get_inference():
+    """Planificarea inferenței: prioritatea, rata țintă, alocată și obținută a fiecărei camere."""
+    return jsonify(inference_scheduler.report())
+
+@app.route("/lock_stats", methods=['GET'])
+def get_lock_stats():
+    """Contenția lock-ului global: așteptare / deținere per loc de apel și primii contestatari."""
+    return jsonify(lock.stats(top=request.args.get("top", 10, type=int)))
+
+@app.route("/lock_stats", methods=['POST'])
+def set_lock_profiling():
+    """Pornește / oprește profilarea lock-ului în timpul rulării: {"enabled": bool, "reset": bool}."""
+    data = request.json or {}
+    if "enabled" in data:
+        if not isinstance(data["enabled"], bool):
+            return jsonify({"error": "enabled trebuie să fie true sau false"}), 400
+        lock.enabled = data["enabled"]
+    if data.get("reset"):
+        lock.reset()
+    return jsonify({"success": True, "enabled": lock.enabled})
+
+def intersections_etag():
+    """ETag-ul stării intersecțiilor, calculat fără a construi răspunsul (apelat sub lock).
+    Pe lângă versiune include timer-ele care scad, afișate de dashboard la fiecare secundă.
+    """
+    timers = [state_machine.timer_value() for state_machine in intersections_state.values()
+              if state_machine.deadline is not None]
+    return f"{config_store.version}-{zlib.crc32(','.join(map(str, timers)).encode()):08x}"
+
+@app.route("/ready", methods=['GET'])
+def readiness():
+    """Starea fiecărui subsistem; 200 când detecția este activă, 503 cât timp modelul se încarcă
+    (semafoarele rulează deja, pe ciclul fix Manual)."""
+    with lock:
+        configured = [intersection.id for intersection in config_store.intersections]
+        version = config_store.version
+        model = dict(model_status)
+        fallback = {intersection_id: sorted(state_machine.blind_reasons)
+                    for intersection_id, state_machine in intersections_state.items() if state_machine.blind_reasons}
+        running = len(intersections_state)
+        cameras_open = [intersection_id for intersection_id in configured if capture_registry.healthy(intersection_id)]
+    
+    if len(cameras_open) == len(configured):
+        cameras_status = "ready"
+    else:
+        cameras_status = "degraded" if cameras_open else "unavailable"
+    subsystems = {
+        "config": {"status": "ready", "version": version, "intersections": len(configured)},
+        "state_machines": {"status": "ready" if running == len(configured) else "starting",
+                           "running": running, "fallback": fallback},
+        "model": model,
+        "cameras": {"status": cameras_status, "healthy": cameras_open,
+                    "unhealthy": [i for i in configured if i not in cameras_open]},
+    }
+    ready = model["status"] == "ready" and subsystems["state_machines"]["status"] == "ready"
+    return jsonify({"ready": ready, "subsystems": subsystems}), 200 if ready else 503
+
 @app.route("/intersections", methods=['GET'])
 def get_intersections():
-    """Returnează toate intersecțiile cu setările și starea curentă."""
+    """Returnează toate intersecțiile cu setările și starea curentă (din memorie, fără acces la disc).
+    
+    Răspunsul poartă un ETag: cu If-None-Match egal, răspunsul este 304 fără corp.
+    ?since=<versiune> - doar intersecțiile modificate după versiunea dată, plus cele cu timer
+    care scade; "full": true dacă versiunea nu mai este cunoscută (clientul înlocuiește tot).
+    ?fields=state - doar {id, state} pentru fiecare intersecție.
+    """
+    since = request.args.get("since", type=int)
+    fields = request.args.get("fields")
+    if fields not in (None, "state"):
+        return jsonify({"error": "fields poate fi doar 'state'"}), 400
+    
     with lock:
-        intersections_config = load_intersections()
+        etag = intersections_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        changed = None if since is None else config_store.changed_since(since)
         result = []
         
-        for intersection in intersections_config["intersections"]:
-            intersection_id = intersection["id"]
-            state_machine = intersections_state.get(intersection_id)
-            
-            if state_machine:
-                intersection_data = {
-                    "id": intersection_id,
-                    "name": intersection["name"],
-                    "type": intersection["type"],
-                    "cameraIndex": intersection.get("cameraIndex", 0),
-                    "lights": intersection["lights"],
-                    "settings": intersection["settings"],
-                    "state": state_machine.state.copy()
-                }
-            else:
-                intersection_data = {
-                    "id": intersection_id,
-                    "name": intersection["name"],
-                    "type": intersection["type"],
-                    "cameraIndex": intersection.get("cameraIndex", 0),
-                    "lights": intersection["lights"],
-                    "settings": intersection["settings"],
-                    "state": intersection["state"]
-                }
+        for intersection in config_store.intersections:
+            state_machine = intersections_state.get(intersection.id)
+            if (changed is not None and intersection.id not in changed
+                    and (state_machine is None or state_machine.deadline is None)):
+                continue
+            state = state_machine.snapshot_state() if state_machine else intersection.state.to_dict()
             
-            result.append(intersection_data)
+            if fields == "state":
+                result.append({"id": intersection.id, "state": state})
+                continue
+            result.append({
+                "id": intersection.id,
+                "name": intersection.name,
+                "type": intersection.type,
+                "cameraIndex": intersection.camera_index,
+                "lights": [light.to_dict() for light in intersection.lights],
+                "settings": intersection.settings.to_dict(),
+                "state": state
+            })
         
-        return jsonify({"intersections": result})
+        body = {"intersections": result, "version": config_store.version}
+        if since is not None:
+            body["full"] = changed is None
+    
+    response = jsonify(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.route("/intersections", methods=['POST'])
 def update_intersections():
-    """Actualizează setările unei intersecții."""
+    """Actualizează setările unei intersecții.
+    Modificările sunt aplicate pe o copie care este validată de schema înainte de a fi folosită.
+    """
     data = request.json
     
     if not data or "id" not in data:
@@ -1423,145 +1052,155 @@ def update_intersections():
     intersection_id = data["id"]
     
     with lock:
-        intersections_config = load_intersections()
-        
         # Găsește intersecția
-        intersection = None
-        for i in intersections_config["intersections"]:
-            if i["id"] == intersection_id:
-                intersection = i
-                break
+        intersection = config_store.find(intersection_id)
         
         if not intersection:
             return jsonify({"error": f"Intersecția {intersection_id} nu a fost găsită"}), 404
         
+        state_machine = intersections_state.get(intersection_id)
+        candidate = intersection.to_dict(state_machine.snapshot_state() if state_machine else None)
+        
         # Actualizează setările
+        # Modul nu este schimbat aici - este aplicat mai jos prin state machine (set_mode)
+        new_mode = None
         if "settings" in data:
             new_settings = data["settings"]
-            # Păstrează modul curent dacă nu este specificat explicit în request
-            # (pentru a nu reseta modul când se schimbă doar greenLinePreference sau alte setări)
-            if "mode" not in new_settings:
-                # Nu schimbă modul dacă nu este specificat
-                pass
-            else:
-                # Dacă modul este specificat, actualizează-l
-                intersection["settings"]["mode"] = new_settings["mode"]
+            if not isinstance(new_settings, dict):
+                return jsonify({"error": "settings: trebuie să fie un obiect"}), 400
+            new_mode = new_settings.get("mode")
             
             # Actualizează celelalte setări
             for key in ["greenLinePreference", "carGreenTime", "pedGreenTime", "yellowTime", "allRedSafetyTime"]:
                 if key in new_settings:
-                    intersection["settings"][key] = new_settings[key]
+                    candidate["settings"][key] = new_settings[key]
         
         # Actualizează lights (pentru car_car - zone configuration)
         if "lights" in data:
             new_lights = data["lights"]
-            if isinstance(new_lights, list) and len(new_lights) == len(intersection["lights"]):
+            if isinstance(new_lights, list) and len(new_lights) == len(candidate["lights"]):
                 # Actualizează zonele pentru fiecare light
                 for i, new_light in enumerate(new_lights):
-                    if i < len(intersection["lights"]):
-                        # Actualizează zonele personalizate (customZones)
-                        if "customZones" in new_light:
-                            intersection["lights"][i]["customZones"] = new_light["customZones"]
-                        # Păstrează backward compatibility cu zones vechi
-                        if "zones" in new_light:
-                            intersection["lights"][i]["zones"] = new_light["zones"]
-                        if "name" in new_light:
-                            intersection["lights"][i]["name"] = new_light["name"]
+                    if not isinstance(new_light, dict):
+                        continue
+                    # Actualizează zonele personalizate (customZones)
+                    if "customZones" in new_light:
+                        candidate["lights"][i]["customZones"] = new_light["customZones"]
+                    # Păstrează backward compatibility cu zones vechi
+                    if "zones" in new_light:
+                        candidate["lights"][i]["zones"] = new_light["zones"]
+                    if "name" in new_light:
+                        candidate["lights"][i]["name"] = new_light["name"]
         
         # Actualizează cameraIndex
         if "cameraIndex" in data:
             new_camera_index = data["cameraIndex"]
             if isinstance(new_camera_index, int) and new_camera_index >= 0:
-                intersection["cameraIndex"] = new_camera_index
-                # Reinițializează camera pentru această intersecție
-                if intersection_id in intersections_cameras:
-                    old_cap = intersections_cameras[intersection_id]
-                    if old_cap.isOpened():
-                        old_cap.release()
-                    del intersections_cameras[intersection_id]
-                
-                # Deschide noua cameră
-                try:
-                    new_cap = cv2.VideoCapture(new_camera_index)
-                    if new_cap.isOpened():
-                        intersections_cameras[intersection_id] = new_cap
-                        print(f"✓ Camera {new_camera_index} reinițializată pentru {intersection['name']}")
-                    else:
-                        print(f"⚠ Eroare: Nu s-a putut deschide camera {new_camera_index} pentru {intersection['name']}")
-                except Exception as e:
-                    print(f"⚠ Eroare la reinițializarea camerei {new_camera_index} pentru {intersection['name']}: {e}")
+                candidate["cameraIndex"] = new_camera_index
         
-        # Salvează
-        if save_intersections(intersections_config):
-            # Actualizează state machine dacă există
-            if intersection_id in intersections_state:
-                state_machine = intersections_state[intersection_id]
-                # Actualizează config-ul state machine-ului cu noile setări
-                state_machine.config = intersection
-                # Dacă s-a schimbat modul, aplică-l
-                if "settings" in data and "mode" in data["settings"]:
-                    new_mode = data["settings"]["mode"]
-                    if new_mode != state_machine.config["settings"]["mode"]:
-                        state_machine.set_mode(new_mode)
-                # Dacă s-a schimbat greenLinePreference, reinițializează timer-ul corect
-                if "settings" in data and "greenLinePreference" in data["settings"]:
-                    # Reinițializează timer-ul bazat pe green line preference
-                    phase = state_machine.state["phase"]
-                    green_line = intersection["settings"].get("greenLinePreference", "Car")
-                    if phase == "CAR_GREEN":
-                        state_machine.state["timer"] = {"for": "car", "value": 999 if green_line == "Car" else intersection["settings"]["carGreenTime"]}
-                    elif phase == "PED_GREEN":
-                        state_machine.state["timer"] = {"for": "ped", "value": 999 if green_line == "Pedestrian" else intersection["settings"]["pedGreenTime"]}
-            
-            return jsonify({"success": True, "intersection": intersection})
-        else:
-            return jsonify({"error": "Eroare la salvarea setărilor"}), 500
+        # Actualizează formatul capturii (null = implicitul driverului); validat de compile_intersection
+        if "capture" in data:
+            if data["capture"] is None:
+                candidate.pop("capture", None)
+            else:
+                candidate["capture"] = data["capture"]
+        
+        # Validează configurația rezultată înainte de a o aplica
+        if new_mode is not None and new_mode not in ["Automatic", "Manual", "Override"]:
+            return jsonify({"error": f"settings.mode: mod invalid {new_mode!r}"}), 400
+        try:
+            new_intersection = compile_intersection(candidate, f"intersections[{intersection_id}]")
+        except ConfigError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        config_store.replace(new_intersection)
+        if source_key(new_intersection) != source_key(intersection):
+            # Camera nouă (sau cu formatul nou) este deschisă și încălzită în fundal;
+            # cea veche rămâne folosită până atunci
+            capture_registry.request()
+        
+        # Actualizează state machine dacă există
+        if state_machine:
+            # Actualizează config-ul state machine-ului cu noile setări
+            # (dacă s-a schimbat greenLinePreference, timer-ul fazei verzi este reinițializat)
+            state_machine.config = new_intersection
+            # Dacă s-a schimbat modul, aplică-l
+            if new_mode is not None and new_mode != new_intersection.settings.mode:
+                state_machine.set_mode(new_mode)
+            reschedule(intersection_id)
+        
+        # Salvează (în fundal)
+        persist_intersections(intersection_id)
+        
+        return jsonify({
+            "success": True,
+            "intersection": new_intersection.to_dict(state_machine.snapshot_state() if state_machine else None)
+        })
 
 @app.route("/traffic_lights")
 def traffic_lights():
     """Endpoint API care returnează starea semafoarelor pentru toate intersecțiile."""
     with lock:
-        intersections_config = load_intersections()
         result = []
         
-        for intersection in intersections_config["intersections"]:
-            intersection_id = intersection["id"]
-            state_machine = intersections_state.get(intersection_id)
+        for intersection in config_store.intersections:
+            state_machine = intersections_state.get(intersection.id)
             
             if state_machine:
-                lights = state_machine.state["lights"]
+                lights = state_machine.state.lights
             else:
-                lights = intersection["state"]["lights"]
+                lights = intersection.state.lights
             
             result.append({
-                "name": intersection["name"],
+                "name": intersection.name,
                 "lights": lights
             })
         
         return jsonify(result)
 
+def cameras_in_use():
+    """{index cameră: [id-uri intersecții]} pentru camerele configurate (apelat sub lock)."""
+    used = {}
+    for intersection in config_store.intersections:
+        if intersection.source is None:
+            used.setdefault(intersection.camera_index, []).append(intersection.id)
+    return used
+
+def _inventory_in_use():
+    with lock:
+        return cameras_in_use()
+
+camera_inventory = CameraInventory(in_use=_inventory_in_use)
+
 @app.route("/cameras", methods=['GET'])
 def get_available_cameras():
-    """Returnează lista camerelor disponibile."""
-    available_cameras = []
-    max_cameras_to_check = 10  # Verifică până la 10 camere
+    """Returnează lista camerelor disponibile din inventarul actualizat în fundal (fără a deschide camere).
+    Fiecare cameră indică intersecțiile care o folosesc; ?refresh=1 cere o enumerare nouă.
+    """
+    if request.args.get("refresh"):
+        camera_inventory.refresh()
+    devices = camera_inventory.devices()
+    with lock:
+        used = cameras_in_use()
     
-    for i in range(max_cameras_to_check):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            # Încearcă să citească un frame pentru a verifica dacă camera funcționează
-            ret, _ = cap.read()
-            if ret:
-                available_cameras.append({
-                    "index": i,
-                    "name": f"Camera {i}"
-                })
-        cap.release()
+    available_cameras = []
+    for index in sorted(devices):
+        camera = dict(devices[index], index=index)
+        camera["intersections"] = used.get(index, [])
+        camera["inUse"] = bool(camera["intersections"])
+        available_cameras.append(camera)
     
     return jsonify({
-        "cameras": available_cameras
+        "cameras": available_cameras,
+        "updated": camera_inventory.updated
     })
 
+@app.route("/cameras/health", methods=['GET'])
+def get_cameras_health():
+    """Starea camerei fiecărei intersecții: vârsta ultimului cadru, latența citirilor, reconectări."""
+    with lock:
+        return jsonify({"cameras": capture_registry.health()})
+
 @app.route("/intersections/<intersection_id>/control", methods=['POST'])
 def control_intersection(intersection_id):
     """Endpoint pentru controlul unei intersecții (mode, override, simulate)."""
@@ -1586,28 +1225,32 @@ def control_intersection(intersection_id):
             
         elif action == "override":
             light = data.get("light")  # "car" sau "ped"
+            light_index = data.get("lightIndex")  # alternativ: indexul semaforului (multi_approach)
             state = data.get("state")  # "red", "green", "yellow"
             
-            if light not in ["car", "ped"]:
+            if light_index is None:
+                if light not in ["car", "ped"]:
+                    return jsonify({"error": "Lumină invalidă"}), 400
+                light_index = 0 if light == "car" else 1
+            elif (not isinstance(light_index, int) or isinstance(light_index, bool)
+                  or not 0 <= light_index < len(state_machine.config.lights)):
                 return jsonify({"error": "Lumină invalidă"}), 400
             if state not in ["red", "green", "yellow"]:
                 return jsonify({"error": "Stare invalidă"}), 400
             
             # Convert to backend format
-            light_index = 0 if light == "car" else 1
             light_value = 0 if state == "red" else (1 if state == "green" else 2)
             
             # Verifică dacă încercăm să setăm galben la semafor de pietoni
-            if state_machine.config["type"] == "car_pedestrian":
-                light_config = state_machine.config["lights"][light_index]
-                if light_config.get("type") == "pedestrian" and state == "yellow":
-                    return jsonify({"error": "Semafoarele de pietoni nu au lumina galbenă. Folosește doar roșu sau verde."}), 400
+            light_config = state_machine.config.lights[light_index]
+            if light_config.type == "pedestrian" and state == "yellow":
+                return jsonify({"error": "Semafoarele de pietoni nu au lumina galbenă. Folosește doar roșu sau verde."}), 400
             
             state_machine.set_override(light_index, light_value)
             
         elif action == "simulate":
             detection_type = data.get("type")  # "car", "ped", "none"
-            light_index = data.get("lightIndex")  # Pentru car_car: 0 sau 1
+            light_index = data.get("lightIndex")  # Opțional: semaforul ale cărui zone sunt simulate
             if detection_type not in ["car", "ped", "none"]:
                 return jsonify({"error": "Tip detecție invalid"}), 400
             state_machine.simulate_detection(detection_type, light_index)
@@ -1615,62 +1258,219 @@ def control_intersection(intersection_id):
         else:
             return jsonify({"error": f"Acțiune necunoscută: {action}"}), 400
         
-        # Salvează configurația
-        intersections_config = load_intersections()
-        for intersection in intersections_config["intersections"]:
-            if intersection["id"] == intersection_id:
-                intersection["settings"]["mode"] = state_machine.config["settings"]["mode"]
-                intersection["state"] = state_machine.state.copy()
-                break
-        
-        save_intersections(intersections_config)
+        # Schimbările de fază/mod/override au fost deja scrise în jurnal de observator;
+        # snapshot-ul complet se scrie doar la compactare sau la închidere
+        reschedule(intersection_id)
         
         return jsonify({
             "success": True,
             "intersection": {
                 "id": intersection_id,
-                "state": state_machine.state,
-                "settings": state_machine.config["settings"]
+                "state": state_machine.snapshot_state(),
+                "settings": state_machine.config.settings.to_dict()
             }
         })
 
+# --- Modul motor (--engine): starea publicată în memoria partajată pentru api_worker.py ---
+
+PUBLISHED_VIEWS = {
+    "/intersections": get_intersections,
+    "/traffic_lights": traffic_lights,
+    "/detect": detect_status,
+}
+engine_slots = {}  # {nume slot: SharedSlot} - create de motor, șterse la oprire
+published_frames = {}  # {nume slot: ultimul cadru publicat} - un cadru este codat o singură dată
+command_server = None
+
+def publish_state():
+    """Publică o dată corpurile endpoint-urilor GET și cadrele cerute de procesele API."""
+    with app.test_request_context():
+        for route in PUBLISHED_ROUTES:
+            response = PUBLISHED_VIEWS[route]()
+            body = published_body(response.get_etag()[0], response.get_data())
+            if not engine_slots[route_slot_name(route)].write(body):
+                log.warning("publish_overflow", "⚠ Răspunsul {route} ({size} octeți) nu încape în memoria partajată",
+                            every=10.0, per="route", route=route, size=len(body))
+    
+    with lock:
+        frames = dict(intersections_frames)
+        frames[None] = global_frame
+        for frame in frames.values():
+            if frame is not None:
+                frame.acquire()
+    now = time.time()
+    for intersection_id, frame in frames.items():
+        if frame is None:
+            continue
+        try:
+            name = frame_slot_name(intersection_id)
+            slot = engine_slots.get(name)
+            if slot is None:
+                slot = engine_slots[name] = SharedSlot(name, FRAME_SLOT_BYTES, create=True)
+            # Codarea JPEG (în afara lock-ului) se face o singură dată per cadru nou, pentru toți clienții
+            if now - slot.demand() > STREAM_DEMAND_TIMEOUT or published_frames.get(name) is frame:
+                continue
+            with STAGE_SECONDS.time("stream", "encode"):
+                flag, encoded = cv2.imencode(".jpg", frame.image)
+            if flag and slot.write(encoded):
+                published_frames[name] = frame
+                STREAM_FRAMES_TOTAL.inc()
+        finally:
+            frame.release()
+
+def publish_loop():
+    while True:
+        try:
+            publish_state()
+        except Exception as e:
+            log.error("publish_failed", "⚠ Eroare în publish_loop: {error}", exc=True, every=10.0, error=str(e))
+        time.sleep(PUBLISH_INTERVAL)
+
+def handle_command(method, path, query, body, content_type, headers):
+    """Execută o cerere primită pe canalul de comenzi pe rutele Flask ale motorului."""
+    response = app.test_client().open(path, method=method, query_string=query.decode(), data=body,
+                                      content_type=content_type, headers=headers)
+    returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+    return response.status_code, response.get_data(), response.content_type, returned
+
+def start_engine():
+    """Creează sloturile de memorie partajată și pornește publicarea și canalul de comenzi."""
+    global command_server
+    for route in PUBLISHED_ROUTES:
+        name = route_slot_name(route)
+        engine_slots[name] = SharedSlot(name, STATE_SLOT_BYTES, create=True)
+    command_server = CommandServer(handle_command)
+    command_server.start()
+    t_publish = threading.Thread(target=publish_loop, name="publish")
+    t_publish.daemon = True
+    t_publish.start()
+    log.info("engine_started", "✓ Motor pornit: stare publicată la {interval}s, comenzi pe {address}",
+             interval=PUBLISH_INTERVAL, address=command_server.address)
+    log.info("engine_api_hint", "  Pornește procesele API cu: python api_worker.py --workers 4 --port 8000")
+
+def run_engine():
+    """Rulează motorul fără server HTTP până la oprire (Ctrl+C / SIGTERM)."""
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        log.info("engine_stopped", "\n\n--- Motor oprit de utilizator ---")
+    finally:
+        if command_server is not None:
+            command_server.stop()
+        shutdown()
+        for slot in engine_slots.values():
+            slot.close()
+
 # --- Funcția Principală de Rulare ---
 
-if __name__ == "__main__":
-    # 1. Încărcare Model YOLO
-    print(f"Încărcare model YOLO: {MODEL_NAME}...")
+def load_model(name=MODEL_NAME):
+    """Încarcă modelul YOLO (ultralytics este importat doar aici; loadtest.py folosește un model fals).
+    Ridică excepția dacă modelul nu poate fi încărcat.
+    """
+    from ultralytics import YOLO
     
-    if os.path.exists(MODEL_NAME):
-        print(f"✓ Fișierul modelului găsit local: {MODEL_NAME}")
+    if os.path.exists(name):
+        log.info("model_loading", "Încărcare model YOLO: {name} (fișier local)", name=name)
     else:
-        print(f"⚠ Fișierul modelului nu există local. Ultralytics va încerca să-l descarce automat...")
-        print("  Aceasta poate dura câteva minute la prima rulare.")
-    
+        log.warning("model_loading", "⚠ Fișierul modelului {name} nu există local. Ultralytics va încerca să-l descarce automat...",
+                    name=name)
+    return YOLO(name)
+
+def activate_model(model):
+    """Pornește detecția cu `model`: intersecțiile ies din ciclul fix Manual."""
+    global detection_model
+    with lock:
+        detection_model = model
+        model_status["status"] = "ready"
+        for intersection_id in list(intersections_state):
+            set_detector_blind(intersection_id, "model", False)
+
+def model_loader(loader):
+    """Încarcă și încălzește modelul în fundal; până atunci intersecțiile rulează ciclul fix Manual."""
+    started = time.monotonic()
+    with lock:
+        model_status["status"] = "loading"
     try:
-        print("  Inițializare YOLO...")
-        model = YOLO(MODEL_NAME)
-        print(f"✓ Model YOLO încărcat cu succes!")
+        model = loader()
+        with lock:
+            model_status["status"] = "warming"
+        # Prima inferență inițializează torch / straturile modelului - nu în bucla de detecție
+        run_inference(model, np.zeros(MODEL_WARMUP_SHAPE, dtype=np.uint8))
     except Exception as e:
-        print(f"✗ Eroare la încărcarea modelului: {e}")
-        import traceback
-        traceback.print_exc()
-        exit(1)
+        # EDGE CASE 65: Modelul nu poate fi încărcat (pachet lipsă, descărcare eșuată) - semafoarele
+        # și API-ul continuă pe ciclul fix Manual, iar /ready raportează eroarea
+        with lock:
+            model_status.update(status="failed", error=str(e))
+        log.error("model_failed", "✗ Eroare la încărcarea modelului - intersecțiile rămân pe ciclul fix Manual: {error}",
+                  exc=True, error=str(e))
+        return
+    seconds = time.monotonic() - started
+    with lock:
+        model_status["seconds"] = round(seconds, 2)
+    activate_model(model)
+    log.info("model_ready", "✓ Model YOLO încărcat și încălzit în {seconds:.1f}s - detecția este activă", seconds=seconds)
+
+
+def start(model=None, loader=load_model):
+    """Încarcă configurația, creează state machine-urile și pornește firele de execuție.
+    Fără `model`, acesta este încărcat în fundal cu `loader`; semafoarele și API-ul pornesc imediat.
+    """
+    global detection_recorder
+    
+    if model is not None:
+        activate_model(model)
 
     # 2. Încărcare intersecții
     print("\n--- Încărcare configurație intersecții ---")
-    intersections_config = load_intersections()
-    print(f"✓ {len(intersections_config['intersections'])} intersecții încărcate")
+    intersections_config = config_store.read()
+    
+    # Recuperare: aplică jurnalul peste ultimul snapshot
+    replayed = replay_journal(intersections_config)
+    
+    # Validare: o configurație invalidă oprește pornirea (nu ajunge în bucla de detecție)
+    try:
+        config_store.set(intersections_config)
+    except ConfigError as e:
+        print(f"✗ Configurație invalidă în {INTERSECTIONS_FILE}: {e}")
+        exit(1)
+    print(f"✓ {len(config_store.intersections)} intersecții încărcate")
+    
+    journal.open()
+    if RECORD_DIR:
+        detection_recorder = DetectionRecorder(RECORD_DIR, RECORD_SEGMENT_RECORDS, RECORD_MAX_SEGMENTS)
+        print(f"✓ Înregistrarea detecțiilor activă în {RECORD_DIR}/ "
+              f"(max {RECORD_MAX_SEGMENTS} segmente × {RECORD_SEGMENT_RECORDS} înregistrări)")
+    if replayed:
+        print(f"✓ {replayed} evenimente din jurnal aplicate peste snapshot")
+        persister.mark_dirty()  # compactează jurnalul într-un snapshot nou
     
     # Inițializează state machine-uri
-    for intersection in intersections_config["intersections"]:
-        intersections_state[intersection["id"]] = IntersectionStateMachine(intersection)
-        print(f"  - {intersection['name']} ({intersection['type']})")
+    for intersection in config_store.intersections:
+        create_state_machine(intersection)
+        print(f"  - {intersection.name} ({intersection.type})")
 
+    metrics.set_enabled(METRICS_ENABLED)
+    
     # 3. Pornire Fire de Execuție
     print("\nPornire fire de execuție...")
     
-    # Thread pentru detecție video (camerele vor fi inițializate în video_processing_loop)
-    t_video = threading.Thread(target=video_processing_loop, args=(model, CLASS_MAP, intersections_config))
+    # Jurnalul de evenimente: de aici mesajele firelor sunt scrise în fundal
+    eventlog.configure(LOG_LEVEL, LOG_CONSOLE_FORMAT, LOG_JSON_FILE or "")
+    eventlog.start()
+    
+    # Modelul este încărcat în fundal (torch / ultralytics pot dura zeci de secunde)
+    if model is None:
+        t_model = threading.Thread(target=model_loader, args=(loader,), name="model-loader")
+        t_model.daemon = True
+        t_model.start()
+        print("✓ Încărcarea modelului pornită în fundal (ciclu fix Manual până atunci)")
+    
+    # Camerele sunt deschise în fundal și redeschise la schimbările de configurație
+    capture_registry.start()
+    
+    # Thread pentru detecție video (citește camerele din capture_registry)
+    t_video = threading.Thread(target=video_processing_loop, args=(CLASS_MAP,))
     t_video.daemon = True 
     t_video.start()
     print("✓ Thread detecție video pornit!")
@@ -1681,18 +1481,42 @@ if __name__ == "__main__":
     t_state.start()
     print("✓ Thread state machine pornit!")
     
+    # Persistență write-behind (scrieri atomice grupate)
+    persister.start()
+    print("✓ Persistență în fundal pornită!")
+    
+    # Inventarul camerelor pentru /cameras (enumerare în fundal, fără a bloca cererile)
+    camera_inventory.start()
+    
+    # SIGTERM (systemd) trece prin blocul finally pentru a salva starea
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    # Thread pentru reîncărcarea configurației modificate pe disc
+    t_config = threading.Thread(target=config_watch_loop)
+    t_config.daemon = True
+    t_config.start()
+
+
+def serve(host='0.0.0.0', port=8000):
+    """Rulează serverul Flask până la oprire, apoi salvează starea și eliberează camerele."""
     # 5. Pornire Server Flask
-    print(f"\nServerul Flask pornește pe http://0.0.0.0:8000/")
+    print(f"\nServerul Flask pornește pe http://{host}:{port}/")
     print("  Endpoint-uri disponibile:")
-    print("    - http://localhost:8000/ (pagina principală)")
-    print("    - http://localhost:8000/video_feed (stream video)")
-    print("    - http://localhost:8000/detect (status detecție - legacy)")
-    print("    - http://localhost:8000/traffic_lights (culori semafoare)")
-    print("    - http://localhost:8000/intersections (GET: fetch, POST: update)")
+    print(f"    - http://localhost:{port}/ (pagina principală)")
+    print(f"    - http://localhost:{port}/video_feed (stream video)")
+    print(f"    - http://localhost:{port}/detect (status detecție - legacy)")
+    print(f"    - http://localhost:{port}/traffic_lights (culori semafoare)")
+    print(f"    - http://localhost:{port}/intersections (GET: fetch, POST: update)")
+    print(f"    - http://localhost:{port}/ready (starea subsistemelor: model, camere, state machine-uri)")
+    print(f"    - http://localhost:{port}/cameras/health (starea camerelor și reconectări)")
+    print(f"    - http://localhost:{port}/metrics (metrici Prometheus)")
+    print(f"    - http://localhost:{port}/traces (latența detecție -> lampă)")
+    print(f"    - http://localhost:{port}/inference (ratele de inferență per cameră)")
+    print(f"    - http://localhost:{port}/lock_stats (contenția lock-ului global)")
     print("\n  Apasă Ctrl+C pentru a opri serverul.\n")
     
     try:
-        app.run(host='0.0.0.0', port=8000, debug=False, use_reloader=False)
+        app.run(host=host, port=port, debug=False, use_reloader=False)
     except KeyboardInterrupt:
         print("\n\n--- Server oprit de utilizator ---")
     except Exception as e:
@@ -1700,10 +1524,41 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
     finally:
-        print("\n--- Curățenie resurse ---")
-        with lock:
-            for intersection_id, cap in intersections_cameras.items():
-                if cap.isOpened():
-                    cap.release()
-                    print(f"✓ Camera închisă pentru {intersection_id}")
-        print("✓ Aplicația a fost închisă.")
+        shutdown()
+
+
+def shutdown():
+    """Salvează starea, închide înregistrarea și eliberează camerele."""
+    print("\n--- Curățenie resurse ---")
+    persister.stop()
+    with lock:
+        journal.close()
+    print("✓ Starea intersecțiilor salvată.")
+    if detection_recorder is not None:
+        detection_recorder.close()
+        print(f"✓ {detection_recorder.written} detecții înregistrate în {RECORD_DIR}/")
+    with lock:
+        for intersection_id, cap in intersections_cameras.items():
+            if cap.isOpened():
+                cap.release()
+                print(f"✓ Camera închisă pentru {intersection_id}")
+        for cap in capture_registry.drain():
+            cap.release()
+    eventlog.shutdown()  # scrie mesajele rămase în coadă
+    print("✓ Aplicația a fost închisă.")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Detector de trafic YOLOv8 cu state machine pentru semafoare")
+    parser.add_argument("--engine", action="store_true",
+                        help="doar motorul (camere, model, state machine-uri), fără HTTP; "
+                             "API-ul este servit de api_worker.py din memoria partajată")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    start()
+    if args.engine:
+        start_engine()
+        run_engine()
+    else:
+        serve(port=args.port)
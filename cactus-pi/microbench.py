@@ -0,0 +1,322 @@
+# Micro-benchmark-uri pentru căile fierbinți, în stilul pytest-benchmark: fiecare funcție
+# bench_* primește un obiect `benchmark` și îl apelează cu funcția măsurată; numărul de
+# iterații per rundă este calibrat automat, iar rezultatul este mediana timpului per apel.
+# Rulează fără model și fără cameră (stub_model.py dă rezultatele YOLO și cadrele).
+#
+# Regresii: --save scrie rezultatele ca bază de referință; --compare le compară cu o bază
+# anterioară și iese cu cod 1 dacă o mediană crește peste --threshold (implicit 25%).
+# Bazele de referință depind de mașină - se compară doar rulări de pe același hardware.
+#
+# Utilizare:
+#   python microbench.py --save bench-baseline.json
+#   python microbench.py --compare bench-baseline.json --threshold 0.25
+#   python microbench.py -k zone --rounds 20
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+
+import main
+from clock import VirtualClock
+from detection import CLASS_MAP, assign_zones, draw_detections, empty_detection
+from recorder import DetectionRecorder
+from schema import compile_intersection, compile_intersections, serialize_intersections
+from state_machine import IntersectionStateMachine
+from stub_model import StubResults, make_boxes, synthetic_frame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROUNDS = 15
+MIN_ROUND_TIME = 0.02  # secunde - iterațiile per rundă sunt calibrate până la această durată
+MAX_ITERATIONS = 100_000
+DEFAULT_THRESHOLD = 0.25  # creșterea relativă a medianei considerată regresie
+FRAME_SIZE = (640, 480)
+RESOLUTIONS = ((320, 240), (640, 480), (1280, 720), (1920, 1080))
+
+_BENCHMARKS = []  # [(nume, funcție, parametri)]
+
+
+def parametrize(**cases):
+    """Înregistrează funcția bench_* o dată pentru fiecare valoare: @parametrize(boxes=(10, 100))."""
+    (name, values), = cases.items()
+
+    def register(function):
+        for value in values:
+            label = "x".join(map(str, value)) if isinstance(value, tuple) else value
+            _BENCHMARKS.append((f"{function.__name__[6:]}[{label}]", function, {name: value}))
+        return function
+    return register
+
+
+class Benchmark:
+    """Măsoară o funcție: `benchmark(fn, *args)` (ca fixture-ul pytest-benchmark)."""
+
+    def __init__(self, rounds=ROUNDS, min_round_time=MIN_ROUND_TIME):
+        self.rounds = rounds
+        self.min_round_time = min_round_time
+        self.stats = None
+
+    def _calibrate(self, fn, args, kwargs):
+        iterations = 1
+        while iterations < MAX_ITERATIONS:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn(*args, **kwargs)
+            if time.perf_counter() - started >= self.min_round_time:
+                break
+            iterations *= 2
+        return iterations
+
+    def __call__(self, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)  # încălzire (cache-uri, prima alocare)
+        iterations = self._calibrate(fn, args, kwargs)
+        durations = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn(*args, **kwargs)
+            durations.append((time.perf_counter() - started) / iterations)
+        median = statistics.median(durations)
+        self.stats = {
+            "rounds": self.rounds,
+            "iterations": iterations,
+            "min_us": min(durations) * 1e6,
+            "median_us": median * 1e6,
+            "mean_us": statistics.fmean(durations) * 1e6,
+            "stddev_us": statistics.stdev(durations) * 1e6 if len(durations) > 1 else 0.0,
+            "ops": 1.0 / median if median > 0 else None,
+        }
+        return result
+
+
+# --- Date de test ---
+
+def _template():
+    with open(os.path.join(HERE, "intersections.json"), "r") as f:
+        return json.load(f)
+
+
+def _intersection(kind, zones_per_light=1):
+    """O intersecție compilată de tipul `kind` din intersections.json, fără stare salvată;
+    pentru car_car zonele fiecărui semafor sunt înlocuite cu o grilă de `zones_per_light` zone."""
+    data = copy.deepcopy(next(i for i in _template()["intersections"] if i["type"] == kind))
+    data.pop("state", None)
+    data.pop("source", None)
+    if kind != "car_pedestrian":
+        for light_index, light in enumerate(data["lights"]):
+            columns = max(1, int(zones_per_light ** 0.5))
+            rows = -(-zones_per_light // columns)
+            width, height = 640 / columns, 480 / rows / len(data["lights"])
+            light["customZones"] = [
+                {"x": (zone % columns) * width, "y": (light_index * rows + zone // columns) * height,
+                 "width": width * 0.6, "height": height * 0.6}
+                for zone in range(zones_per_light)]
+    return compile_intersection(data, "bench")
+
+
+def _results(count, wheels_only=False, seed=0):
+    rng = random.Random(seed)
+    classes = (2, 3, 5, 7) if wheels_only else (0, 2, 3, 5, 7, 16)
+    return [StubResults(make_boxes(count, *FRAME_SIZE, rng, classes))]
+
+
+def _detections(machine):
+    """Secvența de detecții a unui cadru: nimic, etapa curentă, cealaltă etapă, ambele."""
+    zones = list(empty_detection(machine.config)["zones"])
+    half = len(zones) // 2
+    return [
+        {"humans": False, "wheels": False, "zones": {}},
+        {"humans": False, "wheels": True, "zones": {zone: True for zone in zones[:half]}},
+        {"humans": True, "wheels": False, "zones": {zone: True for zone in zones[half:]}},
+        {"humans": True, "wheels": True, "zones": {zone: True for zone in zones}},
+    ]
+
+
+def _large_config(count):
+    template = _template()
+    document = {"intersections": []}
+    for i in range(count):
+        data = copy.deepcopy(template["intersections"][i % len(template["intersections"])])
+        data["id"] = f"{data['id']}-{i}"
+        document["intersections"].append(data)
+    return document
+
+
+# --- Benchmark-uri ---
+
+@parametrize(boxes_zones=((10, 4), (10, 64), (100, 4), (100, 64)))
+def bench_zone_hit_test(benchmark, boxes_zones):
+    """assign_zones pentru N vehicule × Z zone personalizate (car_car)."""
+    boxes, zones = boxes_zones
+    intersection = _intersection("car_car", zones // 2)
+    results = _results(boxes, wheels_only=True)
+    frame = synthetic_frame(*FRAME_SIZE)
+    benchmark(lambda: assign_zones(results, frame, intersection, CLASS_MAP, empty_detection(intersection)))
+
+
+@parametrize(boxes=(1, 10, 50))
+def bench_per_box_loop(benchmark, boxes):
+    """Partea per obiect a buclei video: zone, desenare și înregistrarea binară."""
+    intersection = _intersection("car_car", 2)
+    results = _results(boxes)
+    frame = synthetic_frame(*FRAME_SIZE)
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = DetectionRecorder(directory, segment_records=64 * 1024, max_segments=2)
+
+        def per_box():
+            detection = empty_detection(intersection)
+            found = []
+            assign_zones(results, frame, intersection, CLASS_MAP, detection, found)
+            draw_detections(frame, found)
+            now = time.time()
+            for box in found:
+                recorder.record_box(now, intersection.id, 1, *box)
+            recorder.record_frame(now, intersection.id, 1, detection)
+
+        benchmark(per_box)
+        recorder.close()
+
+
+@parametrize(kind=("car_pedestrian", "car_car"))
+def bench_update_from_detection(benchmark, kind):
+    """Un cadru pentru o intersecție: update_from_detection la 30 FPS virtual și tick-ul scadent."""
+    clock = VirtualClock(1000.0)
+    machine = IntersectionStateMachine(_intersection(kind, 2), clock=clock)
+    detections = _detections(machine)
+    frame = [0]
+
+    def update():
+        frame[0] += 1
+        clock.advance(1 / 30)
+        machine.update_from_detection(detections[frame[0] // 45 % len(detections)], *FRAME_SIZE)
+        deadline = machine.next_deadline()
+        if deadline is not None and deadline <= clock.now:
+            machine.tick()
+
+    benchmark(update)
+
+
+@parametrize(kind=("car_pedestrian", "car_car"))
+def bench_tick(benchmark, kind):
+    """tick() cu tranziție la fiecare apel (Manual: ciclu fix, ceasul sare la deadline)."""
+    clock = VirtualClock(1000.0)
+    machine = IntersectionStateMachine(_intersection(kind, 2), clock=clock)
+    machine.set_mode("Manual")
+
+    def tick():
+        deadline = machine.next_deadline()
+        if deadline is not None:
+            clock.set(max(clock.now, deadline))
+        machine.tick()
+
+    benchmark(tick)
+
+
+@parametrize(resolution=RESOLUTIONS)
+def bench_stream_encode(benchmark, resolution):
+    """Codarea JPEG și partea multipart trimisă de generate_frames pentru un client."""
+    frame = synthetic_frame(*resolution)
+
+    def encode():
+        flag, encoded = cv2.imencode(".jpg", frame)
+        return main.mjpeg_part(encoded)
+
+    benchmark(encode)
+
+
+@parametrize(intersections=(100, 1000))
+def bench_load_intersections(benchmark, intersections):
+    """load_intersections + validarea (config_store.load la pornire) pentru o configurație mare."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "intersections.json")
+        with open(path, "w") as f:
+            json.dump(_large_config(intersections), f, indent=2)
+        main.INTERSECTIONS_FILE = path
+        benchmark(lambda: compile_intersections(main.load_intersections()))
+
+
+@parametrize(intersections=(100, 1000))
+def bench_save_intersections(benchmark, intersections):
+    """serialize_intersections + save_intersections (scriere atomică cu fsync)."""
+    configs = compile_intersections(_large_config(intersections))
+    with tempfile.TemporaryDirectory() as directory:
+        main.INTERSECTIONS_FILE = os.path.join(directory, "intersections.json")
+        benchmark(lambda: main.save_intersections(serialize_intersections(configs)))
+
+
+# --- Rulare ---
+
+def run(selected, rounds, min_round_time):
+    results = {}
+    for name, function, params in selected:
+        benchmark = Benchmark(rounds, min_round_time)
+        # Mesajele de debug ale codului măsurat nu intră în rezultate
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(benchmark, **params)
+        results[name] = benchmark.stats
+        stats = benchmark.stats
+        print(f"  {name:<42} median {stats['median_us']:11.2f}µs  min {stats['min_us']:11.2f}µs  "
+              f"±{stats['stddev_us']:9.2f}µs  {stats['ops']:12.1f} ops/s")
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Afișează diferențele față de bază și returnează numele benchmark-urilor regresate."""
+    regressions = []
+    print(f"\nComparație cu baza de referință (prag {threshold:.0%}):")
+    for name, stats in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"  ⚠ {name:<42} nou (fără bază)")
+            continue
+        change = stats["median_us"] / reference["median_us"] - 1
+        if change > threshold:
+            regressions.append(name)
+            mark = "✗"
+        else:
+            mark = "✓"
+        print(f"  {mark} {name:<42} {reference['median_us']:11.2f}µs -> {stats['median_us']:11.2f}µs  ({change:+.1%})")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Micro-benchmark-uri pentru căile fierbinți (fără model/cameră)")
+    parser.add_argument("-k", dest="filter", default=None, help="rulează doar benchmark-urile care conțin textul")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--min-round-time", type=float, default=MIN_ROUND_TIME)
+    parser.add_argument("--save", default=None, help="scrie rezultatele ca bază de referință (JSON)")
+    parser.add_argument("--compare", default=None, help="baza de referință cu care se compară")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="creșterea relativă a medianei care eșuează rularea")
+    args = parser.parse_args()
+
+    selected = [entry for entry in _BENCHMARKS if not args.filter or args.filter in entry[0]]
+    if not selected:
+        raise SystemExit(f"✗ Niciun benchmark nu conține '{args.filter}'")
+    print(f"{len(selected)} benchmark-uri, {args.rounds} runde fiecare:")
+    results = run(selected, args.rounds, args.min_round_time)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Bază de referință scrisă în {args.save}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} regresii peste {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✓ Nicio regresie")
+
+
+if __name__ == "__main__":
+    main_cli()
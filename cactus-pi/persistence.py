@@ -0,0 +1,295 @@
+# Persistența configurației intersecțiilor pe cardul SD.
+# Scrierile sunt atomice (fișier temporar + fsync + rename) și grupate
+# de un fir de execuție în fundal (write-behind), astfel încât endpoint-urile
+# de control să nu atingă niciodată discul.
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from eventlog import get_logger
+
+log = get_logger("persistence")
+
+JOURNAL_SYNC_INTERVAL = 0.2  # secunde între fsync-urile grupate ale jurnalului (0 = fsync la fiecare înregistrare)
+
+
+def atomic_write_json(path, data, indent=2):
+    """Scrie `data` ca JSON în `path` atomic: fișier temporar, fsync, apoi rename peste cel vechi.
+    La o cădere de curent rămâne fie fișierul vechi, fie cel nou - niciodată unul trunchiat.
+    Returnează mtime-ul (ns) fișierului scris - rename-ul nu îl schimbă, deci o modificare
+    ulterioară din afara aplicației are alt mtime.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # fsync pe director pentru ca rename-ul să supraviețuiască unei căderi de curent
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return mtime
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+    return mtime
+
+
+class WriteBehindPersister:
+    """Salvează configurația în fundal, cel mult o scriere la `interval` secunde.
+
+    Args:
+        path: fișierul JSON destinație
+        snapshot: funcție care returnează datele de salvat; este apelată sub `lock`
+        lock: lock-ul care protejează datele (lock-ul global al aplicației)
+        interval: intervalul minim între două scrieri (rafalele de modificări sunt grupate)
+        on_saved: funcție opțională on_saved(mtime) apelată sub `lock` după fiecare scriere
+                  reușită, înainte ca o altă scriere să poată începe (mtime-ul fișierului scris, ns)
+    """
+
+    def __init__(self, path, snapshot, lock, interval=5.0, on_saved=None):
+        self.path = path
+        self.snapshot = snapshot
+        self.lock = lock
+        self.interval = interval
+        self.on_saved = on_saved
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()  # serializează scrierile (fir de fundal vs. flush)
+        self._writing = False  # o scriere este în curs (de la snapshot până la on_saved)
+        self._last_write = 0.0
+        self._thread = None
+
+    def mark_dirty(self):
+        """Marchează datele ca modificate; scrierea efectivă are loc în fundal."""
+        self._dirty.set()
+
+    def pending(self):
+        """Există modificări nescrise sau o scriere în curs - fișierul de pe disc nu este
+        (încă) ultima stare a aplicației."""
+        return self._writing or self._dirty.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Oprește firul de fundal și scrie modificările rămase (apelat la închidere)."""
+        self._stop.set()
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def flush(self):
+        """Scrie imediat datele dacă sunt modificate. Returnează True dacă s-a scris ceva."""
+        with self._write_lock:
+            if not self._dirty.is_set():
+                return False
+            self._writing = True
+            try:
+                self._dirty.clear()
+                try:
+                    with self.lock:
+                        data = self.snapshot()
+                    mtime = atomic_write_json(self.path, data)
+                except Exception as e:
+                    # EDGE CASE 72: Card plin, read-only sau director lipsă - reîncearcă la
+                    # următorul interval, nu imediat (altfel _run ar reconstrui snapshot-ul
+                    # sub lock în buclă și ar ține un nucleu ocupat)
+                    self._last_write = time.monotonic()
+                    self._dirty.set()
+                    log.error("save_failed", "⚠ Eroare la salvarea {path}: {error}",
+                              every=60.0, path=self.path, error=str(e))
+                    return False
+                self._last_write = time.monotonic()
+                # mtime-ul este înregistrat sub lock înainte de a elibera _write_lock: cine ia lock-ul
+                # după rename vede fie scrierea ca fiind în curs, fie mtime-ul ei
+                with self.lock:
+                    if self.on_saved:
+                        self.on_saved(mtime)
+            finally:
+                self._writing = False
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._dirty.wait()
+            if self._stop.is_set():
+                break
+            # Grupează rafalele: așteaptă până trece intervalul de la ultima scriere
+            wait = self._last_write + self.interval - time.monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            self.flush()
+
+
+class StateJournal:
+    """Jurnal append-only (JSON lines) cu tranzițiile de fază, schimbările de mod și override-urile.
+
+    Fiecare înregistrare conține starea completă a intersecției după eveniment, deci la
+    pornire ultima înregistrare a fiecărei intersecții se aplică peste ultimul snapshot.
+    Compactarea: la fiecare snapshot jurnalul curent este rotit în `<path>.old`, care este
+    șters după ce snapshot-ul a fost scris cu succes - jurnalul rămâne mărginit.
+    Durabilitatea: append() scrie în kernel, iar un fir de fundal face fsync la cel mult
+    `sync_interval` secunde după o înregistrare nouă (fsync-urile pe card sunt lente și nu se
+    fac sub lock-ul aplicației - nici la rotire, care doar redenumește fișierul deschis). La o
+    cădere de curent se pierd cel mult tranzițiile din ultimele `sync_interval` secunde; cu
+    sync_interval=0 fiecare append() și rotate() face fsync pe loc.
+    Metodele se apelează sub lock-ul aplicației.
+    """
+
+    def __init__(self, path, sync_interval=JOURNAL_SYNC_INTERVAL):
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.sync_interval = sync_interval
+        self._file = None
+        self.size = 0
+        self._unsynced = False  # înregistrări scrise după ultimul fsync
+        self._sync_lock = threading.Lock()  # fsync-ul firului de fundal vs. close()
+        self._retired = deque()  # fișierele rotite, de sincronizat și închis de firul de fundal
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.size = self._file.tell()
+        if self.sync_interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="journal-sync", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout=5)
+        with self._sync_lock:
+            self._close_retired()
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._unsynced = False
+
+    def append(self, record):
+        """Adaugă o înregistrare compactă. Costul este O(eveniment), nu O(fișier)."""
+        if self._file is None:
+            return
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        self.size += len(line)
+        if self.sync_interval > 0:
+            self._unsynced = True
+        else:
+            os.fsync(self._file.fileno())
+
+    def sync(self):
+        """fsync pentru înregistrările scrise de la ultimul apel (fără lock-ul aplicației)."""
+        with self._sync_lock:
+            self._close_retired()
+            # rotate() poate înlocui _file între timp - fișierul vechi ajunge în _retired și este
+            # închis tot de acest fir, deci referința rămâne validă
+            current = self._file
+            if current is None or not self._unsynced:
+                return
+            self._unsynced = False
+            try:
+                os.fsync(current.fileno())
+            except OSError as e:
+                self._unsynced = True
+                log.error("journal_sync_failed", "⚠ Eroare la fsync pentru {path}: {error}",
+                          every=60.0, path=self.path, error=str(e))
+
+    def _close_retired(self):
+        # Sub _sync_lock
+        while self._retired:
+            retired = self._retired.popleft()
+            try:
+                os.fsync(retired.fileno())
+            except OSError as e:
+                log.error("journal_sync_failed", "⚠ Eroare la fsync pentru {path}: {error}",
+                          every=60.0, path=self.rotated_path, error=str(e))
+            retired.close()
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            self.sync()
+
+    def replay(self):
+        """Returnează înregistrările din jurnalul rotit și cel curent, în ordine cronologică."""
+        records = []
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # EDGE CASE 73: ultima linie poate fi trunchiată după o cădere de curent
+                        continue
+        return records
+
+    def rotate(self):
+        """Mută jurnalul curent deoparte înainte de un snapshot.
+        Dacă un snapshot anterior a eșuat (`.old` există încă), continuă în fișierul curent.
+        """
+        if self._file is None or os.path.exists(self.rotated_path):
+            return
+        # Fișierul deschis este doar redenumit (fără fsync sub lock-ul aplicației); fsync-ul și
+        # închiderea lui se fac pe firul de fundal. Până la scrierea snapshot-ului, jurnalul
+        # rotit este singura copie a tranzițiilor.
+        old = self._file
+        try:
+            old.flush()
+            os.replace(self.path, self.rotated_path)
+        except OSError as e:
+            log.error("journal_rotate_failed", "⚠ Eroare la rotirea jurnalului {path}: {error}",
+                      every=60.0, path=self.path, error=str(e))
+            return
+        try:
+            self.open()
+        except OSError as e:
+            # EDGE CASE 74: Jurnalul nou nu poate fi creat (card plin / read-only) - fișierul
+            # vechi revine la locul lui și rămâne deschis, ca append() să nu scrie într-un
+            # fișier închis sau în jurnalul rotit care va fi șters după snapshot
+            log.error("journal_rotate_failed", "⚠ Eroare la rotirea jurnalului {path}: {error}",
+                      every=60.0, path=self.path, error=str(e))
+            self._file = old
+            try:
+                os.replace(self.rotated_path, self.path)
+            except OSError:
+                pass
+            return
+        if self._thread is None:
+            os.fsync(old.fileno())
+            old.close()
+        else:
+            self._retired.append(old)
+
+    def discard_rotated(self):
+        """Șterge jurnalul rotit după ce snapshot-ul care îl include a fost scris pe disc."""
+        try:
+            os.unlink(self.rotated_path)
+        except FileNotFoundError:
+            pass
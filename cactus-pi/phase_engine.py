@@ -0,0 +1,268 @@
+# Motorul de faze al intersecțiilor, condus de tabele.
+# Fiecare tip de intersecție își declară etapele verzi ca date (ce semafoare sunt verzi,
+# durate minime/maxime, declanșatoare de detecție, numele fazelor de siguranță).
+# Graful este compilat o singură dată, la încărcarea configurației, în tabele indexate
+# prin întregi; state machine-ul face tranziții în timp constant, fără formatare de text.
+
+from dataclasses import dataclass
+
+# Tipurile de faze
+GREEN = 0
+YELLOW = 1
+ALL_RED = 2
+
+MAX_LIGHTS = 8  # limita de semafoare pentru o intersecție multi_approach
+
+
+@dataclass(frozen=True, slots=True)
+class StageDef:
+    """O etapă verde a intersecției, declarată ca date.
+    name: numele fazei verzi (ex. "CAR_GREEN")
+    lights: indicii semafoarelor verzi în această etapă
+    timer: eticheta timer-ului în faza verde ("car", "ped", "light_0")
+    duration: atributul din Settings cu durata verdelui
+    demand: declanșatoarele cererii: "humans", "wheels" sau "zones" (zonele semafoarelor etapei)
+    yellow: numele fazei galbene la ieșirea din etapă (doar dacă se opresc semafoare de mașini)
+    all_red: numele fazei all-red de siguranță la ieșirea din etapă
+    min_green: timpul minim de verde înainte ca linia verde să poată fi întreruptă
+    max_factor: verdele prelungit prin detecție este limitat la max_factor × durata
+    """
+    name: str
+    lights: tuple
+    timer: str
+    duration: str
+    demand: tuple
+    yellow: str = None
+    all_red: str = "ALL_RED"
+    min_green: float = 0.0
+    max_factor: float = 3.0
+
+
+@dataclass(frozen=True, slots=True)
+class PhaseGraph:
+    """Graful de faze al unui tip de intersecție.
+    home: greenLinePreference -> indexul etapei de pe linia verde
+    override_complement: în Override, roșu pe un semafor dă verde semafoarelor în conflict
+    """
+    stages: tuple
+    home: dict
+    override_complement: bool = False
+
+
+def _car_pedestrian_graph(lights):
+    return PhaseGraph(
+        stages=(
+            StageDef("CAR_GREEN", (0,), "car", "car_green_time", ("wheels",),
+                     yellow="CAR_YELLOW", all_red="ALL_RED_1"),
+            StageDef("PED_GREEN", (1,), "ped", "ped_green_time", ("humans",),
+                     all_red="ALL_RED_2"),
+        ),
+        home={"Car": 0, "Pedestrian": 1},
+        override_complement=True,
+    )
+
+
+def _car_car_graph(lights):
+    return PhaseGraph(
+        stages=(
+            StageDef("LIGHT_0_GREEN", (0,), "light_0", "car_green_time", ("zones",), yellow="LIGHT_0_YELLOW"),
+            StageDef("LIGHT_1_GREEN", (1,), "light_1", "car_green_time", ("zones",), yellow="LIGHT_1_YELLOW"),
+        ),
+        home={"0": 0, "1": 1},
+    )
+
+
+def _multi_approach_graph(lights):
+    """Intersecție cu 3-4 (sau mai multe) direcții și treceri de pietoni.
+    Semafoarele de mașini cu același câmp "stage" sunt verzi împreună (ex. Nord+Sud);
+    fără "stage", fiecare direcție are etapa ei. Toate semafoarele de pietoni
+    formează o etapă exclusivă pentru pietoni, la sfârșitul ciclului.
+    """
+    groups = {}
+    for index, light in enumerate(lights):
+        if light.type == "car":
+            key = ("stage", light.stage) if light.stage is not None else ("light", index)
+            groups.setdefault(key, []).append(index)
+    pedestrians = tuple(i for i, light in enumerate(lights) if light.type == "pedestrian")
+    stages = []
+    for members in groups.values():
+        s = len(stages)
+        stages.append(StageDef(f"STAGE_{s}_GREEN", tuple(members), f"stage_{s}", "car_green_time",
+                               ("zones",), yellow=f"STAGE_{s}_YELLOW"))
+    if pedestrians:
+        s = len(stages)
+        stages.append(StageDef(f"STAGE_{s}_GREEN", pedestrians, "ped", "ped_green_time", ("humans", "zones")))
+    return PhaseGraph(stages=tuple(stages), home={str(s): s for s in range(len(stages))})
+
+
+PHASE_GRAPHS = {
+    "car_pedestrian": _car_pedestrian_graph,
+    "car_car": _car_car_graph,
+    "multi_approach": _multi_approach_graph,
+}
+
+
+def _zone_keys(light):
+    """Cheile din detection["zones"] care aparțin unui semafor: zonele personalizate
+    sau, ca fallback, cadranele vechi (1-4 în configurație, "0"-"3" în detecții)."""
+    if light.custom_zones:
+        return tuple(f"light_{light.id}_zone_{k}" for k in range(len(light.custom_zones)))
+    return tuple(str(z - 1) for z in (light.zones or ()) if 1 <= z <= 4)
+
+
+class PhaseTable:
+    """Graful de faze compilat în tabele indexate prin întregi.
+
+    Fazele verzi au indicii 0..S-1 (indexul etapei); urmează fazele de siguranță
+    pentru fiecare pereche (etapa de plecare, etapa țintă).
+    """
+
+    __slots__ = ("names", "lights", "kind", "stage", "target", "timer_for", "duration", "next",
+                 "stage_count", "clearance", "stage_duration", "stage_max", "stage_min",
+                 "demand_keys", "home_map", "light_stage", "conflicts", "override_complement")
+
+    def __init__(self, graph, lights, settings):
+        stages = graph.stages
+        light_count = len(lights)
+        if len(stages) < 2:
+            raise ValueError("intersecția trebuie să aibă cel puțin 2 etape verzi")
+        for stage in stages:
+            if not stage.lights or any(not 0 <= i < light_count for i in stage.lights):
+                raise ValueError(f"etapa {stage.name} referă semafoare inexistente")
+
+        self.names = []
+        self.lights = []
+        self.kind = []
+        self.stage = []
+        self.target = []
+        self.timer_for = []
+        self.duration = []
+        self.next = []
+        self.stage_count = len(stages)
+
+        # Fazele verzi: indexul fazei == indexul etapei
+        for s, stage in enumerate(stages):
+            vector = [0] * light_count
+            for i in stage.lights:
+                vector[i] = 1
+            self._add(stage.name, vector, GREEN, s, None, stage.timer, getattr(settings, stage.duration))
+
+        # Fazele de siguranță pentru fiecare pereche de etape (galben, apoi all-red)
+        self.clearance = [[-1] * self.stage_count for _ in range(self.stage_count)]
+        for a, stage_a in enumerate(stages):
+            green_a = set(stage_a.lights)
+            for b, stage_b in enumerate(stages):
+                if a == b:
+                    continue
+                kept = green_a & set(stage_b.lights)
+                stopping = green_a - kept
+                chain = []
+                # Galben doar pentru semafoarele de mașini care se opresc (pietonii nu au galben)
+                if stage_a.yellow and any(lights[i].type == "car" for i in stopping):
+                    vector = [1 if i in kept else 0 for i in range(light_count)]
+                    for i in stopping:
+                        if lights[i].type == "car":
+                            vector[i] = 2
+                    chain.append(self._add(stage_a.yellow, vector, YELLOW, a, b, "yellow", settings.yellow_time))
+                vector = [1 if i in kept else 0 for i in range(light_count)]
+                chain.append(self._add(stage_a.all_red, vector, ALL_RED, a, b, "all_red", settings.all_red_safety_time))
+                for current, following in zip(chain, chain[1:]):
+                    self.next[current] = following
+                self.next[chain[-1]] = b
+                self.clearance[a][b] = chain[0]
+
+        self.stage_duration = [self.duration[s] for s in range(self.stage_count)]
+        self.stage_max = [stage.max_factor * self.duration[s] for s, stage in enumerate(stages)]
+        self.stage_min = [stage.min_green for stage in stages]
+
+        # Declanșatoarele cererii: (chei de nivel superior, chei de zone) per etapă
+        demand_keys = []
+        for stage in stages:
+            top = tuple(k for k in stage.demand if k in ("humans", "wheels"))
+            zones = ()
+            if "zones" in stage.demand:
+                zones = tuple(key for i in stage.lights for key in _zone_keys(lights[i]))
+            demand_keys.append((top, zones))
+        self.demand_keys = tuple(demand_keys)
+
+        self.home_map = dict(graph.home)
+        self.light_stage = [next(s for s, stage in enumerate(stages) if i in stage.lights)
+                            if any(i in stage.lights for stage in stages) else None
+                            for i in range(light_count)]
+        self.conflicts = tuple(
+            tuple(j for j in range(light_count)
+                  if j != i and not any(i in stage.lights and j in stage.lights for stage in stages))
+            for i in range(light_count)
+        )
+        self.override_complement = graph.override_complement
+
+    def _add(self, name, vector, kind, stage, target, timer_for, duration):
+        self.names.append(name)
+        self.lights.append(tuple(vector))
+        self.kind.append(kind)
+        self.stage.append(stage)
+        self.target.append(target)
+        self.timer_for.append(timer_for)
+        self.duration.append(duration)
+        self.next.append(-1)
+        return len(self.names) - 1
+
+    def home(self, green_line_preference):
+        """Indexul etapei de pe linia verde pentru greenLinePreference."""
+        return self.home_map[green_line_preference]
+
+    def resolve(self, name, target=None, prefer_target=None):
+        """Găsește indexul fazei după nume (și etapa țintă, pentru fazele de siguranță comune).
+        prefer_target: dacă ținta lipsește și numele este ambiguu, alege faza spre această etapă.
+        Returnează None dacă faza nu există.
+        """
+        candidates = [p for p, phase_name in enumerate(self.names) if phase_name == name]
+        if not candidates:
+            return None
+        if target is not None:
+            for p in candidates:
+                if self.target[p] == target or (self.kind[p] == GREEN and p == target):
+                    return p
+        if len(candidates) > 1 and prefer_target is not None:
+            for p in candidates:
+                if self.target[p] == prefer_target:
+                    return p
+        return candidates[0]
+
+    def demand(self, detection):
+        """Returnează, pentru fiecare etapă, dacă detecția cere verde pentru ea."""
+        zones = detection.get("zones") or {}
+        return tuple(
+            any(detection.get(k, False) for k in top) or any(zones.get(z, False) for z in zone_keys)
+            for top, zone_keys in self.demand_keys
+        )
+
+    def next_demanded(self, stage, demand):
+        """Următoarea etapă cu cerere după `stage`, în ordinea ciclului (round-robin), sau None."""
+        for offset in range(1, self.stage_count):
+            candidate = (stage + offset) % self.stage_count
+            if demand[candidate]:
+                return candidate
+        return None
+
+    def demand_detection(self, stage):
+        """Construiește o detecție care cere verde pentru etapă (folosit la simulare)."""
+        top, zone_keys = self.demand_keys[stage]
+        detection = {"humans": False, "wheels": False, "zones": {}}
+        for key in top:
+            detection[key] = True
+        for key in zone_keys:
+            detection["zones"][key] = True
+        if zone_keys and not top:
+            detection["wheels"] = True
+        return detection
+
+
+def compile_phase_table(intersection_type, lights, settings):
+    """Compilează graful de faze al tipului de intersecție. Ridică ValueError dacă este invalid."""
+    graph = PHASE_GRAPHS[intersection_type](lights)
+    table = PhaseTable(graph, lights, settings)
+    if settings.green_line_preference not in table.home_map:
+        raise ValueError(f"greenLinePreference {settings.green_line_preference!r} invalid "
+                         f"(valori permise: {', '.join(table.home_map)})")
+    return table
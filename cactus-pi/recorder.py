@@ -0,0 +1,407 @@
+# Înregistrarea binară a detecțiilor din rularea live.
+# Fiecare cadru procesat produce înregistrări de lungime fixă (timp, intersecție, clasă,
+# bounding box, încredere, zonele atinse) scrise într-un fișier NumPy (.npy) mapat în memorie.
+# Fișierele sunt segmente cu capacitate fixă, prealocate; la umplere se trece la un segment nou,
+# iar cele mai vechi sunt șterse peste MAX_SEGMENTS - spațiul pe card este limitat dinainte.
+# Încărcarea unei zile întregi de înregistrări nu parsează text: segmentele sunt citite cu mmap.
+#
+# Tipuri de înregistrări:
+#   cls >= 0      o detecție (COCO class id), cu box, încredere și zonele atinse de obiect
+#   cls == FRAME  sfârșitul unui cadru pentru o intersecție: flags (humans/wheels) și toate
+#                 zonele active - exact detecția trimisă state machine-ului
+#
+# Lângă fiecare segment există un fișier .json cu tabelele de decodare (id-urile intersecțiilor
+# și cheile zonelor pentru biții din masca "zones") și numărul de înregistrări scrise.
+# Scrierile lente (header-ul cu fsync, flush-ul segmentului plin, ștergerea segmentelor vechi)
+# se fac pe un fir de fundal - bucla de detecție doar le programează.
+#
+# Utilizare (rezumatul unei înregistrări):
+#   python recorder.py recordings [--start 2026-10-19T08:00] [--end 2026-10-19T20:00]
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from eventlog import get_logger
+from persistence import atomic_write_json
+
+log = get_logger("recorder")
+
+RECORD_DTYPE = np.dtype([
+    ("t", "<f8"),             # timpul (epoch, secunde)
+    ("frame", "<u4"),         # numărul cadrului în bucla video
+    ("intersection", "<u2"),  # indexul în tabela "intersections" a segmentului
+    ("cls", "<i2"),           # COCO class id sau FRAME
+    ("box", "<i2", (4,)),     # x1, y1, x2, y2 (pixeli în cadrul camerei)
+    ("conf", "<f4"),          # încrederea detecției
+    ("zones", "<u8"),         # masca zonelor atinse (bitul k = cheia k din tabela "zones")
+    ("flags", "u1"),          # HUMANS | WHEELS
+])
+
+FRAME = -1
+HUMANS = 1
+WHEELS = 2
+MAX_ZONE_KEYS = 64  # biții măștii "zones"
+
+SEGMENT_RECORDS = 256 * 1024  # ~9.7 MB pe segment
+MAX_SEGMENTS = 32             # ~310 MB pe card în total
+SEGMENT_PREFIX = "detections-"
+
+
+class DetectionRecorder:
+    """Scrie înregistrările detecțiilor în segmente .npy rotative, mapate în memorie.
+
+    Nu este thread-safe: este folosit doar din firul de detecție video. Paginile scrise
+    ajung pe disc prin page cache-ul kernel-ului chiar dacă procesul se oprește brusc;
+    flush() forțează scrierea. Header-ele și segmentele pline sunt scrise pe disc de un fir
+    de fundal, în ordinea programării; close() așteaptă terminarea lor.
+
+    Args:
+        directory: directorul segmentelor (creat dacă nu există)
+        segment_records: capacitatea unui segment (numărul de înregistrări)
+        max_segments: numărul maxim de segmente păstrate pe disc
+    """
+
+    def __init__(self, directory, segment_records=SEGMENT_RECORDS, max_segments=MAX_SEGMENTS):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.max_segments = max(1, max_segments)
+        self.enabled = True
+        self.written = 0
+        self._intersections = {}  # {intersection_id: cod}
+        self._zones = {}  # {zone_key: bit}
+        self._array = None
+        self._path = None
+        self._index = 0
+        self._overflow_warned = False
+        self._started = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._sequence = 0
+        self._jobs = deque()  # scrierile programate pentru firul de fundal
+        self._jobs_cond = threading.Condition()
+        self._busy = False  # firul de fundal execută o scriere scoasă din coadă
+        self._writer = None
+
+    @property
+    def path(self):
+        return self._path
+
+    def _open_segment(self):
+        """Prealocă un segment nou și șterge segmentele vechi peste limită."""
+        self._close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        # Data pornirii + numărul segmentului: numele sunt unice și sortate cronologic
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._started}-{self._sequence:06d}.npy")
+        self._sequence += 1
+        self._array = np.lib.format.open_memmap(path, mode="w+", dtype=RECORD_DTYPE,
+                                                shape=(self.segment_records,))
+        self._path = path
+        self._index = 0
+        self._write_header()
+        # EDGE CASE 54: Spațiul pe disc este limitat - cel mai vechi segment este șters primul.
+        # Lista este fixată acum: scrierile programate pentru aceste segmente preced ștergerea
+        self._submit(("prune", list_segments(self.directory)[:-self.max_segments]))
+
+    def _close_segment(self):
+        if self._array is None:
+            return
+        # Flush-ul segmentului (~10 MB) și header-ul final se fac pe firul de fundal
+        self._submit(("close", self._array, self._path, self._header()))
+        self._array = None
+
+    def _header(self):
+        return {
+            "intersections": list(self._intersections),
+            "zones": list(self._zones),
+            "capacity": self.segment_records,
+            "count": self._index,
+        }
+
+    def _write_header(self):
+        self._submit(("header", self._path, self._header()))
+
+    def _submit(self, job):
+        with self._jobs_cond:
+            # Un header nou îl înlocuiește pe cel încă nescris al aceluiași segment
+            if job[0] == "header" and self._jobs and self._jobs[-1][0] == "header" and self._jobs[-1][1] == job[1]:
+                self._jobs[-1] = job
+            else:
+                self._jobs.append(job)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="recorder-writer", daemon=True)
+                self._writer.start()
+            self._jobs_cond.notify()
+
+    def _run_writer(self):
+        while True:
+            with self._jobs_cond:
+                while not self._jobs:
+                    self._jobs_cond.wait()
+                job = self._jobs.popleft()
+                if job[0] == "stop":
+                    self._jobs_cond.notify_all()
+                    return
+                self._busy = True
+            try:
+                self._run_job(job)
+            except OSError as e:
+                # Card plin / fără drepturi, ca în EDGE CASE 55 - detecția continuă fără înregistrare
+                if self.enabled:
+                    log.error("recorder_disabled", "⚠ Recorder dezactivat: {error}", error=str(e))
+                self.enabled = False
+            finally:
+                with self._jobs_cond:
+                    self._busy = False
+                    self._jobs_cond.notify_all()
+
+    def _run_job(self, job):
+        if job[0] == "header":
+            atomic_write_json(_header_path(job[1]), job[2])
+        elif job[0] == "close":
+            _, array, path, header = job
+            array.flush()
+            atomic_write_json(_header_path(path), header)
+        elif job[0] == "prune":
+            for old in job[1]:
+                for stale in (old, _header_path(old)):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+
+    def _code(self, intersection_id):
+        code = self._intersections.get(intersection_id)
+        if code is None:
+            code = self._intersections[intersection_id] = len(self._intersections)
+            if self._array is not None:
+                self._write_header()
+        return code
+
+    def _mask(self, zone_keys):
+        mask = 0
+        for key in zone_keys:
+            bit = self._zones.get(key)
+            if bit is None:
+                if len(self._zones) >= MAX_ZONE_KEYS:
+                    if not self._overflow_warned:
+                        log.warning("zone_overflow", "⚠ Recorder: peste {limit} chei de zone - zona {zone} nu este înregistrată",
+                                    limit=MAX_ZONE_KEYS, zone=key)
+                        self._overflow_warned = True
+                    continue
+                bit = self._zones[key] = len(self._zones)
+                if self._array is not None:
+                    self._write_header()
+            mask |= 1 << bit
+        return mask
+
+    def _append(self, t, intersection_id, frame, cls, box, confidence, zone_keys, flags):
+        if not self.enabled:
+            return
+        try:
+            if self._array is None or self._index >= self.segment_records:
+                self._open_segment()
+            code = self._code(intersection_id)
+            mask = self._mask(zone_keys)
+        except OSError as e:
+            # EDGE CASE 55: Card plin / fără drepturi - detecția continuă fără înregistrare
+            log.error("recorder_disabled", "⚠ Recorder dezactivat: {error}", error=str(e))
+            self.enabled = False
+            return
+        self._array[self._index] = (t, frame, code, cls, box, confidence, mask, flags)
+        self._index += 1
+        self.written += 1
+
+    def record_box(self, t, intersection_id, frame, class_id, box, confidence, zone_keys=(), category=None):
+        """Înregistrează o detecție: box = (x1, y1, x2, y2), zone_keys = zonele atinse de obiect,
+        category = "humans" / "wheels" (din CLASS_MAP)."""
+        flags = HUMANS if category == "humans" else WHEELS if category == "wheels" else 0
+        self._append(t, intersection_id, frame, class_id, box, confidence, zone_keys, flags)
+
+    def record_frame(self, t, intersection_id, frame, detection):
+        """Înregistrează detecția agregată a unui cadru (cea trimisă state machine-ului)."""
+        flags = (HUMANS if detection.get("humans") else 0) | (WHEELS if detection.get("wheels") else 0)
+        zones = [key for key, active in (detection.get("zones") or {}).items() if active]
+        self._append(t, intersection_id, frame, FRAME, (0, 0, 0, 0), 0.0, zones, flags)
+
+    def flush(self):
+        """Scrie pe disc segmentul curent și header-ul lui (sincron)."""
+        if self._array is not None:
+            self._array.flush()
+            self._write_header()
+        self._wait_writer()
+
+    def close(self):
+        self.enabled = False
+        self._close_segment()
+        if self._writer is not None:
+            self._submit(("stop",))
+            self._writer.join()
+            self._writer = None
+
+    def _wait_writer(self):
+        with self._jobs_cond:
+            while (self._jobs or self._busy) and self._writer is not None:
+                self._jobs_cond.wait()
+
+
+def _header_path(segment_path):
+    return os.path.splitext(segment_path)[0] + ".json"
+
+
+def list_segments(directory):
+    """Segmentele din director, în ordine cronologică (numele începe cu data creării)."""
+    return sorted(glob.glob(os.path.join(directory, f"{SEGMENT_PREFIX}*.npy")))
+
+
+def load_segment(path):
+    """Returnează (înregistrările valide ale segmentului, mapate în memorie, header-ul)."""
+    records = np.load(path, mmap_mode="r")
+    try:
+        with open(_header_path(path), "r") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        header = {"intersections": [], "zones": []}
+    count = header.get("count")
+    if not isinstance(count, int) or not 0 <= count <= len(records):
+        count = 0
+    if count < len(records) and records["t"][count] != 0:
+        # EDGE CASE 75: Header-ul este vechi (segmentul curent sau o oprire bruscă) - segmentul
+        # este prealocat cu zerouri, deci restul înregistrărilor se termină la primul t == 0
+        empty = np.flatnonzero(records["t"][count:] == 0)
+        count += int(empty[0]) if len(empty) else len(records) - count
+    return records[:count], header
+
+
+class DetectionTrace:
+    """Înregistrările concatenate ale mai multor segmente, cu tabele de decodare comune."""
+
+    def __init__(self, records, intersections, zones):
+        self.records = records
+        self.intersections = intersections
+        self.zones = zones
+
+    def __len__(self):
+        return len(self.records)
+
+    def frames(self):
+        return self.records[self.records["cls"] == FRAME]
+
+    def boxes(self):
+        return self.records[self.records["cls"] != FRAME]
+
+    def zone_keys(self, mask):
+        return [key for bit, key in enumerate(self.zones) if mask >> bit & 1]
+
+    def detection(self, record):
+        """Detecția (formatul din bucla video) a unei înregistrări FRAME."""
+        flags = int(record["flags"])
+        return {
+            "humans": bool(flags & HUMANS),
+            "wheels": bool(flags & WHEELS),
+            "zones": {key: True for key in self.zone_keys(int(record["zones"]))},
+        }
+
+    def replay_events(self, intersection_id=None):
+        """Evenimentele de detecție pentru replay.ReplayRunner ("t" relativ la primul cadru)."""
+        frames = self.frames()
+        if intersection_id is not None:
+            frames = frames[frames["intersection"] == self.intersections.index(intersection_id)]
+        if not len(frames):
+            return []
+        t0 = float(frames["t"][0])
+        return [
+            {"t": float(record["t"]) - t0, "id": self.intersections[int(record["intersection"])],
+             "detection": self.detection(record)}
+            for record in frames
+        ]
+
+
+def _remap_zones(masks, segment_zones, bits):
+    """Rescrie măștile de zone ale unui segment în numerotarea comună (vectorizat, bit cu bit)."""
+    result = np.zeros(len(masks), dtype=np.uint64)
+    for bit, key in enumerate(segment_zones):
+        present = (masks >> np.uint64(bit)) & np.uint64(1)
+        result |= present << np.uint64(bits[key])
+    return result
+
+
+def load_trace(directory, start=None, end=None):
+    """Încarcă înregistrările din director între `start` și `end` (epoch, secunde).
+
+    Segmentele din afara intervalului nu sunt citite; tabelele de decodare diferite
+    (reporniri ale aplicației) sunt unificate.
+    """
+    parts = []
+    intersections, zones = {}, {}
+    for path in list_segments(directory):
+        records, header = load_segment(path)
+        if not len(records):
+            continue
+        if (start is not None and records["t"][-1] < start) or (end is not None and records["t"][0] > end):
+            continue
+        if start is not None or end is not None:
+            t = records["t"]
+            keep = np.ones(len(records), dtype=bool)
+            if start is not None:
+                keep &= t >= start
+            if end is not None:
+                keep &= t <= end
+            records = records[keep]
+        else:
+            records = np.array(records)
+        for intersection_id in header["intersections"]:
+            intersections.setdefault(intersection_id, len(intersections))
+        for key in header["zones"]:
+            if len(zones) < MAX_ZONE_KEYS:
+                zones.setdefault(key, len(zones))
+        codes = np.array([intersections[i] for i in header["intersections"]] or [0], dtype=np.uint16)
+        records["intersection"] = codes[records["intersection"]]
+        segment_zones = [key for key in header["zones"] if key in zones]
+        if segment_zones != list(zones)[:len(segment_zones)]:
+            records["zones"] = _remap_zones(records["zones"], segment_zones, zones)
+        parts.append(records)
+    records = np.concatenate(parts) if parts else np.zeros(0, dtype=RECORD_DTYPE)
+    return DetectionTrace(records, list(intersections), list(zones))
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rezumatul unei înregistrări de detecții")
+    parser.add_argument("directory", help="directorul cu segmentele .npy")
+    parser.add_argument("--start", default=None, help="început (ISO 8601, ex. 2026-10-19T08:00)")
+    parser.add_argument("--end", default=None, help="sfârșit (ISO 8601)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    trace = load_trace(args.directory, _parse_time(args.start), _parse_time(args.end))
+    elapsed = time.perf_counter() - started
+    if not len(trace):
+        print("⚠ Nicio înregistrare în intervalul cerut")
+        return
+    frames = trace.frames()
+    boxes = trace.boxes()
+    first = datetime.fromtimestamp(trace.records["t"].min())
+    last = datetime.fromtimestamp(trace.records["t"].max())
+    print(f"✓ {len(trace)} înregistrări încărcate în {elapsed:.2f}s ({first:%Y-%m-%d %H:%M:%S} - {last:%H:%M:%S})")
+    for code, intersection_id in enumerate(trace.intersections):
+        mine = frames[frames["intersection"] == code]
+        if not len(mine):
+            continue
+        busy = np.count_nonzero(mine["flags"])
+        detections = np.count_nonzero(boxes["intersection"] == code)
+        print(f"  {intersection_id}: {len(mine)} cadre, {busy} cu detecții, {detections} obiecte")
+    classes, counts = np.unique(boxes["cls"], return_counts=True)
+    print("  clase: " + ", ".join(f"{c}×{n}" for c, n in zip(classes, counts)))
+
+
+if __name__ == "__main__":
+    main()
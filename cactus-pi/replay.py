@@ -0,0 +1,233 @@
+# Replay pe ceas virtual pentru state machine-ul intersecțiilor.
+# Un scenariu (înregistrat sau scris de mână) de detecții și comenzi este aplicat pe unul
+# sau mai multe IntersectionStateMachine, iar tick-urile sunt făcute exact la deadline-uri,
+# ca în firul live - ore de trafic rulează în câteva secunde.
+#
+# Scenariul este un fișier JSON lines, câte un eveniment pe linie ("t" în secunde de la start):
+#   {"t": 12.0, "id": "depou-001", "detection": {"humans": true, "wheels": false, "zones": {}}}
+#   {"t": 12.0, "id": "depou-001", "detection": {...}, "every": 0.1, "until": 20.0}
+#   {"t": 30.0, "id": "depou-001", "action": "set_mode", "mode": "Manual"}
+#   {"t": 45.0, "id": "depou-001", "action": "override", "light": "ped", "state": "green"}
+#   {"t": 50.0, "id": "centru-001", "action": "simulate", "type": "car", "lightIndex": 1}
+#
+# Scenariul poate fi și un director cu o înregistrare binară a detecțiilor (recorder.py):
+# fiecare cadru înregistrat devine un eveniment de detecție.
+#
+# Utilizare:
+#   python replay.py scenariu.jsonl --config intersections.json --out rezultat.json
+#   python replay.py recordings --start 2026-10-19T08:00 --end 2026-10-19T09:00
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from clock import VirtualClock
+from recorder import load_trace
+from schema import compile_intersections
+from state_machine import IntersectionStateMachine
+
+LIGHT_STATES = {"red": 0, "green": 1, "yellow": 2}
+LIGHT_NAMES = {"car": 0, "ped": 1}
+
+
+def load_events(path):
+    """Citește scenariul JSON lines și expandează evenimentele periodice ("every"/"until").
+    Returnează evenimentele sortate după timp (ordinea din fișier se păstrează la același t).
+    """
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: JSON invalid: {e}") from None
+            if "t" not in event or "id" not in event:
+                raise ValueError(f"{path}:{number}: evenimentul necesită câmpurile 't' și 'id'")
+            events.extend(expand_event(event))
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def expand_event(event):
+    """Un eveniment cu "every" (perioadă) și "until" devine o serie de evenimente identice."""
+    every = event.get("every")
+    if not every:
+        return [event]
+    until = event.get("until", event["t"])
+    base = {k: v for k, v in event.items() if k not in ("every", "until")}
+    count = int(round((until - event["t"]) / every)) + 1
+    return [dict(base, t=event["t"] + k * every) for k in range(count)]
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50_us": pick(0.50) * 1e6,
+        "p95_us": pick(0.95) * 1e6,
+        "p99_us": pick(0.99) * 1e6,
+        "max_us": ordered[-1] * 1e6,
+    }
+
+
+class ReplayRunner:
+    """Rulează scenarii pe state machine-uri cu ceas virtual.
+
+    Rezultatele:
+        timeline: tranzițiile de fază / mod / override, cu timpul virtual
+        commands: comenzile trimise semafoarelor (apelurile actuatorului)
+        latencies: {tip eveniment: [secunde reale petrecute în state machine]}
+    """
+
+    def __init__(self, configs, start=0.0):
+        self.clock = VirtualClock(start)
+        self.start = start
+        self.timeline = []
+        self.commands = []
+        self.latencies = {"detection": [], "tick": [], "action": []}
+        self.skipped = 0
+        self.machines = {}
+        for config in configs:
+            machine = IntersectionStateMachine(config, actuator=self._actuator(config.id), clock=self.clock)
+            machine.observers.append(self._observe)
+            self.machines[config.id] = machine
+
+    def _actuator(self, intersection_id):
+        def actuate(intersection_type, lights_state, previous_lights=None, trace=None):
+            self.commands.append({
+                "t": self.clock.now - self.start,
+                "id": intersection_id,
+                "lights": list(lights_state),
+                "previous": list(previous_lights) if previous_lights is not None else None,
+            })
+        return actuate
+
+    def _observe(self, machine, event):
+        self.timeline.append({
+            "t": self.clock.now - self.start,
+            "id": machine.config.id,
+            "kind": event["kind"],
+            "from": event["from"],
+            "to": machine.state.phase,
+            "mode": machine.config.settings.mode,
+            "lights": list(machine.state.lights),
+        })
+
+    def _measure(self, kind, call, *args):
+        started = time.perf_counter()
+        call(*args)
+        self.latencies[kind].append(time.perf_counter() - started)
+
+    def advance_to(self, t):
+        """Face, în ordine cronologică, toate tick-urile cu deadline până la `t` (timp virtual absolut)."""
+        while True:
+            due = None
+            for machine in self.machines.values():
+                deadline = machine.next_deadline()
+                if deadline is not None and deadline <= t and (due is None or deadline < due.next_deadline()):
+                    due = machine
+            if due is None:
+                break
+            self.clock.set(max(self.clock.now, due.next_deadline()))
+            self._measure("tick", due.tick)
+        self.clock.set(max(self.clock.now, t))
+
+    def apply(self, event):
+        """Aplică un eveniment al scenariului la momentul lui (după tick-urile scadente)."""
+        self.advance_to(self.start + event["t"])
+        machine = self.machines.get(event["id"])
+        if machine is None:
+            self.skipped += 1
+            return
+        if "detection" in event:
+            self._measure("detection", machine.update_from_detection, event["detection"], 640, 480)
+            return
+        action = event.get("action")
+        if action == "set_mode":
+            self._measure("action", machine.set_mode, event.get("mode"))
+        elif action == "override":
+            light = event.get("lightIndex", LIGHT_NAMES.get(event.get("light")))
+            value = LIGHT_STATES.get(event.get("state"), event.get("state"))
+            self._measure("action", machine.set_override, light, value)
+        elif action == "simulate":
+            self._measure("action", machine.simulate_detection, event.get("type"), event.get("lightIndex"))
+        else:
+            self.skipped += 1
+            return
+        # O comandă poate lăsa un deadline deja expirat - tick imediat, ca în endpoint-ul de control
+        self.advance_to(self.clock.now)
+
+    def run(self, events, until=None):
+        """Rulează scenariul; `until` (secunde de la start) continuă tick-urile după ultimul eveniment."""
+        for event in events:
+            self.apply(event)
+        if until is not None:
+            self.advance_to(self.start + until)
+        return self.report()
+
+    def report(self):
+        return {
+            "duration": self.clock.now - self.start,
+            "timeline": self.timeline,
+            "commands": self.commands,
+            "latency": {kind: _percentiles(values) for kind, values in self.latencies.items()},
+            "skipped_events": self.skipped,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay pe ceas virtual al unui scenariu de trafic")
+    parser.add_argument("scenario", help="fișierul JSON lines cu evenimentele sau directorul unei înregistrări")
+    parser.add_argument("--start", default=None, help="înregistrare: început (ISO 8601)")
+    parser.add_argument("--end", default=None, help="înregistrare: sfârșit (ISO 8601)")
+    parser.add_argument("--config", default="intersections.json")
+    parser.add_argument("--until", type=float, default=None, help="secunde de rulat după ultimul eveniment")
+    parser.add_argument("--out", default=None, help="fișierul JSON cu timeline, comenzi și latențe")
+    parser.add_argument("--verbose", action="store_true", help="afișează mesajele state machine-urilor")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        configs = compile_intersections(json.load(f))
+    if os.path.isdir(args.scenario):
+        start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+        end = datetime.fromisoformat(args.end).timestamp() if args.end else None
+        events = load_trace(args.scenario, start, end).replay_events()
+    else:
+        events = load_events(args.scenario)
+
+    started = time.perf_counter()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        runner = ReplayRunner(configs)
+        report = runner.run(events, until=args.until)
+    elapsed = time.perf_counter() - started
+
+    print(f"✓ {len(events)} evenimente, {report['duration']:.1f}s virtuale în {elapsed:.2f}s reale")
+    print(f"  {len(report['timeline'])} tranziții, {len(report['commands'])} comenzi semafoare")
+    for kind, stats in report["latency"].items():
+        if stats["count"]:
+            print(f"  latență {kind}: p50 {stats['p50_us']:.1f}µs, p99 {stats['p99_us']:.1f}µs, "
+                  f"max {stats['max_us']:.1f}µs ({stats['count']} evenimente)")
+    if report["skipped_events"]:
+        print(f"⚠ {report['skipped_events']} evenimente ignorate (intersecție sau acțiune necunoscută)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Rezultat scris în {args.out}")
+
+
+if __name__ == "__main__":
+    main()
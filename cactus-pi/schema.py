@@ -0,0 +1,477 @@
+# Schema configurației intersecțiilor (intersections.json).
+# Configurația este validată o singură dată - la încărcare și la POST - și compilată
+# în obiecte cu __slots__ folosite de state machine și de bucla de detecție.
+# to_dict() serializează înapoi exact în formatul JSON existent.
+
+import math
+from dataclasses import dataclass, field
+
+from phase_engine import MAX_LIGHTS, compile_phase_table
+
+INTERSECTION_TYPES = ("car_pedestrian", "car_car", "multi_approach")
+LIGHT_TYPES = ("car", "pedestrian")
+MODES = ("Automatic", "Manual", "Override")
+SOURCE_PACING = ("realtime", "fast")
+INFINITE_TIMER = 999  # timer infinit (linie verde) în formatul JSON
+
+
+class ConfigError(ValueError):
+    """Configurație invalidă; mesajul conține calea câmpului (ex. intersections[1].settings.yellowTime)."""
+
+
+def _require(data, key, path):
+    if key not in data:
+        raise ConfigError(f"{path}.{key}: câmp obligatoriu lipsă")
+    return data[key]
+
+
+def _number(value, path, minimum=0):
+    # bool este subclasă de int în Python - nu este o durată validă
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ConfigError(f"{path}: trebuie să fie un număr (primit {value!r})")
+    if value < minimum:
+        raise ConfigError(f"{path}: trebuie să fie cel puțin {minimum} (primit {value!r})")
+    return value
+
+
+def _int(value, path, minimum=0):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ConfigError(f"{path}: trebuie să fie un întreg (primit {value!r})")
+    if value < minimum:
+        raise ConfigError(f"{path}: trebuie să fie cel puțin {minimum} (primit {value!r})")
+    return value
+
+
+def _string(value, path, choices=None):
+    if not isinstance(value, str):
+        raise ConfigError(f"{path}: trebuie să fie un text (primit {value!r})")
+    if choices is not None and value not in choices:
+        raise ConfigError(f"{path}: valoare invalidă {value!r} (valori permise: {', '.join(choices)})")
+    return value
+
+
+def _extra(data, known):
+    """Păstrează cheile necunoscute pentru a le scrie înapoi neschimbate."""
+    return {k: v for k, v in data.items() if k not in known}
+
+
+@dataclass(slots=True)
+class Zone:
+    """Zonă de detecție desenată în frontend, în coordonate canvas (640x480)."""
+    x: float
+    y: float
+    width: float
+    height: float
+
+    @classmethod
+    def from_dict(cls, data, path):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: zona trebuie să fie un obiect")
+        return cls(
+            x=_number(_require(data, "x", path), f"{path}.x", minimum=-math.inf),
+            y=_number(_require(data, "y", path), f"{path}.y", minimum=-math.inf),
+            width=_number(_require(data, "width", path), f"{path}.width"),
+            height=_number(_require(data, "height", path), f"{path}.height"),
+        )
+
+    def to_dict(self):
+        return {"x": self.x, "y": self.y, "width": self.width, "height": self.height}
+
+
+@dataclass(slots=True)
+class LightConfig:
+    """Un semafor al intersecției.
+    zones: cadranele vechi (1-4), păstrate pentru backward compatibility; None dacă lipsesc
+    custom_zones: zonele personalizate; None dacă lipsesc din JSON
+    stage: pentru multi_approach - semafoarele de mașini cu aceeași etapă sunt verzi împreună
+    """
+    id: int
+    type: str
+    name: str
+    zones: list = None
+    custom_zones: list = None
+    stage: int = None
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data, path):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: semaforul trebuie să fie un obiect")
+        zones = data.get("zones")
+        if zones is not None:
+            if not isinstance(zones, list):
+                raise ConfigError(f"{path}.zones: trebuie să fie o listă")
+            zones = [_int(z, f"{path}.zones[{i}]") for i, z in enumerate(zones)]
+        custom_zones = data.get("customZones")
+        if custom_zones is not None:
+            if not isinstance(custom_zones, list):
+                raise ConfigError(f"{path}.customZones: trebuie să fie o listă")
+            custom_zones = [Zone.from_dict(z, f"{path}.customZones[{i}]") for i, z in enumerate(custom_zones)]
+        stage = data.get("stage")
+        if stage is not None:
+            stage = _int(stage, f"{path}.stage")
+        return cls(
+            id=_int(_require(data, "id", path), f"{path}.id"),
+            type=_string(_require(data, "type", path), f"{path}.type", LIGHT_TYPES),
+            name=_string(data.get("name", ""), f"{path}.name"),
+            zones=zones,
+            custom_zones=custom_zones,
+            stage=stage,
+            extra=_extra(data, ("id", "type", "name", "zones", "customZones", "stage")),
+        )
+
+    def to_dict(self):
+        data = {"id": self.id, "type": self.type, "name": self.name}
+        if self.zones is not None:
+            data["zones"] = list(self.zones)
+        if self.custom_zones is not None:
+            data["customZones"] = [zone.to_dict() for zone in self.custom_zones]
+        if self.stage is not None:
+            data["stage"] = self.stage
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Settings:
+    """Setările de funcționare ale intersecției (durate în secunde)."""
+    mode: str
+    green_line_preference: str
+    car_green_time: float
+    ped_green_time: float
+    yellow_time: float
+    all_red_safety_time: float
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data, path, intersection_type):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: setările trebuie să fie un obiect")
+        green_line = _require(data, "greenLinePreference", path)
+        if intersection_type == "car_pedestrian":
+            _string(green_line, f"{path}.greenLinePreference", ("Car", "Pedestrian"))
+        else:
+            # Indexul etapei de pe linia verde: acceptă atât "0"/"1" cât și 0/1;
+            # se serializează ca text, ca în frontend (valorile sunt verificate de graful de faze)
+            if isinstance(green_line, int) and not isinstance(green_line, bool):
+                green_line = str(green_line)
+            _string(green_line, f"{path}.greenLinePreference")
+        return cls(
+            mode=_string(data.get("mode", "Automatic"), f"{path}.mode", MODES),
+            green_line_preference=green_line,
+            car_green_time=_number(_require(data, "carGreenTime", path), f"{path}.carGreenTime", minimum=1),
+            ped_green_time=_number(_require(data, "pedGreenTime", path), f"{path}.pedGreenTime", minimum=1),
+            yellow_time=_number(_require(data, "yellowTime", path), f"{path}.yellowTime"),
+            all_red_safety_time=_number(_require(data, "allRedSafetyTime", path), f"{path}.allRedSafetyTime"),
+            extra=_extra(data, ("mode", "greenLinePreference", "carGreenTime", "pedGreenTime",
+                                "yellowTime", "allRedSafetyTime")),
+        )
+
+    def to_dict(self):
+        data = {
+            "mode": self.mode,
+            "greenLinePreference": self.green_line_preference,
+            "carGreenTime": self.car_green_time,
+            "pedGreenTime": self.ped_green_time,
+            "yellowTime": self.yellow_time,
+            "allRedSafetyTime": self.all_red_safety_time,
+        }
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class SourceConfig:
+    """Sursă de cadre în locul camerei USB: un fișier video sau un director de imagini.
+    pacing: "realtime" (ritmul sursei, cadrele întârziate sunt sărite ca la o cameră)
+            sau "fast" (cât de repede poate procesa bucla de detecție)
+    loop: reia sursa de la început după ultimul cadru
+    fps: ritmul imaginilor dintr-un director (și al video-urilor fără FPS în container)
+    """
+    path: str
+    pacing: str = "realtime"
+    loop: bool = True
+    fps: float = 30.0
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data, path):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: sursa trebuie să fie un obiect")
+        source_path = _string(_require(data, "path", path), f"{path}.path")
+        if not source_path:
+            raise ConfigError(f"{path}.path: nu poate fi gol")
+        loop = data.get("loop", True)
+        if not isinstance(loop, bool):
+            raise ConfigError(f"{path}.loop: trebuie să fie true sau false (primit {loop!r})")
+        fps = _number(data.get("fps", 30.0), f"{path}.fps")
+        if fps <= 0:
+            raise ConfigError(f"{path}.fps: trebuie să fie pozitiv (primit {fps!r})")
+        return cls(
+            path=source_path,
+            pacing=_string(data.get("pacing", "realtime"), f"{path}.pacing", SOURCE_PACING),
+            loop=loop,
+            fps=fps,
+            extra=_extra(data, ("path", "pacing", "loop", "fps")),
+        )
+
+    def to_dict(self):
+        data = {"path": self.path, "pacing": self.pacing, "loop": self.loop, "fps": self.fps}
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class CaptureConfig:
+    """Formatul cerut camerei la deschidere ("capture" în intersections.json).
+    Câmpurile lipsă (None) rămân la valoarea implicită a driverului; camera poate accepta
+    altceva decât s-a cerut - formatul negociat este raportat în /cameras/health.
+    fourcc: codecul cadrelor (ex. "MJPG" - cadre comprimate de cameră, rezoluții mari la FPS
+            complet pe USB 2.0; "YUYV" - necomprimat)
+    buffer_size: cadre ținute în coada driverului (1 = doar cel mai recent cadru, latență minimă)
+    """
+    width: int = None
+    height: int = None
+    fps: float = None
+    fourcc: str = None
+    buffer_size: int = None
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data, path):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: formatul capturii trebuie să fie un obiect")
+        width, height, fps, buffer_size = (data.get(key) for key in ("width", "height", "fps", "bufferSize"))
+        if width is not None:
+            width = _int(width, f"{path}.width", minimum=1)
+        if height is not None:
+            height = _int(height, f"{path}.height", minimum=1)
+        if fps is not None:
+            fps = _number(fps, f"{path}.fps", minimum=1)
+        if buffer_size is not None:
+            buffer_size = _int(buffer_size, f"{path}.bufferSize", minimum=1)
+        fourcc = data.get("fourcc")
+        if fourcc is not None:
+            fourcc = _string(fourcc, f"{path}.fourcc").upper()
+            if len(fourcc) != 4 or not fourcc.isascii():
+                raise ConfigError(f"{path}.fourcc: trebuie să aibă exact 4 caractere ASCII (primit {fourcc!r})")
+        return cls(
+            width=width,
+            height=height,
+            fps=fps,
+            fourcc=fourcc,
+            buffer_size=buffer_size,
+            extra=_extra(data, ("width", "height", "fps", "fourcc", "bufferSize")),
+        )
+
+    def to_dict(self):
+        data = {}
+        for key, value in (("width", self.width), ("height", self.height), ("fps", self.fps),
+                           ("fourcc", self.fourcc), ("bufferSize", self.buffer_size)):
+            if value is not None:
+                data[key] = value
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Timer:
+    """Timer-ul fazei curente.
+    value: durata armată (sau 999 pentru infinit, 0 pentru expirat)
+    deadline: momentul expirării pe ceasul monoton; None pentru timer infinit / oprit
+    """
+    for_: str
+    value: float
+    deadline: float = None
+
+    def to_dict(self, value=None):
+        return {"for": self.for_, "value": self.value if value is None else value}
+
+
+@dataclass(slots=True)
+class IntersectionState:
+    """Starea runtime a unei intersecții (partea "state" din JSON).
+    target: pentru fazele de siguranță (galben, all-red), indexul etapei verzi spre care se merge
+    """
+    phase: str
+    lights: list
+    timer: Timer = None  # None dacă lipsește - state machine-ul îl inițializează din fază
+    last_update: float = None
+    previous_mode: str = None
+    target: int = None
+
+    @classmethod
+    def from_dict(cls, data, path, light_count):
+        """Numele fazei și ținta sunt verificate față de graful de faze în compile_intersection."""
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path}: starea trebuie să fie un obiect")
+        phase = data.get("phase")
+        if phase is not None:
+            _string(phase, f"{path}.phase")
+        lights = data.get("lights", [0] * light_count)
+        if not isinstance(lights, list) or len(lights) != light_count:
+            raise ConfigError(f"{path}.lights: trebuie să fie o listă cu {light_count} valori")
+        lights = [_int(v, f"{path}.lights[{i}]") for i, v in enumerate(lights)]
+        if any(v > 2 for v in lights):
+            raise ConfigError(f"{path}.lights: valorile permise sunt 0=roșu, 1=verde, 2=galben")
+        timer = data.get("timer")
+        if isinstance(timer, dict) and "value" in timer:
+            value = _number(timer["value"], f"{path}.timer.value")
+            timer = Timer(timer.get("for"), INFINITE_TIMER if value == INFINITE_TIMER else value)
+        else:
+            timer = None
+        previous_mode = data.get("previousMode")
+        if previous_mode is not None:
+            _string(previous_mode, f"{path}.previousMode", MODES)
+        last_update = data.get("lastUpdate")
+        if last_update is not None:
+            last_update = _number(last_update, f"{path}.lastUpdate")
+        target = data.get("_target")
+        if target is not None:
+            target = _int(target, f"{path}._target")
+        return cls(
+            phase=phase,
+            lights=lights,
+            timer=timer,
+            last_update=last_update,
+            previous_mode=previous_mode,
+            target=target,
+        )
+
+    def to_dict(self, timer_value=None):
+        return {
+            "phase": self.phase,
+            "lights": list(self.lights),
+            "timer": self.timer.to_dict(timer_value) if self.timer else None,
+            "lastUpdate": self.last_update,
+            "previousMode": self.previous_mode,
+            "_target": self.target,
+        }
+
+
+@dataclass(slots=True)
+class IntersectionConfig:
+    """O intersecție compilată din intersections.json.
+    source: fișierul video / directorul de imagini folosit în locul camerei; None = camera_index
+    capture: formatul cerut camerei (rezoluție, FPS, codec, buffer); None = implicitul driverului
+    """
+    id: str
+    name: str
+    type: str
+    camera_index: int
+    lights: list
+    settings: Settings
+    state: IntersectionState
+    source: SourceConfig = None
+    capture: CaptureConfig = None
+    extra: dict = field(default_factory=dict)
+    phases: object = None  # PhaseTable compilat din graful de faze al tipului (nu se serializează)
+
+    def to_dict(self, state=None):
+        """Serializează în formatul din intersections.json.
+        state: dict-ul stării live (de la state machine); implicit starea compilată
+        """
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "cameraIndex": self.camera_index,
+        }
+        if self.source is not None:
+            data["source"] = self.source.to_dict()
+        if self.capture is not None:
+            data["capture"] = self.capture.to_dict()
+        data.update({
+            "lights": [light.to_dict() for light in self.lights],
+            "settings": self.settings.to_dict(),
+            "state": state if state is not None else self.state.to_dict(),
+        })
+        data.update(self.extra)
+        return data
+
+
+def compile_intersection(data, path="intersection"):
+    """Validează o intersecție (dict JSON) și o compilează. Ridică ConfigError la prima eroare."""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: intersecția trebuie să fie un obiect")
+    intersection_id = _string(_require(data, "id", path), f"{path}.id")
+    if not intersection_id:
+        raise ConfigError(f"{path}.id: nu poate fi gol")
+    intersection_type = _string(_require(data, "type", path), f"{path}.type", INTERSECTION_TYPES)
+    lights = _require(data, "lights", path)
+    if intersection_type == "multi_approach":
+        if not isinstance(lights, list) or not 2 <= len(lights) <= MAX_LIGHTS:
+            raise ConfigError(f"{path}.lights: multi_approach necesită între 2 și {MAX_LIGHTS} semafoare")
+    elif not isinstance(lights, list) or len(lights) != 2:
+        raise ConfigError(f"{path}.lights: tipul {intersection_type} necesită exact 2 semafoare")
+    lights = [LightConfig.from_dict(light, f"{path}.lights[{i}]") for i, light in enumerate(lights)]
+    if intersection_type == "car_pedestrian" and [light.type for light in lights] != ["car", "pedestrian"]:
+        raise ConfigError(f"{path}.lights: car_pedestrian necesită semafoarele [car, pedestrian]")
+    if intersection_type == "car_car" and any(light.type != "car" for light in lights):
+        raise ConfigError(f"{path}.lights: car_car necesită doar semafoare de tip car")
+    if len({light.id for light in lights}) != len(lights):
+        raise ConfigError(f"{path}.lights: id-urile semafoarelor trebuie să fie unice")
+    settings = Settings.from_dict(_require(data, "settings", path), f"{path}.settings", intersection_type)
+    # Graful de faze este compilat o singură dată, aici - state machine-ul folosește doar tabelele
+    try:
+        phases = compile_phase_table(intersection_type, lights, settings)
+    except ValueError as e:
+        raise ConfigError(f"{path}: {e}") from None
+    state_data = data.get("state", {})
+    state = IntersectionState.from_dict(state_data, f"{path}.state", len(lights))
+    home = phases.home(settings.green_line_preference)
+    if state.phase is None:
+        state.phase = phases.names[home]
+    # Fazele de siguranță comune (ex. ALL_RED la car_car) sunt deosebite prin etapa țintă;
+    # stările vechi folosesc flag-urile _fromOppositeDetection / _fromVehicleDetection
+    legacy_demand = bool(state_data.get("_fromOppositeDetection") or state_data.get("_fromVehicleDetection")) \
+        if isinstance(state_data, dict) else False
+    phase = phases.resolve(state.phase, state.target,
+                           prefer_target=(home + 1) % phases.stage_count if legacy_demand else home)
+    if phase is None:
+        raise ConfigError(f"{path}.state.phase: faza {state.phase!r} nu există pentru tipul {intersection_type} "
+                          f"(faze permise: {', '.join(dict.fromkeys(phases.names))})")
+    state.target = phases.target[phase]
+    source = data.get("source")
+    if source is not None:
+        source = SourceConfig.from_dict(source, f"{path}.source")
+    capture = data.get("capture")
+    if capture is not None:
+        capture = CaptureConfig.from_dict(capture, f"{path}.capture")
+    return IntersectionConfig(
+        id=intersection_id,
+        name=_string(data.get("name", intersection_id), f"{path}.name"),
+        type=intersection_type,
+        camera_index=_int(data.get("cameraIndex", 0), f"{path}.cameraIndex"),
+        lights=lights,
+        settings=settings,
+        state=state,
+        source=source,
+        capture=capture,
+        extra=_extra(data, ("id", "name", "type", "cameraIndex", "source", "capture", "lights", "settings",
+                            "state")),
+        phases=phases,
+    )
+
+
+def compile_intersections(data):
+    """Validează întregul document intersections.json și returnează lista de IntersectionConfig."""
+    if not isinstance(data, dict) or not isinstance(data.get("intersections"), list):
+        raise ConfigError("intersections: documentul trebuie să conțină lista 'intersections'")
+    result = []
+    seen = set()
+    for i, intersection in enumerate(data["intersections"]):
+        compiled = compile_intersection(intersection, f"intersections[{i}]")
+        if compiled.id in seen:
+            raise ConfigError(f"intersections[{i}].id: id duplicat {compiled.id!r}")
+        seen.add(compiled.id)
+        result.append(compiled)
+    return result
+
+
+def serialize_intersections(intersections, states=None):
+    """Serializează lista de intersecții în documentul JSON.
+    states: {intersection_id: dict stare live} opțional
+    """
+    states = states or {}
+    return {"intersections": [i.to_dict(states.get(i.id)) for i in intersections]}
@@ -0,0 +1,305 @@
+# Starea publicată de procesul motor (camere, model, state machine-uri) pentru procesele API.
+# Fiecare "slot" este un segment de memorie partajată cu un antet seqlock și ultimul conținut
+# publicat: corpurile JSON ale endpoint-urilor GET (/intersections, /traffic_lights, /detect,
+# precedate de ETag) și ultimul cadru JPEG al fiecărei intersecții. Motorul este singurul scriitor; cititorii
+# copiază conținutul și reîncearcă dacă secvența s-a schimbat între timp (fără lock-uri între procese).
+# Comenzile (POST, rutele rare) trec printr-un canal de comenzi pe un socket Unix: motorul
+# le execută pe aplicația Flask proprie, deci validarea și răspunsurile sunt identice.
+# Socket-ul și cheia de autentificare (generată la fiecare pornire a motorului) stau într-un
+# director 0700 - procesele API trebuie să ruleze ca același utilizator ca motorul.
+#
+#   motor:   python main.py --engine
+#   API:     python api_worker.py --workers 4 --port 8000
+
+import json
+import os
+import re
+import stat
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+from eventlog import get_logger
+
+log = get_logger("shared_state")
+
+SHM_PREFIX = "cactus"
+STATE_SLOT_BYTES = 1024 * 1024  # corpul JSON al unui endpoint GET
+FRAME_SLOT_BYTES = 2 * 1024 * 1024  # un cadru JPEG (1080p încape)
+COMMAND_DIR = "/tmp/cactus-engine"  # director 0700 al utilizatorului motorului
+COMMAND_SOCKET = os.path.join(COMMAND_DIR, "engine.sock")
+AUTHKEY_FILE = "authkey"  # cheia rulării curente, lângă socket (0600)
+AUTHKEY_BYTES = 32
+COMMAND_TIMEOUT = 10.0  # secunde de așteptare a răspunsului motorului
+PUBLISHED_ROUTES = ("/intersections", "/traffic_lights", "/detect")
+FORWARDED_HEADERS = ("If-None-Match",)  # antete ale cererii trimise motorului
+RETURNED_HEADERS = ("ETag", "Cache-Control")  # antete ale răspunsului motorului
+
+# seq (impar = scriere în curs), lungimea conținutului, momentul publicării, ultima cerere a unui cititor
+_HEADER = struct.Struct("<QQdd")
+_META = struct.Struct("<QQd")  # primele trei câmpuri - scrise doar de motor
+_DEMAND = struct.Struct("<d")  # ultimul câmp - scris de cititori
+_READ_RETRIES = 100
+
+
+def mjpeg_part(encoded_image):
+    """O parte a fluxului multipart Motion JPEG (delimitator + antet + imaginea JPEG)."""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encoded_image) + b'\r\n')
+
+
+def route_slot_name(route):
+    return f"{SHM_PREFIX}-api{route.replace('/', '-')}"
+
+
+def published_body(etag, body):
+    """Conținutul slotului unui endpoint: ETag-ul (sau nimic) pe prima linie, apoi corpul."""
+    return (etag or "").encode() + b"\n" + body
+
+
+def parse_published(data):
+    """Inversul lui published_body: (etag sau None, corp)."""
+    etag, _, body = data.partition(b"\n")
+    return etag.decode() or None, body
+
+
+def frame_slot_name(intersection_id=None):
+    """Slotul cadrului unei intersecții; fără id, cadrul global (primul disponibil)."""
+    if intersection_id is None:
+        return f"{SHM_PREFIX}-frame"
+    return f"{SHM_PREFIX}-frame-{re.sub(r'[^A-Za-z0-9_.-]', '_', intersection_id)}"
+
+
+class SharedSlot:
+    """Un segment de memorie partajată: antet seqlock + ultimul conținut publicat."""
+
+    def __init__(self, name, capacity=None, create=False):
+        self.name = name
+        if create:
+            try:
+                # EDGE CASE 59: Segment rămas de la un motor oprit brusc - este recreat
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = shared_memory.SharedMemory(name, create=True, size=_HEADER.size + capacity)
+            _HEADER.pack_into(self._shm.buf, 0, 0, 0, 0.0, 0.0)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            # Doar motorul șterge segmentele; altfel resource_tracker le-ar șterge la ieșirea cititorului
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.owner = create
+        self.capacity = self._shm.size - _HEADER.size
+        self._seq = 0
+
+    def write(self, data):
+        """Publică `data` (doar motorul). Returnează False dacă nu încape în slot."""
+        if len(data) > self.capacity:
+            return False
+        buf = self._shm.buf
+        self._seq += 1
+        _META.pack_into(buf, 0, self._seq, 0, 0.0)  # impar: cititorii reîncearcă
+        buf[_HEADER.size:_HEADER.size + len(data)] = data
+        self._seq += 1
+        _META.pack_into(buf, 0, self._seq, len(data), time.time())
+        return True
+
+    def read(self, last_seq=None):
+        """Returnează (seq, conținut, momentul publicării); conținut None dacă seq == last_seq
+        sau dacă nu s-a publicat încă nimic."""
+        buf = self._shm.buf
+        for _ in range(_READ_RETRIES):
+            seq, length, published, _ = _HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if seq == last_seq or seq == 0:
+                return seq, None, published
+            data = bytes(buf[_HEADER.size:_HEADER.size + length])
+            if _HEADER.unpack_from(buf, 0)[0] == seq:
+                return seq, data, published
+        return last_seq, None, 0.0
+
+    def published(self):
+        return _HEADER.unpack_from(self._shm.buf, 0)[2]
+
+    def touch(self):
+        """Semnalează motorului că există un cititor (cadrele sunt codate doar la cerere)."""
+        _DEMAND.pack_into(self._shm.buf, _META.size, time.time())
+
+    def demand(self):
+        return _HEADER.unpack_from(self._shm.buf, 0)[3]
+
+    def close(self):
+        try:
+            self._shm.close()
+            if self.owner:
+                self._shm.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+
+
+class SlotCache:
+    """Sloturile deschise de un proces API, redeschise dacă motorul a fost repornit."""
+
+    def __init__(self):
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        slot = self._slots.get(name)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(name)
+                if slot is None:
+                    try:
+                        slot = self._slots[name] = SharedSlot(name)
+                    except FileNotFoundError:
+                        return None
+        return slot
+
+    def drop(self, name):
+        with self._lock:
+            slot = self._slots.pop(name, None)
+        if slot is not None:
+            slot.close()
+
+
+# --- Canalul de comenzi ---
+
+def _authkey_path(address):
+    return os.path.join(os.path.dirname(address), AUTHKEY_FILE)
+
+
+def _private_dir(path):
+    """Creează directorul canalului de comenzi (0700) sau verifică unul existent."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        # EDGE CASE 76: Directorul (sau un link cu numele lui) a fost creat în /tmp de alt
+        # utilizator - socket-ul și cheia nu sunt puse acolo
+        raise PermissionError(f"{path} nu este un director al utilizatorului curent")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def write_authkey(address):
+    """Generează cheia canalului pentru rularea curentă și o scrie lângă socket (0600)."""
+    key = os.urandom(AUTHKEY_BYTES)
+    path = _authkey_path(address)
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp_path, path)
+    return key
+
+
+def read_authkey(address):
+    with open(_authkey_path(address), "rb") as f:
+        return f.read()
+
+
+class CommandServer:
+    """Primește cereri (metodă, cale, query, corp, content-type, antete) și răspunde cu
+    (status, corp, content-type, antete) calculate de `handler`. Un fir per conexiune.
+    authkey: None = o cheie nouă, aleatoare, scrisă lângă socket pentru procesele API."""
+
+    def __init__(self, handler, address=COMMAND_SOCKET, authkey=None):
+        self.handler = handler
+        self.address = address
+        self.authkey = authkey
+        self._listener = None
+
+    def start(self):
+        # Socket-ul este creat direct în directorul privat - nu există un interval în care alt
+        # utilizator să se poată conecta înainte de restrângerea drepturilor
+        _private_dir(os.path.dirname(self.address))
+        if self.authkey is None:
+            self.authkey = write_authkey(self.address)
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # socket rămas de la o rulare anterioară
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        threading.Thread(target=self._accept_loop, name="command-server", daemon=True).start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            for path in (self.address, _authkey_path(self.address)):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _accept_loop(self):
+        while self._listener is not None:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError):
+                if self._listener is None:
+                    return
+                continue
+            except Exception as e:
+                # Autentificare eșuată etc. - conexiunea este refuzată, serverul continuă
+                log.warning("command_rejected", "⚠ Conexiune de comandă refuzată: {error}", error=str(e))
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    response = self.handler(*request)
+                except Exception as e:
+                    log.error("command_failed", "⚠ Eroare la executarea comenzii {request}: {error}",
+                              exc=True, request=request[:2], error=str(e))
+                    response = (500, json.dumps({"error": "Eroare internă a motorului"}).encode(), "application/json", {})
+                try:
+                    conn.send(response)
+                except (OSError, ValueError):
+                    return
+
+
+class EngineUnavailable(Exception):
+    pass
+
+
+class CommandClient:
+    """Clientul unui proces API: o conexiune per fir, refăcută după o eroare.
+    authkey: None = cheia scrisă de motor lângă socket, recitită la fiecare conexiune nouă
+             (se schimbă la repornirea motorului)."""
+
+    def __init__(self, address=COMMAND_SOCKET, authkey=None, timeout=COMMAND_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, query=b"", body=b"", content_type=None, headers=None):
+        conn = getattr(self._local, "conn", None)
+        try:
+            if conn is None:
+                authkey = self.authkey if self.authkey is not None else read_authkey(self.address)
+                conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=authkey)
+            conn.send((method, path, query, body, content_type, headers or {}))
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"motorul nu a răspuns în {self.timeout:.0f}s")
+            return conn.recv()
+        except (OSError, EOFError, TimeoutError, AuthenticationError) as e:
+            # AuthenticationError: motorul a repornit cu altă cheie între citirea ei și conectare
+            self._local.conn = None
+            if conn is not None:
+                conn.close()
+            raise EngineUnavailable(str(e)) from e
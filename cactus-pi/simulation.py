@@ -0,0 +1,419 @@
+# Simulare vectorizată (NumPy) pentru mii de intersecții.
+# Faza, timer-ele, modul și setările tuturor intersecțiilor sunt ținute în array-uri și
+# avansate împreună, într-un singur pas vectorizat, după aceleași reguli ca
+# IntersectionStateMachine (tabelele compilate de phase_engine).
+#
+# Utilizare:
+#   python simulation.py --intersections 1000 --duration 3600
+#   python simulation.py --check   (echivalență cu state machine-ul pe aceeași urmă)
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import time
+
+import numpy as np
+
+from clock import VirtualClock
+from phase_engine import ALL_RED, GREEN, YELLOW
+from schema import compile_intersection, compile_intersections
+from state_machine import IntersectionStateMachine
+
+AUTOMATIC = 0
+MANUAL = 1
+MODE_CODES = {"Automatic": AUTOMATIC, "Manual": MANUAL}
+
+DEFAULT_DT = 0.1  # secunde simulate per pas
+DEFAULT_SATURATION = 0.5  # vehicule/secundă descărcate pe verde per etapă
+
+
+class VectorSimulation:
+    """Intersecțiile simulate, ca array-uri NumPy.
+
+    Fazele tuturor intersecțiilor sunt concatenate într-un tabel global (indexul global al
+    fazei = offset-ul intersecției + indexul local). Modul Override nu este simulat.
+
+    Args:
+        configs: listă de IntersectionConfig compilate (schema.compile_intersection)
+        dt: pasul de timp în secunde
+        t0: momentul de start pe ceasul virtual
+    """
+
+    def __init__(self, configs, dt=DEFAULT_DT, t0=0.0):
+        self.configs = list(configs)
+        self.dt = dt
+        self.t0 = t0
+        self.steps = 0
+        self.now = t0
+        n = len(self.configs)
+        self.size = n
+        self.max_stages = max(c.phases.stage_count for c in self.configs)
+        s_max = self.max_stages
+        self._rows = np.arange(n)
+
+        # Tabelul global al fazelor
+        kinds, durations, nexts, stages = [], [], [], []
+        self.base = np.zeros(n, dtype=np.int64)
+        self.stage_count = np.zeros(n, dtype=np.int64)
+        self.clearance = np.full((n, s_max, s_max), -1, dtype=np.int64)
+        self.stage_duration = np.zeros((n, s_max))
+        self.stage_max = np.zeros((n, s_max))
+        self.stage_min = np.zeros((n, s_max))
+        self.has_trigger = np.zeros((n, s_max), dtype=bool)
+        self.home_stage = np.zeros(n, dtype=np.int64)
+        self.mode = np.zeros(n, dtype=np.int8)
+        offset = 0
+        for i, config in enumerate(self.configs):
+            table = config.phases
+            if config.settings.mode not in MODE_CODES:
+                raise ValueError(f"{config.id}: modul {config.settings.mode} nu este simulat")
+            self.base[i] = offset
+            self.stage_count[i] = table.stage_count
+            kinds.extend(table.kind)
+            durations.extend(table.duration)
+            nexts.extend(offset + p for p in table.next)
+            stages.extend(table.stage)
+            for a in range(table.stage_count):
+                for b in range(table.stage_count):
+                    if a != b:
+                        self.clearance[i, a, b] = offset + table.clearance[a][b]
+                top, zone_keys = table.demand_keys[a]
+                self.has_trigger[i, a] = bool(top or zone_keys)
+            s = table.stage_count
+            self.stage_duration[i, :s] = table.stage_duration
+            self.stage_max[i, :s] = table.stage_max
+            self.stage_min[i, :s] = table.stage_min
+            self.home_stage[i] = table.home(config.settings.green_line_preference)
+            self.mode[i] = MODE_CODES[config.settings.mode]
+            offset += len(table.names)
+        self.phase_kind = np.array(kinds, dtype=np.int8)
+        self.phase_duration = np.array(durations, dtype=np.float64)
+        self.phase_next = np.array(nexts, dtype=np.int64)
+        self.phase_stage = np.array(stages, dtype=np.int64)
+        self.home_phase = self.base + self.home_stage
+
+        # Statistici
+        self.kind_time = np.zeros((n, 3))
+        self.stage_green_time = np.zeros((n, s_max))
+        self.transitions = np.zeros(n, dtype=np.int64)
+        self.waiting_since = np.full((n, s_max), np.nan)
+        self.wait_sum = np.zeros((n, s_max))
+        self.wait_count = np.zeros((n, s_max), dtype=np.int64)
+        self.wait_max = np.zeros((n, s_max))
+
+        # Starea: faza (index global), deadline (inf = linie verde infinită), începutul verdelui
+        self.phase = np.zeros(n, dtype=np.int64)
+        self.deadline = np.full(n, np.inf)
+        self.green_since = np.full(n, t0)
+        for i, config in enumerate(self.configs):
+            state = config.state
+            self.phase[i] = self.base[i] + config.phases.resolve(state.phase, state.target)
+        timer_values = [c.state.timer.value if c.state.timer is not None else None for c in self.configs]
+        missing = np.array([value is None for value in timer_values])
+        if missing.any():
+            self._enter(missing, self.phase.copy(), t0)
+        for i, value in enumerate(timer_values):
+            if value is not None and value != 999:
+                self.deadline[i] = t0 + value
+
+    def local_phase(self):
+        """Indexul local (în PhaseTable-ul intersecției) al fazei curente."""
+        return self.phase - self.base
+
+    def green_stages(self):
+        """Matrice booleană [intersecție, etapă]: etapa este verde acum."""
+        green = np.zeros((self.size, self.max_stages), dtype=bool)
+        mask = self.phase_kind[self.phase] == GREEN
+        green[self._rows[mask], self.phase_stage[self.phase[mask]]] = True
+        return green
+
+    def _next_demanded(self, stage, demand):
+        """Următoarea etapă cu cerere după `stage`, round-robin, sau -1 (vectorizat)."""
+        target = np.full(self.size, -1, dtype=np.int64)
+        for offset in range(1, self.max_stages):
+            candidate = (stage + offset) % self.stage_count
+            hit = (target < 0) & (offset < self.stage_count) & demand[self._rows, candidate]
+            target[hit] = candidate[hit]
+        return target
+
+    def _leave_target(self, stage, demand):
+        """Etapa spre care se pleacă din verde în Automatic (-1 = rămâne pe linia verde)."""
+        target = self._next_demanded(stage, demand)
+        fallback = np.where(stage == self.home_stage, -1, self.home_stage)
+        return np.where(target >= 0, target, fallback)
+
+    def _enter(self, mask, new_phase, now):
+        """Intră în fazele `new_phase` pentru intersecțiile din `mask` (ca _enter_phase)."""
+        rows = self._rows[mask]
+        if rows.size == 0:
+            return
+        phase = new_phase[rows]
+        changed = phase != self.phase[rows]
+        green = self.phase_kind[phase] == GREEN
+        self.green_since[rows[green & changed]] = now
+        infinite = green & (phase == self.home_phase[rows]) & (self.mode[rows] == AUTOMATIC)
+        self.deadline[rows] = np.where(infinite, np.inf, now + self.phase_duration[phase])
+        self.phase[rows] = phase
+        self.transitions[rows] += changed
+
+    def step(self, demand):
+        """Avansează toate intersecțiile cu un pas: detecția, apoi tick-ul (ca bucla live).
+        demand: matrice booleană [intersecție, etapă] - cererea detectată în acest pas
+        """
+        self.steps += 1
+        now = self.t0 + self.steps * self.dt
+        self.now = now
+        rows = self._rows
+        demand = np.asarray(demand, dtype=bool) & self.has_trigger
+
+        # 1. Detecția - doar în Automatic și doar în fazele verzi
+        phase = self.phase
+        stage = self.phase_stage[phase]
+        detecting = (self.phase_kind[phase] == GREEN) & (self.mode == AUTOMATIC)
+        infinite = np.isinf(self.deadline)
+        new_phase = phase.copy()
+
+        # Linie verde infinită: pleacă spre următoarea etapă cu cerere
+        ready = detecting & infinite & (now - self.green_since >= self.stage_min[rows, stage])
+        target = self._next_demanded(stage, demand)
+        leave = ready & (target >= 0)
+        new_phase[leave] = self.clearance[rows[leave], stage[leave], target[leave]]
+
+        # Verde cu timer: limita maximă, apoi prelungirea sub 50% din durată
+        finite = detecting & ~infinite
+        maxed = finite & (now - self.green_since >= self.stage_max[rows, stage])
+        leave_target = self._leave_target(stage, demand)
+        forced = maxed & (leave_target >= 0)
+        new_phase[forced] = self.clearance[rows[forced], stage[forced], leave_target[forced]]
+        self.deadline[maxed & (leave_target < 0)] = np.inf
+        extend = (finite & ~maxed & demand[rows, stage]
+                  & (self.deadline - now <= self.stage_duration[rows, stage] * 0.5))
+        self.deadline[extend] = now + self.stage_duration[rows[extend], stage[extend]]
+        self._enter(leave | forced, new_phase, now)
+
+        # 2. Tick - tranziții la expirarea deadline-ului
+        phase = self.phase
+        stage = self.phase_stage[phase]
+        green = self.phase_kind[phase] == GREEN
+        expired = self.deadline <= now
+        new_phase = phase.copy()
+        clearing = expired & ~green
+        new_phase[clearing] = self.phase_next[phase[clearing]]
+        manual = expired & green & (self.mode == MANUAL)
+        new_phase[manual] = self.clearance[rows[manual], stage[manual],
+                                           ((stage + 1) % self.stage_count)[manual]]
+        automatic = expired & green & (self.mode == AUTOMATIC)
+        leave_target = self._leave_target(stage, demand)
+        leaving = automatic & (leave_target >= 0)
+        new_phase[leaving] = self.clearance[rows[leaving], stage[leaving], leave_target[leaving]]
+        self.deadline[automatic & (leave_target < 0)] = np.inf
+        self._enter(clearing | manual | leaving, new_phase, now)
+
+        self._account(demand, now)
+
+    def _account(self, demand, now):
+        """Actualizează statisticile după pas: timp per tip de fază, verde per etapă, așteptări."""
+        rows = self._rows
+        kind = self.phase_kind[self.phase]
+        self.kind_time[rows, kind] += self.dt
+        green = self.green_stages()
+        self.stage_green_time[green] += self.dt
+        # Așteptarea: de la prima cerere pe roșu până când etapa devine verde
+        waiting = np.isnan(self.waiting_since)
+        self.waiting_since[demand & ~green & waiting] = now
+        served = green & ~waiting
+        if served.any():
+            wait = now - self.waiting_since[served]
+            self.wait_sum[served] += wait
+            self.wait_count[served] += 1
+            self.wait_max[served] = np.maximum(self.wait_max[served], wait)
+            self.waiting_since[served] = np.nan
+
+    def summary(self):
+        """Statistici agregate pentru toate intersecțiile."""
+        elapsed = self.steps * self.dt
+        waits = self.wait_count.sum()
+        return {
+            "intersections": self.size,
+            "simulated_seconds": elapsed,
+            "green_share": float(self.kind_time[:, GREEN].sum() / max(elapsed * self.size, 1e-9)),
+            "yellow_share": float(self.kind_time[:, YELLOW].sum() / max(elapsed * self.size, 1e-9)),
+            "all_red_share": float(self.kind_time[:, ALL_RED].sum() / max(elapsed * self.size, 1e-9)),
+            "transitions_per_hour": float(self.transitions.sum() / self.size / max(elapsed, 1e-9) * 3600),
+            "mean_wait": float(self.wait_sum.sum() / waits) if waits else 0.0,
+            "max_wait": float(self.wait_max.max()) if self.size else 0.0,
+            "served_requests": int(waits),
+        }
+
+    def run(self, arrivals, steps):
+        """Rulează `steps` pași cu cererea dată de `arrivals` (QueueArrivals / RecordedArrivals).
+        Returnează urma cererii (bool [pas, intersecție, etapă]) - poate fi reluată la verificare.
+        """
+        trace = np.zeros((steps, self.size, self.max_stages), dtype=bool)
+        for k in range(steps):
+            demand = arrivals.demand(self.green_stages(), self.dt)
+            trace[k] = demand
+            self.step(demand)
+        return trace
+
+
+class QueueArrivals:
+    """Sosiri Poisson per etapă, cu cozi descărcate pe verde la debitul de saturație.
+    Cererea unei etape există cât timp coada ei nu este goală.
+
+    Args:
+        rates: array [intersecție, etapă] cu sosiri/secundă
+        saturation: vehicule/secundă descărcate dintr-o etapă verde
+        seed: seed-ul generatorului aleator (urme reproductibile)
+    """
+
+    def __init__(self, rates, saturation=DEFAULT_SATURATION, seed=None):
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.saturation = saturation
+        self.rng = np.random.default_rng(seed)
+        self.queue = np.zeros(self.rates.shape)
+
+    def demand(self, green, dt):
+        self.queue += self.rng.poisson(self.rates * dt)
+        self.queue[green] = np.maximum(0.0, self.queue[green] - self.saturation * dt)
+        return self.queue > 0
+
+
+class RecordedArrivals:
+    """Cerere înregistrată: array bool [pas, intersecție, etapă] (ex. din demand_from_detections)."""
+
+    def __init__(self, trace):
+        self.trace = np.asarray(trace, dtype=bool)
+        self.index = 0
+
+    def demand(self, green, dt):
+        demand = self.trace[min(self.index, len(self.trace) - 1)]
+        self.index += 1
+        return demand
+
+
+def demand_from_detections(configs, detections):
+    """Convertește detecții înregistrate în urma de cerere a simulării.
+    detections: listă de pași, fiecare {intersection_id: dict detecție}
+    """
+    max_stages = max(c.phases.stage_count for c in configs)
+    trace = np.zeros((len(detections), len(configs), max_stages), dtype=bool)
+    for k, step in enumerate(detections):
+        for i, config in enumerate(configs):
+            detection = step.get(config.id)
+            if detection:
+                trace[k, i, :config.phases.stage_count] = config.phases.demand(detection)
+    return trace
+
+
+def _detection_for(table, demand):
+    """Detecția care produce cererea `demand` (vector per etapă) pentru state machine."""
+    detection = {"humans": False, "wheels": False, "zones": {}}
+    for stage in range(table.stage_count):
+        if demand[stage]:
+            single = table.demand_detection(stage)
+            detection["humans"] |= single["humans"]
+            detection["wheels"] |= single["wheels"]
+            detection["zones"].update(single["zones"])
+    return detection
+
+
+def check_equivalence(configs, trace, dt=DEFAULT_DT, t0=0.0):
+    """Rulează aceeași urmă de cerere prin VectorSimulation și prin IntersectionStateMachine
+    (pe ceas virtual) și compară faza și deadline-ul după fiecare pas.
+    Returnează None dacă sunt echivalente, altfel descrierea primei diferențe.
+    """
+    trace = np.asarray(trace, dtype=bool)
+    detections = []
+    # Cererea este normalizată prin detecție, pentru ca ambele motoare să vadă exact aceeași cerere
+    normalized = np.zeros_like(trace)
+    for k in range(len(trace)):
+        step = []
+        for i, config in enumerate(configs):
+            table = config.phases
+            detection = _detection_for(table, trace[k, i])
+            normalized[k, i, :table.stage_count] = table.demand(detection)
+            step.append(detection)
+        detections.append(step)
+
+    clock = VirtualClock(t0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        machines = [IntersectionStateMachine(copy.deepcopy(c), clock=clock) for c in configs]
+        simulation = VectorSimulation([copy.deepcopy(c) for c in configs], dt=dt, t0=t0)
+        for k in range(len(trace)):
+            # Aceeași formulă ca VectorSimulation.step - deadline-urile trebuie să fie identice
+            clock.set(t0 + (k + 1) * dt)
+            simulation.step(normalized[k])
+            for i, machine in enumerate(machines):
+                machine.update_from_detection(detections[k][i], 640, 480)
+                machine.tick()
+            local = simulation.local_phase()
+            for i, machine in enumerate(machines):
+                deadline = machine.deadline
+                expected = np.inf if deadline is None else deadline
+                if machine.phase != local[i] or expected != simulation.deadline[i]:
+                    return (f"pasul {k + 1} ({clock.now:.2f}s), {configs[i].id}: state machine "
+                            f"{machine.state.phase}/{expected} != simulare "
+                            f"{machine.table.names[local[i]]}/{simulation.deadline[i]}")
+    return None
+
+
+def build_district(template, count, mode=None):
+    """Construiește `count` intersecții compilate, ciclând prin intersecțiile din `template`."""
+    configs = []
+    for i in range(count):
+        data = copy.deepcopy(template["intersections"][i % len(template["intersections"])])
+        data["id"] = f"{data['id']}-{i}"
+        data.pop("state", None)
+        if mode is not None:
+            data["settings"]["mode"] = mode
+        elif data["settings"].get("mode") == "Override":
+            data["settings"]["mode"] = "Automatic"
+        configs.append(compile_intersection(data, f"intersections[{i}]"))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulare vectorizată a unui cartier de intersecții")
+    parser.add_argument("--config", default="intersections.json", help="intersecțiile folosite ca șablon")
+    parser.add_argument("--intersections", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=3600.0, help="secunde simulate")
+    parser.add_argument("--dt", type=float, default=DEFAULT_DT)
+    parser.add_argument("--rate", type=float, default=0.05, help="sosiri/secundă per etapă")
+    parser.add_argument("--mode", choices=sorted(MODE_CODES), default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true",
+                        help="verifică echivalența cu IntersectionStateMachine pe aceeași urmă")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        template = json.load(f)
+    compile_intersections(template)  # validează șablonul
+    configs = build_district(template, args.intersections, args.mode)
+    steps = int(args.duration / args.dt)
+    simulation = VectorSimulation(configs, dt=args.dt)
+    arrivals = QueueArrivals(np.full((len(configs), simulation.max_stages), args.rate), seed=args.seed)
+
+    start = time.perf_counter()
+    trace = simulation.run(arrivals, steps)
+    elapsed = time.perf_counter() - start
+    print(f"✓ {len(configs)} intersecții × {steps} pași în {elapsed:.2f}s "
+          f"({len(configs) * steps / elapsed:,.0f} pași-intersecție/s)")
+    for key, value in simulation.summary().items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    if args.check:
+        subset = min(len(configs), 50)
+        check_steps = min(steps, int(600 / args.dt))
+        mismatch = check_equivalence(build_district(template, subset, args.mode),
+                                     trace[:check_steps, :subset], dt=args.dt)
+        if mismatch:
+            print(f"✗ Simularea diferă de state machine: {mismatch}")
+            raise SystemExit(1)
+        print(f"✓ Echivalent cu IntersectionStateMachine ({subset} intersecții × {check_steps} pași)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Surse de cadre pentru bucla de detecție.
+# Pe lângă camera USB (cv2.VideoCapture cu index), o intersecție poate citi cadrele dintr-un
+# fișier video sau dintr-un director de imagini ("source" în intersections.json). Sursele
+# de fișiere au aceeași interfață ca cv2.VideoCapture (read / isOpened / get / release),
+# astfel încât restul pipeline-ului nu face diferența - sarcina și FPS-ul pot fi
+# reproduse fără cameră, inclusiv în CI.
+
+import os
+import time
+
+import cv2
+
+from eventlog import get_logger
+
+log = get_logger("sources")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class FileFrameSource:
+    """Bază pentru sursele din fișiere: ritmul (realtime / fast) și reluarea (loop).
+
+    În modul realtime poziția în sursă urmează ceasul: dacă bucla de detecție este mai lentă
+    decât sursa, cadrele întârziate sunt sărite (ca la o cameră live), iar `dropped` le numără.
+    """
+
+    def __init__(self, config):
+        self.path = config.path
+        self.pacing = config.pacing
+        self.loop = config.loop
+        self.fps = config.fps
+        self.frames_read = 0
+        self.dropped = 0
+        self.loops = 0
+        self._pass_frames = 0  # cadre citite în trecerea curentă prin sursă
+        self._started = None
+        self._position = 0  # cadre consumate (citite sau sărite) de la start
+
+    def _next(self, decode, image=None):
+        """Avansează un cadru; returnează (ok, cadru sau None dacă decode este False).
+        image: bufferul în care este decodat cadrul, dacă sursa îl poate folosi (ca cap.read(image))"""
+        raise NotImplementedError
+
+    def _rewind(self):
+        raise NotImplementedError
+
+    def _step(self, decode=True, image=None):
+        ok, frame = self._next(decode, image)
+        # EDGE CASE 56: La sfârșitul sursei se reia doar dacă trecerea a avut cadre (altfel buclă infinită)
+        if not ok and self.loop and self._pass_frames:
+            self._rewind()
+            self.loops += 1
+            self._pass_frames = 0
+            ok, frame = self._next(decode, image)
+        if ok:
+            self._pass_frames += 1
+            self._position += 1
+        return ok, frame
+
+    def _pace(self):
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+            return
+        period = 1.0 / self.fps
+        due = self._started + self._position * period
+        if due > now:
+            time.sleep(due - now)
+            return
+        for _ in range(int((now - due) / period)):
+            ok, _ = self._step(decode=False)
+            if not ok:
+                break
+            self.dropped += 1
+
+    def read(self, image=None):
+        if self.pacing == "realtime":
+            self._pace()
+        ok, frame = self._step(image=image)
+        if not ok:
+            return False, None
+        self.frames_read += 1
+        return True, frame
+
+    def stats(self):
+        return {"path": self.path, "frames": self.frames_read, "dropped": self.dropped, "loops": self.loops}
+
+
+class VideoFileSource(FileFrameSource):
+    """Cadrele unui fișier video (orice container suportat de OpenCV)."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._cap = cv2.VideoCapture(config.path)
+        native_fps = self._cap.get(cv2.CAP_PROP_FPS) if self._cap.isOpened() else 0
+        if native_fps and native_fps > 0:
+            self.fps = native_fps
+
+    def _next(self, decode, image=None):
+        if not decode:
+            return self._cap.grab(), None
+        return self._cap.read(image)
+
+    def _rewind(self):
+        if not self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+            self._cap.release()
+            self._cap = cv2.VideoCapture(self.path)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self._cap.get(prop)
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageDirectorySource(FileFrameSource):
+    """Imaginile dintr-un director, în ordinea numelor (ex. frame_00001.jpg, frame_00002.jpg)."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.files = sorted(
+            os.path.join(config.path, name) for name in os.listdir(config.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._index = 0
+        self._shape = None
+        self._opened = bool(self.files)
+
+    def _next(self, decode, image=None):
+        # cv2.imread alocă mereu un tablou nou - bufferul nu este folosit
+        while self._index < len(self.files):
+            path = self.files[self._index]
+            self._index += 1
+            if not decode:
+                return True, None
+            frame = cv2.imread(path)
+            if frame is not None:
+                self._shape = frame.shape
+                return True, frame
+            log.warning("unreadable_image", "⚠ Imagine ilizibilă ignorată: {path}", path=path)
+        return False, None
+
+    def _rewind(self):
+        self._index = 0
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._index)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            if self._shape is None and self.files:
+                first = cv2.imread(self.files[0])
+                self._shape = first.shape if first is not None else None
+            if self._shape is None:
+                return 0.0
+            return float(self._shape[1] if prop == cv2.CAP_PROP_FRAME_WIDTH else self._shape[0])
+        return 0.0
+
+    def release(self):
+        self._opened = False
+
+
+def apply_capture(cap, capture):
+    """Cere camerei deschise formatul din `capture` (CaptureConfig).
+    Ordinea contează la V4L2: codecul se alege înaintea rezoluției (rezoluțiile mari există
+    adesea doar în MJPG), iar FPS-ul după rezoluție (FPS-urile permise depind de ea).
+    Driverul poate refuza sau ajusta valorile - formatul efectiv se citește cu capture_format."""
+    if capture.fourcc is not None:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*capture.fourcc))
+    if capture.width is not None:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, capture.width)
+    if capture.height is not None:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, capture.height)
+    if capture.fps is not None:
+        cap.set(cv2.CAP_PROP_FPS, capture.fps)
+    if capture.buffer_size is not None:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, capture.buffer_size)
+
+
+def _fourcc_text(value):
+    code = int(value)
+    if code <= 0:
+        return None
+    text = "".join(chr((code >> shift) & 0xFF) for shift in (0, 8, 16, 24)).strip("\0 ")
+    return text if text.isprintable() and text else None
+
+
+def capture_format(cap):
+    """Formatul negociat de o cameră deschisă, în formatul "capture" din intersections.json
+    (plus backend-ul OpenCV); valorile pe care driverul nu le raportează lipsesc."""
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps, buffer_size = cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_BUFFERSIZE))
+    result = {}
+    if width > 0 and height > 0:
+        result.update(width=width, height=height)
+    if fps > 0:
+        result["fps"] = round(fps, 2)
+    fourcc = _fourcc_text(cap.get(cv2.CAP_PROP_FOURCC))
+    if fourcc is not None:
+        result["fourcc"] = fourcc
+    if buffer_size > 0:
+        result["bufferSize"] = buffer_size
+    try:
+        result["backend"] = cap.getBackendName()
+    except cv2.error:
+        pass
+    return result
+
+
+def describe_format(data):
+    """Text pentru mesaje: "1280x720@30 MJPG buffer 1" (din formatul "capture" sau capture_format)."""
+    parts = []
+    if "width" in data and "height" in data:
+        parts.append(f"{data['width']}x{data['height']}")
+    if "fps" in data:
+        fps = data["fps"]
+        parts.append(f"@{fps:g}" if parts else f"{fps:g} FPS")
+    text = "".join(parts)
+    if "fourcc" in data:
+        text = f"{text} {data['fourcc']}".strip()
+    if "bufferSize" in data:
+        text = f"{text} buffer {data['bufferSize']}".strip()
+    return text or "implicit"
+
+
+def open_source(intersection):
+    """Deschide sursa de cadre a intersecției: fișierul / directorul din "source" sau camera
+    (cu formatul din "capture", dacă este configurat)."""
+    source = intersection.source
+    if source is None:
+        cap = cv2.VideoCapture(intersection.camera_index)
+        if intersection.capture is not None and cap.isOpened():
+            apply_capture(cap, intersection.capture)
+        return cap
+    if os.path.isdir(source.path):
+        return ImageDirectorySource(source)
+    return VideoFileSource(source)
+
+
+def describe_source(intersection):
+    """Text pentru mesaje: "camera 0" sau calea sursei."""
+    if intersection.source is None:
+        return f"camera {intersection.camera_index}"
+    return f"sursa {intersection.source.path} ({intersection.source.pacing})"
@@ -0,0 +1,442 @@
+# State machine-ul intersecțiilor, condus de tabelele compilate din phase_engine.
+# Nu depinde de Flask, OpenCV sau YOLO - semafoarele fizice sunt actualizate printr-un
+# "actuator" injectat (main.py trimite update_traffic_lights_physical).
+
+import math
+
+from clock import SYSTEM_CLOCK
+from eventlog import get_logger
+from phase_engine import GREEN
+from schema import INFINITE_TIMER, MODES, IntersectionState, Timer
+
+log = get_logger("state_machine")
+
+
+def _no_actuator(intersection_type, lights_state, previous_lights=None, trace=None):
+    """Actuator implicit: nu există semafoare fizice (simulare, teste de performanță)."""
+
+
+class IntersectionStateMachine:
+    """State machine pentru gestionarea stării unei intersecții.
+
+    Faza curentă este un index în tabelele PhaseTable ale configurației; numele fazei
+    (ex. "CAR_GREEN") este păstrat în stare doar pentru API și JSON.
+    """
+
+    def __init__(self, intersection_config, actuator=None, clock=None):
+        """intersection_config: IntersectionConfig compilat (validat) din intersections.json.
+        actuator: funcție (tip, lumini, lumini_anterioare, trace) apelată la fiecare schimbare de lumini;
+                  trace este Trace-ul detecției care a cerut etapa verde (None în rest)
+        clock: sursa de timp (monotonic() și time()); implicit ceasul sistemului
+        """
+        self.actuator = actuator or _no_actuator
+        self.clock = clock or SYSTEM_CLOCK
+        # Observatori notificați la tranziții de fază, schimbări de mod și override (ex. jurnalul)
+        self.observers = []
+        state = intersection_config.state
+        # Starea live - copie, pentru ca obiectul de configurație să rămână neschimbat
+        self.state = IntersectionState(
+            phase=state.phase,
+            lights=list(state.lights),
+            timer=state.timer,
+            last_update=state.last_update,
+            previous_mode=state.previous_mode,
+            target=state.target
+        )
+        self.phase = None  # indexul fazei curente în tabele
+        self.green_since = None  # momentul (monoton) în care a început faza verde curentă
+        self.last_demand = None  # cererea per etapă din ultima detecție
+        self.pending_traces = {}  # {etapă: Trace-ul primei detecții care a cerut-o} - până la verde
+        # Motivele pentru care detectorul nu vede (ex. "model", "camera"): cât timp există, modul
+        # Automatic rulează ciclul fix din Manual (fără a schimba modul din configurație)
+        self.blind_reasons = set()
+        self.config = intersection_config
+
+        # EDGE CASE 30: Timer-ul lipsește din stare - inițializează-l bazat pe fază
+        if self.state.timer is None:
+            self._enter_phase(self.phase)
+        else:
+            # Armează deadline-ul din valoarea rămasă salvată (timpul rămas este recalculat din deadline)
+            self._set_timer(self.state.timer.for_, self.state.timer.value)
+            # Luminile urmează faza (cu excepția Override, unde au fost setate manual)
+            if self.config.settings.mode != "Override":
+                self.state.lights = list(self.table.lights[self.phase])
+        if self.table.kind[self.phase] == GREEN:
+            self.green_since = self.clock.monotonic()
+
+        # Inițializează semafoarele fizice
+        self.actuator(self.config.type, self.state.lights)
+
+    @property
+    def config(self):
+        return self._config
+
+    @config.setter
+    def config(self, intersection_config):
+        """Preia o configurație nouă (POST sau fișier modificat) păstrând starea live."""
+        previous_home = getattr(self, "home", None)
+        self._config = intersection_config
+        self.table = intersection_config.phases
+        self.home = self.table.home(intersection_config.settings.green_line_preference)
+        phase = self.table.resolve(self.state.phase, self.state.target)
+        if phase is None:
+            # EDGE CASE 36: Faza necunoscută în noua configurație - reinițializare la linia verde
+            log.warning("unknown_phase", "⚠ Avertisment: Faza necunoscută '{phase}' pentru {intersection}. Reinițializare la green line.",
+                        phase=self.state.phase, intersection=intersection_config.id)
+            self.phase = None
+            self._enter_phase(self.home)
+            return
+        first_bind = self.phase is None
+        self.phase = phase
+        # S-a schimbat linia verde: timer-ul fazei verzi curente devine infinit sau finit
+        if (not first_bind and self.home != previous_home and self.table.kind[phase] == GREEN
+                and self.mode == "Automatic"):
+            self._enter_phase(phase)
+
+    @property
+    def deadline(self):
+        """Deadline-ul fazei curente pe ceasul monoton (None = timer infinit / oprit)."""
+        return self.state.timer.deadline
+
+    def _set_timer(self, timer_for, value):
+        """Setează timer-ul fazei curente și calculează deadline-ul pe ceasul monoton.
+        value == 999 înseamnă timer infinit (linie verde) - fără deadline.
+        """
+        self.state.timer = Timer(timer_for, value, None if value == INFINITE_TIMER else self.clock.monotonic() + value)
+
+    def timer_value(self):
+        """Returnează secundele rămase (rotunjite în sus), calculate din deadline, sau 999 pentru infinit."""
+        deadline = self.state.timer.deadline
+        if deadline is None:
+            return self.state.timer.value
+        return math.ceil(max(0.0, deadline - self.clock.monotonic()))
+
+    def next_deadline(self):
+        """Returnează deadline-ul monoton al fazei curente (None dacă nu expiră)."""
+        return self.state.timer.deadline
+
+    @property
+    def mode(self):
+        """Modul efectiv: Manual în locul lui Automatic cât timp detectorul nu vede."""
+        mode = self.config.settings.mode
+        if mode == "Automatic" and self.blind_reasons:
+            return "Manual"
+        return mode
+
+    def set_blind(self, reason, blind):
+        """Marchează detectorul ca orb (blind=True) sau refăcut pentru motivul `reason`.
+        În Automatic, faza verde curentă este reinițializată cu timpii modului efectiv
+        (linia verde infinită devine finită și invers); fazele de siguranță se termină normal.
+        """
+        was_blind = bool(self.blind_reasons)
+        if blind:
+            self.blind_reasons.add(reason)
+        else:
+            self.blind_reasons.discard(reason)
+        if bool(self.blind_reasons) == was_blind:
+            return
+        log.info("detector_fallback" if blind else "detector_restored",
+                 "[{intersection}] Detector indisponibil ({reason}) - ciclu fix Manual" if blind else
+                 "[{intersection}] Detector disponibil ({reason}) - revenire la Automatic",
+                 intersection=self.config.id, reason=reason)
+        if self.config.settings.mode == "Automatic" and self.table.kind[self.phase] == GREEN:
+            self.last_demand = None
+            self._enter_phase(self.phase)
+
+    def snapshot_state(self):
+        """Returnează starea ca dict JSON, cu timer-ul actualizat (pentru API, jurnal și salvare)."""
+        return self.state.to_dict(self.timer_value())
+
+    def _observed(self):
+        """Returnează partea din stare urmărită de observatori: (fază, mod, lumini)."""
+        return (self.state.phase, self.config.settings.mode, tuple(self.state.lights))
+
+    def _notify(self, before, kind=None, trigger=None):
+        """Anunță observatorii dacă faza, modul sau luminile s-au schimbat față de `before`.
+        kind: tipul evenimentului ("phase", "mode", "override"); dedus dacă lipsește
+        trigger: detecția care a declanșat schimbarea (dacă există)
+        """
+        if not self.observers:
+            return
+        after = self._observed()
+        if after == before:
+            return
+        if kind is None:
+            kind = "mode" if after[1] != before[1] else "phase"
+        event = {"kind": kind, "from": before[0], "trigger": trigger}
+        for observer in self.observers:
+            observer(self, event)
+
+    def _enter_phase(self, phase):
+        """Intră în faza `phase` (index): lumini, timer și semafoarele fizice, din tabele."""
+        table = self.table
+        previous_phase = self.phase
+        previous_lights = self.state.lights
+        self.phase = phase
+        self.state.phase = table.names[phase]
+        self.state.target = table.target[phase]
+        self.state.lights = list(table.lights[phase])
+        if table.kind[phase] == GREEN:
+            if phase != previous_phase:
+                self.green_since = self.clock.monotonic()
+            # Linia verde în Automatic rămâne verde până la o detecție
+            if phase == self.home and self.mode == "Automatic":
+                self._set_timer(table.timer_for[phase], INFINITE_TIMER)
+            else:
+                self._set_timer(table.timer_for[phase], table.duration[phase])
+        else:
+            self._set_timer(table.timer_for[phase], table.duration[phase])
+        self.state.last_update = self.clock.time()
+        trace = None
+        if self.pending_traces and phase != previous_phase:
+            if table.kind[phase] == GREEN:
+                trace = self.pending_traces.pop(phase, None)
+                if trace is not None:
+                    trace.mark("transition", self.state.last_update)
+            else:
+                pending = self.pending_traces.get(table.target[phase])
+                if pending is not None and not pending.has("decision"):
+                    pending.mark("decision", self.state.last_update)
+        if phase != previous_phase and previous_phase is not None:
+            log.info("phase", "[{intersection}] {previous} -> {phase}", intersection=self.config.id,
+                     previous=table.names[previous_phase], phase=table.names[phase])
+        if self.state.lights != previous_lights:
+            self.actuator(self.config.type, self.state.lights, previous_lights, trace)
+
+    def _next_stage(self, stage):
+        """Etapa spre care se pleacă din verdele `stage` în Automatic: următoarea etapă cu cerere
+        (round-robin), altfel linia verde. None = rămâne pe etapa curentă (este linia verde)."""
+        if self.last_demand is not None:
+            target = self.table.next_demanded(stage, self.last_demand)
+            if target is not None:
+                return target
+        return None if stage == self.home else self.home
+
+    def _leave_green(self, stage):
+        """Părăsește verdele `stage` prin fazele de siguranță (galben, all-red)."""
+        target = self._next_stage(stage)
+        if target is None:
+            # Linia verde - reinițializează timer-ul la infinit
+            self._set_timer(self.table.timer_for[stage], INFINITE_TIMER)
+            self.state.last_update = self.clock.time()
+        else:
+            self._enter_phase(self.table.clearance[stage][target])
+
+    def update_from_detection(self, detection_data, frame_width, frame_height, trace=None):
+        """Actualizează starea bazată pe detecții.
+        detection_data: dict cu {"humans": bool, "wheels": bool, "zones": {...}} pentru această intersecție
+        trace: Trace-ul cadrului (opțional) - păstrat pentru etapele cerute până când devin verzi
+        """
+        before = self._observed()
+        if trace is not None:
+            trace.mark("detection", self.clock.time())
+        self._update_from_detection(detection_data, trace)
+        if self.observers and self._observed() != before:
+            detection = detection_data if isinstance(detection_data, dict) else {}
+            trigger = {
+                "humans": detection.get("humans", False),
+                "wheels": detection.get("wheels", False),
+                "zones": [zone for zone, hit in detection.get("zones", {}).items() if hit]
+            }
+            self._notify(before, trigger=trigger)
+
+    def _update_from_detection(self, detection_data, trace=None):
+        if self.mode != "Automatic":
+            return
+        detection = detection_data if isinstance(detection_data, dict) else {}
+        table = self.table
+        stage = self.phase
+
+        # EDGE CASE 1: Ignoră detecțiile în fazele de siguranță (galben, all-red)
+        # Aceste faze trebuie să se termine complet înainte de a răspunde la detecții
+        if table.kind[stage] != GREEN:
+            return
+
+        demand = table.demand(detection)
+        self.last_demand = demand
+        if trace is not None:
+            # Latența se măsoară de la prima detecție care cere etapa, nu de la cele repetate
+            for s, demanded in enumerate(demand):
+                if demanded and s != stage and s not in self.pending_traces:
+                    self.pending_traces[s] = trace
+        now = self.clock.monotonic()
+        deadline = self.state.timer.deadline
+
+        if deadline is None:
+            # Linie verde infinită - pleacă spre următoarea etapă cu cerere (round-robin)
+            # EDGE CASE 4: Dacă nu detectăm nimic, rămâne pe verde infinit (corect)
+            if self.state.timer.value != INFINITE_TIMER or now - self.green_since < table.stage_min[stage]:
+                return
+            target = table.next_demanded(stage, demand)
+            if target is not None:
+                self._enter_phase(table.clearance[stage][target])
+            return
+
+        # Limită maximă (max_factor × durata) pentru a preveni blocarea prin detecție continuă
+        if now - self.green_since >= table.stage_max[stage]:
+            log.info("max_green", "[{intersection}] Timp maxim atins pe {phase} ({limit}s) - tranziție forțată",
+                     intersection=self.config.id, phase=table.names[stage], limit=table.stage_max[stage])
+            self._leave_green(stage)
+            return
+
+        # EDGE CASE 7: Menține verde dacă există detecție în etapa proprie, dar resetează
+        # timer-ul doar dacă e sub 50% din durată (previne "bouncing" la detecții intermitente)
+        # Dacă detecția dispare, timer-ul continuă să scadă și tranziția se face în tick()
+        if demand[stage] and deadline - now <= table.stage_duration[stage] * 0.5:
+            self._set_timer(table.timer_for[stage], table.duration[stage])
+            self.state.last_update = self.clock.time()
+
+    def set_mode(self, mode):
+        """Setează modul de operare (Automatic, Manual, Override)."""
+        before = self._observed()
+        self._set_mode(mode)
+        self._notify(before, kind="mode")
+
+    def _set_mode(self, mode):
+        # EDGE CASE 25: Validare mod
+        if mode not in MODES:
+            log.warning("invalid_mode", "⚠ Eroare: Mod invalid: {mode}", intersection=self.config.id, mode=mode)
+            return
+
+        # EDGE CASE 26: Dacă modul este deja setat, nu face nimic (evită resetări inutile)
+        if self.config.settings.mode == mode:
+            return
+
+        if mode == "Override":
+            # Păstrează modul anterior
+            if self.state.previous_mode is None:
+                self.state.previous_mode = self.config.settings.mode
+            self.config.settings.mode = mode
+        else:
+            # EDGE CASE 27: Reinițializează faza curentă cu timpii noului mod
+            # (linie verde infinită în Automatic, durate normale în Manual) și luminile ei
+            self.state.previous_mode = None
+            self.config.settings.mode = mode
+            self.pending_traces.clear()
+            self._enter_phase(self.phase)
+        self.state.last_update = self.clock.time()
+
+    def set_override(self, light_index, light_value):
+        """Setează manual o lumină (Override mode).
+        light_index: indexul semaforului (0 pentru car, 1 pentru ped la car_pedestrian)
+        light_value: 0=red, 1=green, 2=yellow
+        """
+        before = self._observed()
+        self._set_override(light_index, light_value)
+        self._notify(before, kind="override")
+
+    def _set_override(self, light_index, light_value):
+        table = self.table
+        # EDGE CASE 43: Validare parametri
+        if not isinstance(light_index, int) or not 0 <= light_index < len(self.state.lights):
+            log.warning("invalid_override", "⚠ Eroare: light_index invalid: {light_index}",
+                        intersection=self.config.id, light_index=light_index)
+            return
+        if light_value not in [0, 1, 2]:
+            log.warning("invalid_override", "⚠ Eroare: light_value invalid: {light_value}",
+                        intersection=self.config.id, light_value=light_value)
+            return
+
+        # EDGE CASE 53: Semafoarele de pietoni nu au galben - doar roșu sau verde
+        if self.config.lights[light_index].type == "pedestrian" and light_value == 2:
+            log.warning("invalid_override", "⚠ Eroare: Semafoarele de pietoni nu au lumina galbenă. Folosește doar roșu (0) sau verde (1).",
+                        intersection=self.config.id, light_index=light_index, light_value=light_value)
+            return
+
+        # EDGE CASE 44: Salvează modul anterior doar dacă nu există deja
+        if self.state.previous_mode is None:
+            self.state.previous_mode = self.config.settings.mode
+
+        self.config.settings.mode = "Override"
+
+        previous_lights = self.state.lights
+        lights = list(previous_lights)
+        lights[light_index] = light_value
+        # Verde pe un semafor => roșu pe semafoarele în conflict (care nu sunt verzi în aceeași etapă);
+        # la car_pedestrian, roșu pe un semafor dă verde celuilalt
+        if light_value == 1:
+            for other in table.conflicts[light_index]:
+                lights[other] = 0
+        elif light_value == 0 and table.override_complement:
+            for other in table.conflicts[light_index]:
+                lights[other] = 1
+
+        self.state.lights = lights
+        self.pending_traces.clear()
+        if lights != previous_lights:
+            self.actuator(self.config.type, lights, previous_lights)
+
+        # Set timer based on light value
+        if light_value == 1:  # Green
+            duration = table.stage_duration[table.light_stage[light_index]]
+        elif light_value == 2:  # Yellow
+            duration = self.config.settings.yellow_time
+        else:  # Red
+            duration = self.config.settings.all_red_safety_time
+
+        # EDGE CASE 48: Validare duration
+        duration = max(1, int(duration))  # Minimum 1 secundă
+
+        self._set_timer("override", duration)
+        self.state.last_update = self.clock.time()
+
+    def simulate_detection(self, detection_type, light_index=None):
+        """Simulează o detecție (pentru testare).
+        detection_type: 'car', 'ped', 'none'
+        light_index: opțional, semaforul pentru care se simulează cererea (zonele lui)
+        """
+        table = self.table
+        if detection_type == "none":
+            detection = {"humans": False, "wheels": False, "zones": {}}
+        elif light_index is not None:
+            if not isinstance(light_index, int) or not 0 <= light_index < len(self.state.lights):
+                return
+            detection = table.demand_detection(table.light_stage[light_index])
+        elif detection_type == "ped":
+            detection = {"humans": True, "wheels": False, "zones": {}}
+        elif detection_type == "car":
+            detection = {"humans": False, "wheels": True, "zones": {}}
+        else:
+            return
+        self.update_from_detection(detection, 640, 480)  # Dimensiuni default
+
+    def tick(self):
+        """Face tranziția dacă deadline-ul fazei curente a expirat.
+        Este apelat de scheduler exact la deadline (sau la trezire după o detecție/comandă).
+        """
+        before = self._observed()
+        self._tick()
+        self._notify(before)
+
+    def _tick(self):
+        # Timer infinit sau încă neexpirat - nimic de făcut
+        if self.deadline is None or self.clock.monotonic() < self.deadline:
+            return
+
+        table = self.table
+        phase = self.phase
+        mode = self.mode
+        timer_before = self.state.timer
+
+        if mode == "Override":
+            # EDGE CASE 20: Când timer-ul expiră, revine la modul anterior
+            if self.state.previous_mode:
+                self.config.settings.mode = self.state.previous_mode
+                self.state.previous_mode = None
+                # EDGE CASE 21: Reintră în faza curentă - luminile setate manual sunt înlocuite
+                # cu cele ale fazei, iar timer-ul este armat pentru modul anterior
+                self._enter_phase(phase)
+        elif table.kind[phase] != GREEN:
+            # Fazele de siguranță au un singur succesor (galben -> all-red -> verdele țintă)
+            self._enter_phase(table.next[phase])
+        elif mode == "Manual":
+            # Manual mode - ciclu fix prin toate etapele, în ordine
+            self._enter_phase(table.clearance[phase][(phase + 1) % table.stage_count])
+        else:
+            self._leave_green(phase)
+
+        # EDGE CASE 24: Dacă nicio tranziție nu a armat un timer nou, oprește timer-ul la 0
+        # (altfel scheduler-ul ar reveni imediat pe un deadline deja expirat)
+        if self.state.timer is timer_before:
+            self._set_timer(timer_before.for_, 0)
+            self.state.timer.deadline = None
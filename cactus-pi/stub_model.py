@@ -0,0 +1,74 @@
+# Model YOLO fals pentru testele de încărcare și benchmark-uri: aceeași interfață ca
+# ultralytics (model.predict(frame, stream=True, verbose=False) -> rezultate cu .boxes,
+# fiecare box cu .cls[0], .xyxy[0], .conf[0]), fără torch și fără descărcarea modelului.
+# Obiectele sunt generate determinist (seed) în coordonatele cadrului primit, cu un
+# amestec de persoane și vehicule care ating zonele intersecțiilor.
+# synthetic_frame() generează cadre în locul camerei (loadtest.py, microbench.py).
+
+import random
+import time
+
+import numpy as np
+
+# Clase COCO generate: persoană, mașină, motocicletă, autobuz, camion, plus una ignorată (câine)
+STUB_CLASSES = (0, 2, 3, 5, 7, 16)
+
+
+class StubBox:
+    __slots__ = ("cls", "xyxy", "conf")
+
+    def __init__(self, class_id, xyxy, confidence):
+        self.cls = [class_id]
+        self.xyxy = [xyxy]
+        self.conf = [confidence]
+
+
+class StubResults:
+    __slots__ = ("boxes",)
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def make_boxes(count, width, height, rng, classes=STUB_CLASSES):
+    """`count` obiecte cu clase și poziții aleatoare (rng = random.Random) într-un cadru width x height."""
+    boxes = []
+    for _ in range(count):
+        box_width = rng.randint(max(1, width // 20), max(2, width // 4))
+        box_height = rng.randint(max(1, height // 20), max(2, height // 4))
+        x1 = rng.randint(0, max(0, width - box_width))
+        y1 = rng.randint(0, max(0, height - box_height))
+        boxes.append(StubBox(rng.choice(classes), (float(x1), float(y1), float(x1 + box_width),
+                                                   float(y1 + box_height)), round(rng.uniform(0.3, 0.99), 2)))
+    return boxes
+
+
+class StubModel:
+    """Înlocuitor pentru YOLO(MODEL_NAME).
+
+    boxes_per_frame: obiecte generate per cadru
+    latency: secunde de "inferență" per cadru (time.sleep - eliberează GIL-ul ca torch)
+    seed: aceeași secvență de obiecte la fiecare rulare
+    """
+
+    def __init__(self, boxes_per_frame=4, latency=0.0, seed=0):
+        self.boxes_per_frame = boxes_per_frame
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def predict(self, frame, stream=False, verbose=True):
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        height, width = frame.shape[:2]
+        results = [StubResults(make_boxes(self.boxes_per_frame, width, height, self._rng))]
+        return iter(results) if stream else results
+
+
+def synthetic_frame(width, height, index=0):
+    """Cadru BGR determinist (zgomot + gradient), suficient de variat pentru un cost de codare JPEG realist."""
+    rng = np.random.default_rng(index)
+    frame = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    frame[:, :, index % 3] += np.tile(np.linspace(0, 127, width, dtype=np.uint8), (height, 1))
+    return frame
@@ -0,0 +1,113 @@
+# Trasarea latenței detecție -> lampă.
+# Fiecare cadru primește un Trace la captură; hop-urile (inferență, detecție, decizie,
+# tranziție, comenzile HTTP către cod.py și scrierea pe serial) sunt marcate cu timpul
+# de perete (time.time()), comparabil între procese dacă ceasurile sunt sincronizate (NTP).
+# Un trace este păstrat de state machine doar dacă detecția cere o etapă care nu este verde;
+# este finalizat când lampa etapei se aprinde, iar TraceCollector calculează percentilele
+# per intersecție și per hop.
+
+import itertools
+import threading
+import time
+from collections import deque
+
+TRACE_HISTORY = 500  # trace-uri finalizate păstrate per intersecție pentru percentile
+
+_ids = itertools.count(1)
+
+
+class Trace:
+    """Hop-urile unui cadru, în ordine: [(nume, timp de perete)]; primul hop este captura."""
+
+    __slots__ = ("id", "intersection", "hops")
+
+    def __init__(self, intersection, captured=None):
+        self.id = f"{intersection}-{next(_ids)}"
+        self.intersection = intersection
+        self.hops = [("capture", captured if captured is not None else time.time())]
+
+    def mark(self, hop, t=None):
+        self.hops.append((hop, t if t is not None else time.time()))
+
+    def has(self, hop):
+        return any(name == hop for name, _ in self.hops)
+
+    def context(self):
+        """Contextul propagat către cod.py în corpul cererii."""
+        return {"id": self.id}
+
+    def merge(self, remote_hops, suffix=""):
+        """Adaugă hop-urile raportate de cod.py ({"nume": timp}), în ordinea timpului."""
+        for hop, t in sorted(remote_hops.items(), key=lambda item: item[1]):
+            self.hops.append((hop + suffix, t))
+
+    def total(self):
+        return self.hops[-1][1] - self.hops[0][1]
+
+    def to_dict(self):
+        start = self.hops[0][1]
+        return {
+            "id": self.id,
+            "intersection": self.intersection,
+            "captured": start,
+            "hops": [{"hop": hop, "ms": (t - start) * 1e3} for hop, t in self.hops],
+        }
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1e3}
+
+
+class TraceCollector:
+    """Ultimele trace-uri finalizate per intersecție și rezumatul lor pe hop-uri."""
+
+    def __init__(self, history=TRACE_HISTORY, on_record=None):
+        self.history = history
+        self.on_record = on_record
+        self._traces = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        with self._lock:
+            traces = self._traces.get(trace.intersection)
+            if traces is None:
+                traces = self._traces[trace.intersection] = deque(maxlen=self.history)
+            traces.append(trace)
+        if self.on_record is not None:
+            self.on_record(trace)
+
+    def recent(self, intersection, count=10):
+        with self._lock:
+            traces = list(self._traces.get(intersection, ()))[-count:]
+        return [trace.to_dict() for trace in traces]
+
+    def summary(self):
+        """{intersecție: {count, end_to_end, hops: {hop: {delta: ..., since_capture: ...}}, dominant}}.
+        delta = timpul de la hop-ul anterior din același trace; dominant = hop-ul cu cel mai mare p50.
+        """
+        with self._lock:
+            snapshot = {intersection: list(traces) for intersection, traces in self._traces.items()}
+        result = {}
+        for intersection, traces in snapshot.items():
+            deltas, since = {}, {}
+            for trace in traces:
+                start = trace.hops[0][1]
+                previous = start
+                for hop, t in trace.hops[1:]:
+                    deltas.setdefault(hop, []).append(t - previous)
+                    since.setdefault(hop, []).append(t - start)
+                    previous = t
+            hops = {hop: {"count": len(deltas[hop]), "delta": _percentiles(deltas[hop]),
+                          "since_capture": _percentiles(since[hop])} for hop in deltas}
+            result[intersection] = {
+                "count": len(traces),
+                "end_to_end": _percentiles([trace.total() for trace in traces]) if traces else None,
+                "hops": hops,
+                "dominant": max(hops, key=lambda hop: hops[hop]["delta"]["p50_ms"]) if hops else None,
+            }
+        return result
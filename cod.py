@@ -1,12 +1,15 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
+from typing import Optional
 import serial
 import time
 import atexit
 
 # Configurare serial
+ARDUINO_BOOT_SECONDS = 2.0  # Arduino se resetează la deschiderea portului serial
 ser = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
-time.sleep(2)  # așteaptă Arduino
+# Serverul pornește imediat; doar comenzile trimise înainte ca Arduino să termine pornirea așteaptă
+arduino_ready_at = time.monotonic() + ARDUINO_BOOT_SECONDS
 
 app = FastAPI()
 
@@ -21,9 +24,19 @@ pin_status = {
 class PinRequest(BaseModel):
     pin: int
     value: int  # 0/1
+    trace: Optional[dict] = None  # contextul de trasare trimis de main.py ({"id": ...})
+
+def trace_response(req, hops):
+    """Adaugă în răspuns timpii (time.time()) hop-urilor din acest proces, dacă cererea are trace."""
+    if not req.trace:
+        return {}
+    return {"trace": {"id": req.trace.get("id"), "hops": hops}}
 
 def set_pin(pin: int, value: int):
     """Trimite comanda la Arduino și actualizează statusul."""
+    remaining = arduino_ready_at - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
     ser.write(f"{pin},{'HIGH' if value else 'LOW'}\n".encode())
     pin_status[pin] = value
 
@@ -33,8 +46,10 @@ def get_status():
 
 @app.post("/pin")
 def set_pin_direct(req: PinRequest):
+    received = time.time()
     set_pin(req.pin, req.value)
-    return {"pin": req.pin, "value": req.value}
+    hops = {"cod_received": received, "serial_written": time.time()}
+    return {"pin": req.pin, "value": req.value, **trace_response(req, hops)}
 
 @app.post("/control")
 def control(req: PinRequest):
@@ -44,7 +59,9 @@ def control(req: PinRequest):
     - 8 = masini rosu
     - 9 = masini galben/verde
     """
+    received = time.time()
     set_pin(req.pin, req.value)
+    hops = {"cod_received": received, "serial_written": time.time()}
     # Reguli simple: dacă pedestri verde, masini rosu ON
     if req.pin == 10 and req.value == 1:
         set_pin(8, 1)  # masini rosu OFF
@@ -52,7 +69,7 @@ def control(req: PinRequest):
     elif req.pin == 10 and req.value == 0:
         set_pin(8, 0)  # masini rosu ON
         set_pin(9, 0)  # masini galben ON
-    return {"pin": req.pin, "value": req.value}
+    return {"pin": req.pin, "value": req.value, **trace_response(req, hops)}
 
 # Cleanup la inchidere
 @atexit.register
@@ -680,6 +680,9 @@ function useMockApi() {
 
     let errorCount = 0;
     const MAX_ERRORS = 5;
+    // Delta polling: only intersections changed since lastVersion (plus running timers) are sent
+    let lastVersion = null;
+    const knownIntersections = new Map();
 
     const intersectionsInterval = setInterval(async () => {
       // Create AbortController for timeout
@@ -687,7 +690,8 @@ function useMockApi() {
       const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 second timeout
 
       try {
-        const response = await fetch('http://localhost:8000/intersections', {
+        const query = lastVersion === null ? '' : `?since=${lastVersion}`;
+        const response = await fetch(`http://localhost:8000/intersections${query}`, {
           method: 'GET',
           headers: {
             'Accept': 'application/json',
@@ -706,10 +710,22 @@ function useMockApi() {
         // Reset error count on successful fetch
         errorCount = 0;
         
-        // Backend returns: {"intersections": [{id, name, type, lights, settings, state}, ...]}
-        if (data.intersections && Array.isArray(data.intersections) && data.intersections.length > 0) {
+        // Backend returns: {"intersections": [{id, name, type, lights, settings, state}, ...], "version", "full"}
+        if (!data.intersections || !Array.isArray(data.intersections)) {
+          return;
+        }
+        if (lastVersion === null || data.full) {
+          knownIntersections.clear();
+        } else if (data.intersections.length === 0) {
+          lastVersion = data.version;
+          return; // Nothing changed since the last poll
+        }
+        data.intersections.forEach(intersection => knownIntersections.set(intersection.id, intersection));
+        lastVersion = data.version;
+
+        if (knownIntersections.size > 0) {
           // Convert backend state to frontend format
-          const intersections = data.intersections.map(intersection => {
+          const intersections = Array.from(knownIntersections.values()).map(intersection => {
             const lights = intersection.state?.lights || intersection.lights || [0, 0];
             const timer = intersection.state?.timer || { for: 'car', value: 999 };
             
@@ -3134,7 +3150,7 @@ const SettingsPage = () => {
                 {availableCameras.length > 0 ? (
                   availableCameras.map(camera => (
                     <option key={camera.index} value={camera.index}>
-                      {camera.name} (Index: {camera.index})
+                      {camera.name} (Index: {camera.index}){camera.inUse ? ` - folosită de ${camera.intersections.join(', ')}` : ''}
                     </option>
                   ))
                 ) : (